@@ -0,0 +1,336 @@
+"""
+南开大学 WebVPN 成绩查询工具 - 异步多账号轮询引擎
+
+用一个事件循环同时轮询多个账号：
+1. login() → access_eamis() → get_grades() 请求链改写为协程（基于 httpx.AsyncClient）
+2. 通过信号量限制同时进行的检查数量
+3. 解析、比较、推送复用 GradeMonitor，输出的成绩字典与 parse_grades 完全一致
+
+依赖：pip install httpx
+"""
+import asyncio
+import re
+import time
+
+from grade_logging import AccountLogger
+from nku_grades import AccountSession, GradeMonitor, SessionStore
+
+try:
+    import httpx
+except ImportError:  # 可选依赖，仅异步引擎需要
+    httpx = None
+
+
+EAMS_PREFIX = "/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams"
+IAM_PREFIX = "/https/77726476706e69737468656265737421f9f64cd22931665b7f01c7a99c406d36af"
+
+
+class AsyncGradeAccount:
+    """单个账号的异步请求链，解析和成绩比较委托给 GradeMonitor"""
+
+    def __init__(self, username, encrypted_password, pushplus_token=None,
+                 semester_id="4324", log_callback=None, grade_store=None, transport=None, notifiers=None,
+                 account_session=None, session_store=None):
+        if httpx is None:
+            raise ImportError("异步引擎需要 httpx，请先执行 pip install httpx")
+
+        self.username = username
+        self.encrypted_password = encrypted_password
+        self.semester_id = semester_id
+
+        # 同步监控实例只用于日志、解析、比较和推送，不发起请求；
+        # 它的会话和会话缓存不会被使用，由 AsyncGradePoller 传入所有账号共用的一份
+        if account_session is None:
+            account_session = AccountSession(transport=transport)
+        if session_store is None:
+            session_store = SessionStore()
+        self.monitor = GradeMonitor(username, encrypted_password, pushplus_token, log_callback=log_callback,
+                                    session_store=session_store, grade_store=grade_store, notifiers=notifiers,
+                                    account_session=account_session)
+        # 没有共享存储时每个账号单独保存历史成绩，避免互相覆盖
+        self.monitor.last_grades_file = f"last_grades_{username}.json"
+
+        self.base_url = self.monitor.base_url
+        self.logged_in = False
+        # 连接池、超时和HTTP/2设置与同步版本共用同一份 TransportConfig
+        self.client = httpx.AsyncClient(
+            headers=dict(self.monitor.session.headers),
+            follow_redirects=True,
+            **self.monitor.transport.httpx_options()
+        )
+
+    def log(self, message, level=None):
+        # 账号上下文由监控实例的 AccountLogger 附加，这里不再重复加前缀
+        self.monitor.log(message, level)
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def login(self):
+        """完整的登录流程（协程版）"""
+        self.log("正在登录WebVPN...")
+
+        try:
+            await self.client.get(f"{self.base_url}/")
+            await self.client.get(f"{self.base_url}{IAM_PREFIX}/login")
+
+            # 获取CSRF Token
+            timestamp = int(time.time() * 1000)
+            params = {
+                'method': 'get',
+                'host': 'iam.nankai.edu.cn',
+                'scheme': 'https',
+                'path': '/login',
+                'vpn_timestamp': timestamp
+            }
+            response = await self.client.get(f"{self.base_url}/wengine-vpn/cookie", params=params)
+            csrf_match = re.search(r'csrf-token=([^;]+)', response.text)
+
+            if not csrf_match:
+                self.log("❌ 获取CSRF Token失败")
+                return False
+
+            csrf_token = csrf_match.group(1)
+            self.monitor.csrf_token = csrf_token
+
+            # 输入用户名和密码
+            input_url = f"{self.base_url}/wengine-vpn/input"
+            input_headers = {'Content-Type': 'text/plain;charset=UTF-8'}
+            await self.client.post(input_url, json={"name": "", "type": "text", "value": self.username},
+                                   headers=input_headers)
+            await self.client.post(input_url, json={"name": "", "type": "password", "value": self.encrypted_password},
+                                   headers=input_headers)
+
+            # 提交登录
+            login_data = {
+                "login_scene": "feilian",
+                "account_type": "userid",
+                "account": self.username,
+                "password": self.encrypted_password
+            }
+            # 登录请求头只用于本次请求，与同步版本一致，不修改客户端的公共请求头
+            login_headers = {
+                'Content-Type': 'application/json',
+                'Csrf-Token': csrf_token,
+                'X-Version-Check': '0',
+                'X-Fe-Version': '3.0.9.8465',
+                'Accept-Language': 'zh-CN',
+            }
+            response = await self.client.post(f"{self.base_url}{IAM_PREFIX}/api/v1/login", json=login_data,
+                                              params={'vpn-12-o2-iam.nankai.edu.cn': '', 'os': 'web'},
+                                              headers=login_headers)
+
+            if response.status_code == 200 and 'success' in response.text.lower():
+                self.log("✅ WebVPN登录成功")
+                return True
+            else:
+                self.log("❌ WebVPN登录失败")
+                return False
+
+        except Exception as e:
+            self.log(f"❌ 登录过程出错: {e}")
+            return False
+
+    async def access_eamis(self):
+        """访问教务系统（协程版）"""
+        try:
+            timestamp = int(time.time() * 1000)
+            await self.client.get(f"{self.base_url}{EAMS_PREFIX}?wrdrecordvisit={timestamp}")
+            home_response = await self.client.get(f"{self.base_url}{EAMS_PREFIX}/home.action")
+
+            if home_response.status_code == 200 or "教务系统" in home_response.text:
+                self.log("✅ 成功进入教务系统")
+                return True
+            else:
+                self.log("❌ 访问教务系统失败")
+                return False
+
+        except Exception as e:
+            self.log(f"❌ 访问教务系统出错: {e}")
+            return False
+
+    async def is_session_alive(self):
+        """探测当前会话是否仍然有效"""
+        try:
+            response = await self.client.get(f"{self.base_url}{EAMS_PREFIX}/home.action", follow_redirects=False)
+            return response.status_code == 200
+        except Exception:
+            return False
+
+    async def ensure_login(self):
+        """已有会话有效时跳过登录"""
+        if self.logged_in and await self.is_session_alive():
+            return True
+
+        self.logged_in = False
+        self.monitor.grade_tag_id = None
+        self.client.cookies.clear()
+        if await self.login() and await self.access_eamis():
+            self.logged_in = True
+        return self.logged_in
+
+    async def get_grades(self, semester_id=None):
+        """获取指定学期的成绩（协程版），返回与 parse_grades 相同的字典列表"""
+        semester_id = semester_id or self.semester_id
+        self.log(f"正在获取学期 {semester_id} 的成绩...")
+
+        response_text = await self.get_grade_page(semester_id)
+        if response_text is None:
+            return None
+        # 解析是纯CPU操作，直接复用同步实现
+        return self.monitor.parse_grades(response_text)
+
+    async def get_grade_page(self, semester_id=None):
+        """获取成绩页面HTML（协程版），没有成绩表格时返回None"""
+        semester_id = semester_id or self.semester_id
+
+        try:
+            # 与同步版本相同：已获取过tagId时先跳过预请求
+            if self.monitor.grade_tag_id:
+                response_text = await self._fetch_grade_page(semester_id)
+                if self.monitor.has_grade_table(response_text):
+                    self.log("⚡ 已跳过预请求，直接获取成绩")
+                    return response_text
+                self.log("⚠️ 直接获取未返回成绩表格，执行完整预请求...")
+
+            await self._grade_preflight(semester_id)
+            response_text = await self._fetch_grade_page(semester_id)
+            if self.monitor.has_grade_table(response_text):
+                return response_text
+
+            self.log("❌ 未能获取到完整的成绩数据（可能该学期没有成绩）")
+            return None
+
+        except Exception as e:
+            self.log(f"❌ 获取成绩时出错: {e}")
+            return None
+
+    async def _grade_preflight(self, semester_id):
+        vpn_params = {'vpn-12-o2-eamis.nankai.edu.cn': ''}
+        form_headers = {
+            'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+            'X-Requested-With': 'XMLHttpRequest',
+            'Referer': f'{self.base_url}{EAMS_PREFIX}/home.action'
+        }
+
+        response = await self.client.post(f"{self.base_url}{EAMS_PREFIX}/teach/grade/course/person.action",
+                                          data={'project.id': '1', 'semester.id': semester_id},
+                                          params=vpn_params, headers=form_headers)
+
+        tag_id_match = re.search(r'semesterBar(\d+)Semester', response.text)
+        if tag_id_match:
+            tag_id = f"semesterBar{tag_id_match.group(1)}Semester"
+            self.monitor.grade_tag_id = tag_id
+        else:
+            tag_id = "semesterBar13572391471Semester"
+
+        data_query_url = f"{self.base_url}{EAMS_PREFIX}/dataQuery.action"
+        await self.client.post(data_query_url,
+                               data={'tagId': tag_id, 'dataType': 'semesterCalendar', 'value': semester_id, 'empty': 'false'},
+                               params=vpn_params, headers=form_headers)
+        await self.client.post(data_query_url, data={'entityId': '1'}, params=vpn_params, headers=form_headers)
+
+    async def _fetch_grade_page(self, semester_id):
+        timestamp = int(time.time() * 1000)
+        ajax_headers = {
+            'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+            'Accept': 'text/html, */*; q=0.01',
+            'X-Requested-With': 'XMLHttpRequest',
+            'Referer': f'{self.base_url}{EAMS_PREFIX}/teach/grade/course/person!search.action?semesterId={semester_id}&projectType='
+        }
+        response = await self.client.get(f"{self.base_url}{EAMS_PREFIX}/teach/grade/course/person!search.action",
+                                         params={'vpn-12-o2-eamis.nankai.edu.cn': '', 'semesterId': semester_id,
+                                                 'projectType': '', '_': timestamp},
+                                         headers=ajax_headers)
+        return response.text
+
+    async def check_grades(self):
+        """登录（必要时）、获取成绩并与历史记录比较，返回是否有变化"""
+        if not await self.ensure_login():
+            self.log("❌ 登录失败，等待下次检查")
+            return False
+
+        response_text = await self.get_grade_page()
+        if response_text is None:
+            # 可能是会话在探测后失效，下次检查重新登录
+            self.logged_in = False
+
+        # 摘要比较、解析、推送和写文件包含阻塞I/O，放到线程中执行，避免阻塞事件循环
+        return await asyncio.to_thread(self.monitor.check_grade_page, response_text, self.semester_id)
+
+
+class AsyncGradePoller:
+    """多账号异步轮询引擎"""
+
+    def __init__(self, concurrency=10, interval=30, log_callback=None, grade_store=None, transport=None):
+        self.concurrency = concurrency
+        self.interval = interval  # 分钟
+        self.log_callback = log_callback
+        self.logger = AccountLogger(None, log_callback)
+        self.grade_store = grade_store  # 所有账号共享的成绩存储，如 SQLiteGradeStore
+        self.transport = transport  # 连接设置（transport.TransportConfig），为None时使用默认值
+        # 请求由各账号的 httpx 客户端发出，监控实例只需要请求头和连接设置，所有账号共用一份
+        self.account_session = AccountSession(transport=transport)
+        self.session_store = SessionStore()
+        self.accounts = {}
+        self._stopped = None
+
+    def add_account(self, username, encrypted_password, pushplus_token=None, semester_id="4324", notifiers=None):
+        """添加要监控的账号，notifiers 为PushPlus之外的通知渠道配置"""
+        account = AsyncGradeAccount(username, encrypted_password, pushplus_token,
+                                    semester_id=semester_id, log_callback=self.log_callback,
+                                    grade_store=self.grade_store, transport=self.transport,
+                                    notifiers=notifiers, account_session=self.account_session,
+                                    session_store=self.session_store)
+        self.accounts[username] = account
+        return account
+
+    async def remove_account(self, username):
+        """移除账号并关闭其连接"""
+        account = self.accounts.pop(username, None)
+        if account:
+            await account.close()
+
+    async def poll_once(self):
+        """并发检查所有账号一次，返回 {学号: 是否有变化}"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _check(account):
+            async with semaphore:
+                try:
+                    return await account.check_grades()
+                except Exception as e:
+                    account.log(f"❌ 监控过程出错: {e}")
+                    return False
+
+        accounts = list(self.accounts.values())
+        results = await asyncio.gather(*(_check(account) for account in accounts))
+        return {account.username: changed for account, changed in zip(accounts, results)}
+
+    async def run(self):
+        """持续轮询，直到调用 stop()"""
+        self._stopped = asyncio.Event()
+        check_count = 0
+
+        try:
+            while not self._stopped.is_set():
+                check_count += 1
+                started = time.monotonic()
+                results = await self.poll_once()
+                changed = [username for username, has_changes in results.items() if has_changes]
+
+                self.logger.log_message(
+                    f"🔍 第 {check_count} 轮检查完成："
+                    f"{len(results)} 个账号，{len(changed)} 个有变化，耗时 {time.monotonic() - started:.1f} 秒"
+                )
+
+                try:
+                    await asyncio.wait_for(self._stopped.wait(), timeout=self.interval * 60)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await asyncio.gather(*(account.close() for account in self.accounts.values()))
+
+    def stop(self):
+        if self._stopped:
+            self._stopped.set()
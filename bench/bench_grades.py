@@ -0,0 +1,315 @@
+"""
+成绩查询性能基准 - 基于本地替身服务器，不访问真实的 webvpn.nankai.edu.cn
+
+测量内容：
+1. stages   各阶段（登录、进入教务、学期列表、获取成绩、缓存会话复用）的延迟和请求数
+2. parse    parse_grades 的解析吞吐量（行/秒），对比 fast 和 bs4 两种解析后端
+3. monitors N 个监控并发检查时的总耗时和单次检查延迟
+4. semesters 学期日历解析耗时，对比单遍解析器和原来的两级正则实现
+
+用法：
+    python bench/bench_grades.py                     # 全部运行
+    python bench/bench_grades.py stages --latency 20 # 每个请求额外 20ms 延迟
+    python bench/bench_grades.py parse --rows 2000
+    python bench/bench_grades.py monitors -n 50 --rounds 3
+    python bench/bench_grades.py semesters
+    python bench/bench_grades.py --json report.json
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_webvpn import FakeWebVPNServer, load_fixture  # noqa: E402
+from nku_grades import GradeMonitor, SessionStore, WebVPNGradeChecker  # noqa: E402
+from request_metrics import get_default_metrics  # noqa: E402
+from semester_catalog import SemesterCatalog, parse_semester_calendar  # noqa: E402
+
+PASSWORD = "fake-encrypted-password"
+SUITES = ("stages", "parse", "monitors", "semesters")
+
+
+def quiet(checker):
+    """基准测试时关闭日志输出"""
+    checker.log = lambda message, level="INFO": None
+    return checker
+
+
+def timed(server, func, *args):
+    """运行一次，返回 (结果, 耗时毫秒, 请求数)"""
+    before = server.total_requests()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = (time.perf_counter() - started) * 1000
+    return result, elapsed, server.total_requests() - before
+
+
+def bench_stages(latency=0.0, repeat=5):
+    """各阶段延迟和请求数"""
+    server = FakeWebVPNServer(latency=latency, password=PASSWORD).start()
+    samples = {}
+
+    def record(stage, elapsed, requests):
+        samples.setdefault(stage, {'ms': [], 'requests': requests})['ms'].append(elapsed)
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            store_path = os.path.join(tmp, "session.json")
+            for _ in range(repeat):
+                # 每轮使用空的内存学期目录，get_all_grades 每轮都实际获取一次学期列表
+                checker = quiet(WebVPNGradeChecker("2312345", PASSWORD, session_store=SessionStore(store_path),
+                                                   semester_catalog=SemesterCatalog(path=None)))
+                checker.base_url = server.base_url
+
+                _, ms, n = timed(server, checker.login)
+                record("login", ms, n)
+                _, ms, n = timed(server, checker.access_eamis)
+                record("access_eamis", ms, n)
+                checker.logged_in = True
+                checker.session_store.save(checker.username, checker.session, checker.csrf_token)
+
+                checker.grade_tag_id = None
+                _, ms, n = timed(server, checker.fetch_semesters)
+                record("fetch_semesters", ms, n)
+
+                checker.grade_tag_id = None
+                _, ms, n = timed(server, checker.get_grades, "4324")
+                record("get_grades (完整预请求)", ms, n)
+                _, ms, n = timed(server, checker.get_grades, "4324")
+                record("get_grades (跳过预请求)", ms, n)
+
+                _, ms, n = timed(server, checker.get_all_grades)
+                record("get_all_grades", ms, n)
+
+                # 新进程从磁盘缓存恢复会话
+                fresh = quiet(WebVPNGradeChecker("2312345", PASSWORD, session_store=SessionStore(store_path)))
+                fresh.base_url = server.base_url
+                _, ms, n = timed(server, fresh.ensure_login)
+                record("ensure_login (缓存会话)", ms, n)
+
+                server.expire_sessions()
+                _, ms, n = timed(server, fresh.ensure_login)
+                record("ensure_login (会话失效)", ms, n)
+    finally:
+        server.stop()
+
+    return {
+        stage: {
+            'requests': data['requests'],
+            'median_ms': round(statistics.median(data['ms']), 2),
+            'min_ms': round(min(data['ms']), 2),
+            'max_ms': round(max(data['ms']), 2),
+        }
+        for stage, data in samples.items()
+    }
+
+
+def build_grade_page(rows):
+    """把等级制、百分制、通过制三种表格的行拼成一个指定行数的大表格"""
+    bodies = []
+    for name in ("grades_letter.html", "grades_percent.html", "grades_pass.html"):
+        page = load_fixture(name)
+        start = page.index("<tr class=")
+        end = page.index("</tbody>")
+        bodies.append(page[start:end])
+    pool = "".join(bodies).replace("</tr>", "</tr>\n").split("\n")
+    pool = [line for line in pool if line.strip()]
+
+    template = load_fixture("grades_letter.html")
+    head = template[:template.index("<tr class=")]
+    tail = template[template.index("</tbody>"):]
+    body = "\n".join(pool[i % len(pool)] for i in range(rows))
+    return (head + body + tail).replace("{grid_id}", "13572391471")
+
+
+def bench_parse(rows=500, repeat=20):
+    """parse_grades 吞吐量"""
+    html = build_grade_page(rows)
+    results = {}
+    expected = None
+
+    for backend in WebVPNGradeChecker.GRADE_PARSERS:
+        checker = quiet(WebVPNGradeChecker("2312345", PASSWORD, grade_parser=backend))
+        grades = checker.parse_grades(html)
+        if expected is None:
+            expected = grades
+        elif grades != expected:
+            raise AssertionError(f"{backend} 解析结果与其他后端不一致")
+
+        started = time.perf_counter()
+        for _ in range(repeat):
+            checker.parse_grades(html)
+        elapsed = time.perf_counter() - started
+        results[backend] = {
+            'rows': rows,
+            'ms_per_page': round(elapsed / repeat * 1000, 3),
+            'rows_per_second': round(rows * repeat / elapsed),
+        }
+
+    return results
+
+
+def legacy_parse_semesters(text):
+    """原来的学期日历解析：先切出 semesters 对象，再逐个学年匹配，最后排序格式化（仅作对照）"""
+    semesters_match = re.search(r'semesters:\s*({.*?})\s*,\s*yearIndex', text.strip(), re.DOTALL)
+    if not semesters_match:
+        return None
+    semester_data = {}
+    for year_match in re.finditer(r'(y\d+):\s*\[(.*?)\]', semesters_match.group(1), re.DOTALL):
+        semester_list = [
+            {'id': int(m.group(1)), 'schoolYear': m.group(2), 'name': m.group(3)}
+            for m in re.finditer(r'\{id:(\d+),schoolYear:"([^"]+)",name:"([^"]+)"\}', year_match.group(2))
+        ]
+        if semester_list:
+            semester_data[year_match.group(1)] = semester_list
+    if not semester_data:
+        return None
+
+    formatted_semesters = []
+    for year_key in sorted(semester_data.keys(), reverse=True):
+        for semester in sorted(semester_data[year_key], key=lambda x: int(x['name']), reverse=True):
+            semester_id = str(semester['id'])
+            if len(semester_id) == 4:
+                formatted_semesters.append({
+                    'id': semester_id,
+                    'display_name': f"{semester['schoolYear']} 第{semester['name']}学期",
+                    'school_year': semester['schoolYear'],
+                    'term': semester['name']
+                })
+    return formatted_semesters
+
+
+def bench_semesters(repeat=2000):
+    """学期日历解析耗时（使用抓取的 dataQuery.action 响应）"""
+    text = load_fixture("semester_calendar.txt")
+    parsers = {"single-pass": parse_semester_calendar, "legacy": legacy_parse_semesters}
+    expected = legacy_parse_semesters(text)
+    results = {}
+
+    for name, parse in parsers.items():
+        if parse(text) != expected:
+            raise AssertionError(f"{name} 解析结果与原实现不一致")
+        started = time.perf_counter()
+        for _ in range(repeat):
+            parse(text)
+        elapsed = time.perf_counter() - started
+        results[name] = {
+            'semesters': len(expected),
+            'us_per_call': round(elapsed / repeat * 1e6, 2),
+        }
+
+    return results
+
+
+def bench_monitors(count=20, rounds=3, latency=0.0, workers=None):
+    """N 个监控并发检查"""
+    server = FakeWebVPNServer(latency=latency, password=PASSWORD).start()
+    cwd = os.getcwd()
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            store = SessionStore(os.path.join(tmp, "session.json"))
+            monitors = []
+            for i in range(count):
+                monitor = quiet(GradeMonitor(f"23{i:05d}", PASSWORD, None, session_store=store))
+                monitor.base_url = server.base_url
+                monitor.last_grades_file = f"last_grades_{i}.json"
+                monitors.append(monitor)
+
+            def _check(monitor):
+                started = time.perf_counter()
+                monitor.run_check("4324")
+                return (time.perf_counter() - started) * 1000
+
+            report = []
+            with ThreadPoolExecutor(max_workers=workers or count) as executor:
+                for round_index in range(rounds):
+                    before = server.total_requests()
+                    started = time.perf_counter()
+                    latencies = list(executor.map(_check, monitors))
+                    wall = (time.perf_counter() - started) * 1000
+                    report.append({
+                        'round': round_index + 1,
+                        'wall_ms': round(wall, 2),
+                        'median_check_ms': round(statistics.median(latencies), 2),
+                        'max_check_ms': round(max(latencies), 2),
+                        'requests': server.total_requests() - before,
+                    })
+            return {'monitors': count, 'rounds': report, 'requests_by_endpoint': dict(server.request_counts)}
+    finally:
+        os.chdir(cwd)
+        server.stop()
+
+
+def print_table(title, rows, columns):
+    print(f"\n{title}")
+    print("-" * 80)
+    print("".join(f"{col:<24}" if i == 0 else f"{col:>14}" for i, col in enumerate(columns)))
+    for row in rows:
+        print("".join(f"{str(value):<24}" if i == 0 else f"{str(value):>14}" for i, value in enumerate(row)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NKU 成绩查询性能基准（离线）")
+    parser.add_argument("suite", nargs="*", help="要运行的基准：stages / parse / monitors / semesters，默认全部")
+    parser.add_argument("--latency", type=float, default=0.0, help="替身服务器每个请求的额外延迟(毫秒)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=500, help="解析基准的表格行数")
+    parser.add_argument("-n", "--monitors", type=int, default=20, help="并发监控数量")
+    parser.add_argument("--rounds", type=int, default=3, help="并发监控的检查轮数")
+    parser.add_argument("--json", help="把结果写入JSON文件")
+    args = parser.parse_args()
+
+    suites = args.suite or list(SUITES)
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        parser.error(f"未知的基准: {', '.join(sorted(unknown))}")
+    latency = args.latency / 1000
+    report = {}
+
+    if "stages" in suites:
+        report['stages'] = bench_stages(latency, args.repeat)
+        print_table("各阶段延迟", [(stage, r['requests'], r['median_ms'], r['min_ms'], r['max_ms'])
+                                   for stage, r in report['stages'].items()],
+                    ["阶段", "请求数", "中位数ms", "最小ms", "最大ms"])
+
+    if "parse" in suites:
+        report['parse'] = bench_parse(args.rows, max(args.repeat, 10))
+        print_table("解析吞吐量", [(backend, r['rows'], r['ms_per_page'], r['rows_per_second'])
+                                   for backend, r in report['parse'].items()],
+                    ["解析后端", "行数", "ms/页", "行/秒"])
+
+    if "monitors" in suites:
+        report['monitors'] = bench_monitors(args.monitors, args.rounds, latency)
+        print_table(f"{args.monitors} 个监控并发检查",
+                    [(f"第 {r['round']} 轮", r['requests'], r['wall_ms'], r['median_check_ms'], r['max_check_ms'])
+                     for r in report['monitors']['rounds']],
+                    ["轮次", "请求数", "总耗时ms", "中位数ms", "最大ms"])
+
+    if "semesters" in suites:
+        report['semesters'] = bench_semesters(max(args.repeat, 2000))
+        print_table("学期日历解析", [(name, r['semesters'], r['us_per_call'])
+                                     for name, r in report['semesters'].items()],
+                    ["解析器", "学期数", "us/次"])
+
+    # 客户端视角的各接口延迟（来自请求追踪钩子）
+    for line in get_default_metrics().summary_lines():
+        print(line)
+    report['request_metrics'] = get_default_metrics().report()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
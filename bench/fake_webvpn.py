@@ -0,0 +1,236 @@
+"""
+本地 WebVPN / 教务系统替身服务器
+
+模拟 login()、access_eamis()、get_dynamic_semesters()、get_grades() 用到的全部接口，
+用 fixtures/ 中的页面返回百分制、等级制和通过制成绩表格，可以离线测量每次改动的性能。
+另外提供 PushPlus 的替身接口 /send（见 push_url），用于测试推送分发。
+
+用法：
+    server = FakeWebVPNServer(latency=0.02).start()
+    checker.base_url = server.base_url
+    ...
+    server.stop()
+
+也可以单独运行：python bench/fake_webvpn.py --port 8080
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+SESSION_COOKIE = "wengine_vpn_ticketwebvpn_nankai_edu_cn"
+
+# 学期ID → 成绩页面，未列出的学期返回空表格
+DEFAULT_SEMESTER_PAGES = {
+    "4324": "grades_letter.html",
+    "4262": "grades_percent.html",
+    "4304": "grades_pass.html",
+}
+
+EMPTY_GRADE_PAGE = '<div class="grid"><table id="grid{grid_id}"><tbody id="grid{grid_id}_data"></tbody></table></div>'
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def endpoint_name(path):
+    """把请求路径归类为接口名，用于统计"""
+    if path.endswith("/api/v1/login"):
+        return "iam/login"
+    if path.endswith("/login"):
+        return "iam/login-page"
+    for suffix in ("person!search.action", "person.action", "dataQuery.action", "home.action"):
+        if path.endswith(suffix):
+            return f"eams/{suffix}"
+    if path.endswith("/eams"):
+        return "eams/entry"
+    if path.startswith("/wengine-vpn/"):
+        return path[1:]
+    return path or "/"
+
+
+class FakeWebVPNHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # 响应头和正文分两次写出，不关闭Nagle时每个请求会多出约40ms的延迟确认
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---- 工具方法 ----
+
+    def _send(self, status=200, body="", content_type="text/html; charset=UTF-8", headers=None):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length).decode("utf-8") if length else ""
+
+    def _session_valid(self):
+        cookie = self.headers.get("Cookie", "")
+        for part in cookie.split(";"):
+            name, _, value = part.strip().partition("=")
+            if name == SESSION_COOKIE:
+                return value in self.server.sessions
+        return False
+
+    def _handle(self, method):
+        server = self.server
+        url = urlsplit(self.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+        body = self._read_body() if method == "POST" else ""
+        name = endpoint_name(url.path)
+
+        with server.lock:
+            server.request_counts[name] += 1
+        if server.latency:
+            time.sleep(server.latency)
+
+        if name == "/send" and method == "POST":
+            # PushPlus 替身：记录收到的推送，前 push_failures 次返回502
+            with server.lock:
+                if server.push_failures > 0:
+                    server.push_failures -= 1
+                    fail = True
+                else:
+                    fail = False
+                    server.pushes.append(json.loads(body or "{}"))
+            if fail:
+                return self._send(status=502, body="bad gateway", content_type="text/plain")
+            return self._send(body='{"code": 200, "msg": "请求成功"}', content_type="application/json")
+
+        if name == "wengine-vpn/cookie":
+            return self._send(body="csrf-token=fake-csrf-token-0123456789; path=/", content_type="text/plain")
+
+        if name == "iam/login":
+            try:
+                payload = json.loads(body or "{}")
+            except ValueError:
+                payload = {}
+            if payload.get("password") != server.password:
+                return self._send(body='{"code": 401, "message": "fail"}', content_type="application/json")
+            ticket = uuid.uuid4().hex
+            with server.lock:
+                server.sessions.add(ticket)
+            return self._send(body='{"code": 0, "message": "success"}', content_type="application/json",
+                              headers={"Set-Cookie": f"{SESSION_COOKIE}={ticket}; Path=/"})
+
+        if name.startswith("eams/"):
+            if not self._session_valid():
+                # 会话失效：与真实服务器一样重定向到登录页
+                return self._send(status=302, headers={"Location": "/login"})
+
+            if name == "eams/home.action":
+                return self._send(body="<html><title>南开大学教务系统</title><body>home</body></html>")
+
+            if name == "eams/person.action":
+                return self._send(body='<div id="semesterBar4452416521Semester"></div>')
+
+            if name == "eams/dataQuery.action":
+                form = parse_qs(body)
+                if form.get("dataType") == ["semesterCalendar"]:
+                    return self._send(body=server.semester_calendar, content_type="text/plain")
+                return self._send(body="{}", content_type="text/plain")
+
+            if name == "eams/person!search.action":
+                semester_id = (query.get("semesterId") or [""])[0]
+                page = server.semester_pages.get(semester_id, EMPTY_GRADE_PAGE)
+                # 与真实页面一样，表格ID每次渲染都不同
+                return self._send(body=page.replace("{grid_id}", str(random.randint(10 ** 9, 10 ** 10))))
+
+        return self._send(body="<html><body>ok</body></html>")
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+
+class FakeWebVPNServer(ThreadingHTTPServer):
+    """可在测试/基准中启动的本地替身服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, password="fake-encrypted-password",
+                 semester_pages=None):
+        super().__init__((host, port), FakeWebVPNHandler)
+        self.latency = latency  # 每个请求额外的延迟(秒)，模拟WebVPN往返时间
+        self.password = password
+        self.sessions = set()
+        self.lock = threading.Lock()
+        self.request_counts = Counter()
+        self.pushes = []  # 收到的PushPlus推送请求体
+        self.push_failures = 0
+        self.semester_calendar = load_fixture("semester_calendar.txt")
+        self.semester_pages = {
+            semester_id: load_fixture(name)
+            for semester_id, name in (semester_pages or DEFAULT_SEMESTER_PAGES).items()
+        }
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name="fake-webvpn", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def total_requests(self):
+        with self.lock:
+            return sum(self.request_counts.values())
+
+    @property
+    def push_url(self):
+        """PushPlus替身地址，传给 PushDispatcher(url=...)"""
+        return f"{self.base_url}/send"
+
+    def expire_sessions(self):
+        """让所有已登录会话失效，用于测试重新登录路径"""
+        with self.lock:
+            self.sessions.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 WebVPN / 教务系统替身服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的额外延迟(毫秒)")
+    args = parser.parse_args()
+
+    server = FakeWebVPNServer(args.host, args.port, latency=args.latency / 1000)
+    print(f"替身服务器运行在 {server.base_url}，按 Ctrl+C 停止")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+南开大学 WebVPN 成绩查询工具 - 进程内成绩缓存
+
+GUI 查询、监控线程和守护进程共享同一份缓存：
+1. 以 (学号, 学期ID) 为键，保存最近一次解析出的成绩
+2. 超过 TTL 的条目视为过期，超过容量时淘汰最久未使用的条目
+3. 命中时不发起任何网络请求，需要最新数据时使用 force_refresh 跳过缓存
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class GradeCache:
+    """线程安全的 TTL + LRU 成绩缓存"""
+
+    def __init__(self, ttl=300, max_entries=64):
+        self.ttl = ttl  # 秒，<=0 时缓存不生效
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # {(学号, 学期ID): (写入时间, 成绩列表)}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(username, semester_id):
+        return str(username), str(semester_id)
+
+    def get(self, username, semester_id):
+        """返回未过期的成绩副本，未命中返回None"""
+        key = self._key(username, semester_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            grades = entry[1]
+        return [dict(g) for g in grades]
+
+    def age(self, username, semester_id):
+        """缓存条目已存在的秒数，不存在返回None"""
+        with self._lock:
+            entry = self._entries.get(self._key(username, semester_id))
+        return None if entry is None else time.monotonic() - entry[0]
+
+    def put(self, username, semester_id, grades):
+        if not grades or self.ttl <= 0:
+            return
+        key = self._key(username, semester_id)
+        snapshot = [dict(g) for g in grades]
+        with self._lock:
+            self._entries[key] = (time.monotonic(), snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def touch(self, username, semester_id):
+        """确认内容未变化（如页面摘要相同）时刷新条目的写入时间"""
+        key = self._key(username, semester_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (time.monotonic(), entry[1])
+                self._entries.move_to_end(key)
+
+    def invalidate(self, username=None, semester_id=None):
+        """删除指定账号/学期的条目，都不指定时清空缓存"""
+        with self._lock:
+            if username is None and semester_id is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if (username is None or key[0] == str(username)) and \
+                        (semester_id is None or key[1] == str(semester_id)):
+                    del self._entries[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_grade_cache():
+    """进程内共享的成绩缓存，查询和监控都读写这里"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = GradeCache()
+        return _default_cache
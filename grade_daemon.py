@@ -0,0 +1,374 @@
+"""
+南开大学 WebVPN 成绩查询工具 - 无界面守护进程
+
+在服务器上长期运行，托管多个账号的 GradeMonitor，并提供本地 HTTP/JSON 接口：
+
+    GET    /status                          所有账号的监控状态
+    GET    /accounts/<学号>                  单个账号的监控状态
+    GET    /accounts/<学号>/grades?semester=ID   最近一次检查得到的成绩（从内存读取，不访问WebVPN）
+    GET    /accounts/<学号>/logs?limit=N     最近的日志
+    GET    /metrics                         各WebVPN接口的请求延迟、字节数和状态码统计
+    POST   /accounts                        添加账号 {"username", "encrypted_password", "pushplus_token",
+                                                      "semester_id", "interval", "adaptive", "notifiers"}
+                                            notifiers 为通知渠道配置列表（smtp/webhook/file，见 notifiers.py）
+    POST   /accounts/<学号>/check            立即检查一次
+    DELETE /accounts/<学号>                  移除账号
+
+用法：
+    python grade_daemon.py --port 8765 --accounts daemon_accounts.json
+    python grade_daemon.py --token 自定义口令   # 请求需带 X-API-Token 请求头
+"""
+import argparse
+import collections
+import hmac
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from grade_logging import AccountLogger, setup_logging
+from grade_stats import GradeStats
+from grade_store import SQLiteGradeStore
+from monitor_scheduler import get_default_scheduler
+from nku_grades import GradeMonitor, SessionStore
+from notifiers import create_notifier
+from push_dispatcher import get_default_dispatcher
+from request_metrics import get_default_metrics
+
+
+class MonitoredAccount:
+    """守护进程中的一个账号：GradeMonitor + 调度任务 + 最近日志"""
+
+    def __init__(self, monitor, semester_id, interval, adaptive, log_size=200):
+        self.monitor = monitor
+        self.semester_id = str(semester_id)
+        self.interval = interval
+        self.adaptive = adaptive
+        self.job = None
+        self.logs = collections.deque(maxlen=log_size)
+
+    def to_config(self):
+        return {
+            'username': self.monitor.username,
+            'encrypted_password': self.monitor.encrypted_password,
+            'pushplus_token': self.monitor.pushplus_token,
+            'notifiers': self.monitor.notifiers,
+            'semester_id': self.semester_id,
+            'interval': self.interval,
+            'adaptive': self.adaptive,
+        }
+
+    def status(self):
+        monitor = self.monitor
+        job = self.job
+        next_run = job.next_run_time() if job else None
+        return {
+            'username': monitor.username,
+            'semester_id': self.semester_id,
+            'interval': self.interval,
+            'current_interval': monitor.current_interval,
+            'adaptive': self.adaptive,
+            'logged_in': monitor.logged_in,
+            'check_count': monitor.check_count,
+            'checking': bool(job and job.running),
+            'last_check_time': monitor.last_check_time.isoformat(timespec='seconds') if monitor.last_check_time else None,
+            'last_result': monitor.last_result,
+            'next_check_time': next_run.isoformat(timespec='seconds') if next_run else None,
+            'pushplus': bool(monitor.pushplus_token),
+            'notifiers': [notifier.get('type') for notifier in monitor.notifiers],
+            'stats': monitor.stats.summary() if len(monitor.stats) else None,
+        }
+
+
+class GradeDaemon:
+    """托管多个 GradeMonitor，所有检查由共享调度器驱动"""
+
+    def __init__(self, accounts_file="daemon_accounts.json", scheduler=None, grade_store=None,
+                 session_store=None, log_callback=None, dispatcher=None):
+        self.accounts_file = accounts_file
+        self.scheduler = scheduler or get_default_scheduler()
+        self.dispatcher = dispatcher or get_default_dispatcher()
+        self.grade_store = grade_store
+        self.session_store = session_store or SessionStore()
+        self.log_callback = log_callback
+        self.logger = AccountLogger(log_callback=log_callback)
+        self.accounts = {}
+        self._lock = threading.Lock()
+
+    def log(self, message):
+        self.logger.log_message(message)
+
+    # ---- 账号管理 ----
+
+    def load_accounts(self):
+        """从账号文件恢复上次运行时的所有账号"""
+        if not self.accounts_file or not os.path.exists(self.accounts_file):
+            return 0
+        try:
+            with open(self.accounts_file, 'r', encoding='utf-8') as f:
+                configs = json.load(f)
+        except Exception as e:
+            self.log(f"❌ 加载账号文件失败: {e}")
+            return 0
+
+        for config in configs:
+            self.add_account(persist=False, **config)
+        self.log(f"📂 已从 {self.accounts_file} 恢复 {len(configs)} 个账号")
+        return len(configs)
+
+    def save_accounts(self):
+        if not self.accounts_file:
+            return
+        with self._lock:
+            configs = [account.to_config() for account in self.accounts.values()]
+        try:
+            tmp_path = f"{self.accounts_file}.tmp"
+            # 账号文件中有加密密码和推送凭据，只允许当前用户读写
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump(configs, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.accounts_file)
+        except Exception as e:
+            self.log(f"❌ 保存账号文件失败: {e}")
+
+    def add_account(self, username, encrypted_password, pushplus_token=None, semester_id="4324",
+                    interval=30, adaptive=False, notifiers=None, persist=True):
+        """添加账号并开始监控，已存在的账号会先移除再按新配置添加"""
+        username = str(username)
+        interval = max(5, int(interval))
+        if username in self.accounts:
+            self.remove_account(username, persist=False)
+
+        account = MonitoredAccount(None, semester_id, interval, adaptive)
+
+        def _log(message):
+            account.logs.append(message)
+
+        monitor = GradeMonitor(username, encrypted_password, pushplus_token, log_callback=_log,
+                               session_store=self.session_store, grade_store=self.grade_store,
+                               dispatcher=self.dispatcher, notifiers=notifiers)
+        # 没有共享存储时每个账号单独保存历史成绩，避免互相覆盖
+        monitor.last_grades_file = f"last_grades_{username}.json"
+        if adaptive:
+            monitor.enable_adaptive(min_interval=5, max_interval=max(interval * 4, 60))
+        account.monitor = monitor
+
+        with self._lock:
+            self.accounts[username] = account
+        account.job = monitor.schedule(self.scheduler, account.semester_id, interval)
+
+        self.log(f"➕ 已添加账号 {username}，学期 {account.semester_id}，每 {interval} 分钟检查一次")
+        if persist:
+            self.save_accounts()
+        return account
+
+    def remove_account(self, username, persist=True):
+        with self._lock:
+            account = self.accounts.pop(str(username), None)
+        if account is None:
+            return False
+
+        if account.job:
+            account.job.cancel()
+        self.log(f"➖ 已移除账号 {username}")
+        if persist:
+            self.save_accounts()
+        return True
+
+    def check_now(self, username):
+        """立即安排一次检查，账号不存在返回None，检查正在进行返回False"""
+        account = self.accounts.get(str(username))
+        if account is None:
+            return None
+        return account.job.run_now()
+
+    def get_grades(self, username, semester_id=None):
+        """最近一次检查得到的成绩，内存中没有时读取历史记录"""
+        account = self.accounts.get(str(username))
+        if account is None:
+            return None
+
+        semester_id = str(semester_id or account.semester_id)
+        grades = account.monitor.latest_grades.get(semester_id)
+        source = 'memory'
+        if grades is None:
+            # 守护进程重启后、或页面未变化时尚未解析过：返回已保存的成绩
+            # 没有成绩数据库时历史文件只保存监控的学期，其他学期没有记录
+            source = 'history'
+            if account.monitor.grade_store is None and semester_id != account.semester_id:
+                grades = []
+            else:
+                grades = account.monitor.load_last_grades(semester_id)
+
+        return {'username': account.monitor.username, 'semester_id': semester_id,
+                'source': source, 'count': len(grades), 'stats': GradeStats(grades).summary(),
+                'grades': grades}
+
+    def status(self):
+        with self._lock:
+            accounts = list(self.accounts.values())
+        return {'accounts': [account.status() for account in accounts],
+                'scheduled_jobs': len(self.scheduler.jobs()),
+                'pending_pushes': self.dispatcher.pending()}
+
+    def shutdown(self):
+        with self._lock:
+            accounts = list(self.accounts.values())
+        for account in accounts:
+            if account.job:
+                account.job.cancel()
+        # 合并窗口中的通知立即发出，仍未成功的留在队列文件中，重启后继续发送
+        self.dispatcher.flush(timeout=10)
+        self.dispatcher.stop()
+
+
+class DaemonRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def daemon(self):
+        return self.server.grade_daemon
+
+    def _send_json(self, status, payload):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        body = json.loads(self.rfile.read(length).decode('utf-8'))
+        if not isinstance(body, dict):
+            # 由 _dispatch 转为 400
+            raise ValueError("请求体必须是JSON对象")
+        return body
+
+    def _authorized(self):
+        token = self.server.api_token
+        if not token:
+            return True
+        return hmac.compare_digest(self.headers.get("X-API-Token", ""), token)
+
+    def _dispatch(self, method):
+        if not self._authorized():
+            return self._send_json(401, {'error': 'unauthorized'})
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        parts = [part for part in url.path.split('/') if part]
+
+        try:
+            if method == "GET" and parts == ["status"]:
+                return self._send_json(200, self.daemon.status())
+            if method == "GET" and parts == ["metrics"]:
+                return self._send_json(200, get_default_metrics().report())
+
+            if parts[:1] != ["accounts"]:
+                return self._send_json(404, {'error': 'not found'})
+
+            if method == "POST" and len(parts) == 1:
+                body = self._read_json()
+                if not body.get('username') or not body.get('encrypted_password'):
+                    return self._send_json(400, {'error': '缺少 username 或 encrypted_password'})
+                fields = ('username', 'encrypted_password', 'pushplus_token', 'semester_id', 'interval', 'adaptive',
+                          'notifiers')
+                try:
+                    for config in body.get('notifiers') or []:
+                        create_notifier(config)
+                except (TypeError, ValueError) as e:
+                    return self._send_json(400, {'error': f'通知渠道配置错误: {e}'})
+                account = self.daemon.add_account(**{k: body[k] for k in fields if k in body})
+                return self._send_json(201, account.status())
+
+            if len(parts) < 2:
+                return self._send_json(404, {'error': 'not found'})
+            username = parts[1]
+            account = self.daemon.accounts.get(username)
+            if account is None:
+                return self._send_json(404, {'error': f'账号 {username} 不存在'})
+
+            if method == "GET" and len(parts) == 2:
+                return self._send_json(200, account.status())
+            if method == "DELETE" and len(parts) == 2:
+                self.daemon.remove_account(username)
+                return self._send_json(200, {'removed': username})
+            if method == "GET" and parts[2:] == ["grades"]:
+                semester_id = (query.get('semester') or [None])[0]
+                return self._send_json(200, self.daemon.get_grades(username, semester_id))
+            if method == "GET" and parts[2:] == ["logs"]:
+                limit = int((query.get('limit') or ['50'])[0])
+                logs = list(account.logs)
+                return self._send_json(200, {'username': username, 'logs': logs[-limit:] if limit > 0 else logs})
+            if method == "POST" and parts[2:] == ["check"]:
+                if not self.daemon.check_now(username):
+                    return self._send_json(409, {'error': '检查正在进行中'})
+                return self._send_json(202, {'scheduled': username})
+
+            return self._send_json(404, {'error': 'not found'})
+
+        except (ValueError, TypeError) as e:
+            return self._send_json(400, {'error': str(e)})
+        except Exception as e:
+            self.daemon.log(f"❌ 处理请求 {method} {url.path} 出错: {e}")
+            return self._send_json(500, {'error': str(e)})
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class DaemonHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, grade_daemon, host="127.0.0.1", port=8765, api_token=None):
+        super().__init__((host, port), DaemonRequestHandler)
+        self.grade_daemon = grade_daemon
+        self.api_token = api_token
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NKU 成绩监控守护进程")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址，默认只允许本机访问")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--accounts", default="daemon_accounts.json", help="账号文件，添加/移除账号时自动保存")
+    parser.add_argument("--db", help="使用SQLite保存成绩历史，如 grades.db")
+    parser.add_argument("--token", default=os.environ.get("NKU_DAEMON_TOKEN"), help="接口口令（X-API-Token）")
+    parser.add_argument("--log-level", help="日志级别 DEBUG/INFO/WARNING/ERROR，默认读取 NKU_LOG_LEVEL")
+    parser.add_argument("--log-json", help="同时把结构化日志（JSON行）写入该文件")
+    args = parser.parse_args()
+
+    setup_logging(level=args.log_level, json_file=args.log_json)
+
+    grade_store = SQLiteGradeStore(args.db) if args.db else None
+    daemon = GradeDaemon(args.accounts, grade_store=grade_store)
+    daemon.load_accounts()
+
+    server = DaemonHTTPServer(daemon, args.host, args.port, api_token=args.token)
+    daemon.log(f"🚀 守护进程已启动，接口地址 http://{args.host}:{server.server_address[1]}")
+    if not args.token and args.host not in ("127.0.0.1", "localhost"):
+        daemon.log("⚠️ 监听非本机地址但未设置 --token，任何人都可以管理账号")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        daemon.log("⚡ 收到中断信号，停止守护进程")
+    finally:
+        daemon.shutdown()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
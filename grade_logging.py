@@ -0,0 +1,148 @@
+"""
+南开大学 WebVPN 成绩查询工具 - 结构化异步日志
+
+替代每行日志同步 print() + 回调：
+1. 基于标准库 logging，有真实的级别（DEBUG/INFO/WARNING/ERROR），可用 NKU_LOG_LEVEL 环境变量调整
+2. 每条记录带账号上下文（record.account），可选的JSON文件输出保留这些字段
+3. 业务线程只把记录放入队列，控制台输出、文件写入和GUI/守护进程回调都在后台线程完成
+4. 未启用的DEBUG日志在入队前就被丢弃，调用方可用 isEnabledFor 跳过格式化
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+LOGGER_NAME = "nku_grades"
+
+# 日志内容以这些符号开头时，未指定级别的日志自动使用对应级别
+_LEVEL_PREFIXES = (("❌", logging.ERROR), ("⚠️", logging.WARNING))
+
+_setup_lock = threading.Lock()
+_listener = None
+_log_queue = None
+
+
+class ConsoleFormatter(logging.Formatter):
+    """与原来的输出保持一致：[时:分:秒] 消息"""
+
+    def __init__(self):
+        super().__init__("[%(asctime)s] %(message)s", datefmt="%H:%M:%S")
+
+
+class JSONFormatter(logging.Formatter):
+    """每行一个JSON对象，便于在服务器上检索"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            'level': record.levelname,
+            'account': getattr(record, 'account', None),
+            'message': record.getMessage(),
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class CallbackHandler(logging.Handler):
+    """把记录转发给产生它的实例的 log_callback（GUI日志框、守护进程的日志缓冲等）"""
+
+    def __init__(self):
+        super().__init__()
+        self.setFormatter(ConsoleFormatter())
+
+    def emit(self, record):
+        callback = getattr(record, 'log_callback', None)
+        if callback is None:
+            return
+        try:
+            callback(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+def setup_logging(level=None, console=True, json_file=None):
+    """配置日志管线（重复调用时替换原有配置）
+
+    level 默认读取环境变量 NKU_LOG_LEVEL，未设置时为 INFO。
+    """
+    global _listener, _log_queue
+
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+
+        level = level or os.environ.get("NKU_LOG_LEVEL", "INFO")
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(level.upper() if isinstance(level, str) else level)
+        logger.propagate = False
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+
+        handlers = [CallbackHandler()]
+        if console:
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(ConsoleFormatter())
+            handlers.append(console_handler)
+        if json_file:
+            file_handler = logging.FileHandler(json_file, encoding="utf-8")
+            file_handler.setFormatter(JSONFormatter())
+            handlers.append(file_handler)
+
+        _log_queue = queue.Queue()
+        # QueueHandler 入队时只预先格式化消息，账号和回调等上下文字段保留在记录上
+        logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+        _listener = logging.handlers.QueueListener(_log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        return logger
+
+
+def get_logger():
+    """返回根日志器，第一次使用时按默认配置启动管线"""
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is None:
+        setup_logging()
+    return logger
+
+
+def flush_logs():
+    """等待队列中的日志全部输出（在 input() 提示前调用，避免提示和日志交错）"""
+    if _log_queue is not None and _listener is not None:
+        _log_queue.join()
+
+
+def _shutdown():
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_shutdown)
+
+
+class AccountLogger(logging.LoggerAdapter):
+    """带账号上下文和回调的日志器，每个查询/监控实例一个"""
+
+    def __init__(self, account=None, log_callback=None):
+        super().__init__(get_logger(), {'account': account, 'log_callback': log_callback})
+
+    def process(self, msg, kwargs):
+        kwargs['extra'] = self.extra
+        return msg, kwargs
+
+    def log_message(self, message, level=None):
+        """按级别记录一条日志；未指定级别时按消息前缀推断"""
+        if level is None:
+            level = logging.INFO
+            for prefix, prefix_level in _LEVEL_PREFIXES:
+                if message.startswith(prefix):
+                    level = prefix_level
+                    break
+        elif isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+            if not isinstance(level, int):
+                level = logging.INFO
+
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, extra=self.extra)
@@ -0,0 +1,290 @@
+"""
+南开大学 WebVPN 成绩查询工具 - HTML报告渲染
+
+PushPlus推送用的成绩单和成绩变化通知：
+1. 页面片段在导入时定义一次，渲染时只做 format 填充，不再反复拼接大段f-string
+2. 课程行先收集到列表里，最后一次 join，长成绩单不会出现二次方的字符串拼接
+3. 等级颜色、分数颜色阈值等查找表提到模块级，不在每门课程的循环里重建
+4. 支持一次渲染多学期成绩总表
+"""
+from datetime import datetime
+
+from grade_stats import GradeStats
+
+FONT_FAMILY = "-apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif"
+
+LETTER_COLORS = {
+    'A': '#4CAF50', 'A-': '#66BB6A',
+    'B+': '#42A5F5', 'B': '#2196F3', 'B-': '#1E88E5',
+    'C+': '#FFA726', 'C': '#FF9800', 'C-': '#FB8C00',
+    'D': '#EF5350', 'F': '#F44336'
+}
+# (分数下限, 颜色)，从高到低
+SCORE_COLORS = ((90, '#4CAF50'), (80, '#2196F3'), (70, '#FF9800'), (60, '#FFC107'), (0, '#F44336'))
+PASS_LEVELS = frozenset({'通过', '合格'})
+DEFAULT_COLOR = '#757575'
+
+# ---- 页面片段 ----
+
+_PAGE_OPEN = f'<div style="font-family: {FONT_FAMILY}; max-width: 600px; margin: 0 auto;">'
+_PAGE_CLOSE = '</div>'
+
+_HEADER = (
+    '<div style="background: linear-gradient(135deg, {gradient}); color: white; padding: 25px; '
+    'border-radius: 15px 15px 0 0; text-align: center;">'
+    '<h2 style="margin: 0; font-size: 28px;">{title}</h2>'
+    '<p style="margin: 10px 0 0 0; opacity: 0.9;">{subtitle}</p>'
+    '</div>'
+)
+
+_CARD_OPEN = '<div style="background: white; padding: 20px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); margin-bottom: 20px;">'
+_SECTION_OPEN = (
+    '<div style="background: white; padding: 20px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); '
+    'border-radius: 10px; margin-bottom: 20px;">'
+    '<h3 style="margin: 0 0 20px 0; color: {color}; font-size: 20px;">{title}</h3>'
+)
+
+_GPA_BLOCK = (
+    '<div style="text-align: center;">'
+    '<h1 style="margin: 0; color: {color}; font-size: 48px; font-weight: bold;">{gpa:.3f}</h1>'
+    '<p style="margin: 5px 0 15px 0; color: #666; font-size: 18px;">{label}</p>'
+    '</div>'
+)
+
+_STAT_ROW_OPEN = '<div style="display: flex; justify-content: space-around; text-align: center; border-top: 1px solid #eee; padding-top: 15px;">'
+_STAT_ITEM = (
+    '<div><p style="margin: 0; color: #999; font-size: 14px;">{label}</p>'
+    '<p style="margin: 5px 0 0 0; color: #333; font-size: 24px; font-weight: bold;">{value}</p></div>'
+)
+_CHANGE_COUNT = (
+    '<div><h3 style="margin: 0; color: {color}; font-size: 36px; font-weight: bold;">{count}</h3>'
+    '<p style="margin: 5px 0 0 0; color: #666; font-size: 16px;">{label}</p></div>'
+)
+_CURRENT_GPA = (
+    '<p style="margin: 15px 0 0 0; padding-top: 15px; border-top: 1px solid #eee; text-align: center; '
+    'color: #666; font-size: 14px;">当前加权平均绩点 <b style="color: #333;">{gpa:.3f}</b> · '
+    '{courses} 门课程 · {credits:.1f} 学分</p>'
+)
+
+_COURSE_ROW = (
+    '<div style="display: flex; align-items: center; padding: 15px; background: {bg}; border-radius: 8px; '
+    'margin-bottom: 10px;{border}">'
+    '<div style="flex: 1;">'
+    '<h4 style="margin: 0; color: #333; font-size: 16px;">{name}</h4>'
+    '<p style="margin: 5px 0 0 0; color: #666; font-size: 14px;">{code} · {category} · {credits}学分</p>'
+    '</div>'
+    '<div style="text-align: right;">'
+    '<span style="display: inline-block; padding: 6px 12px; background: {color}; color: white; '
+    'border-radius: 20px; font-weight: bold; font-size: 16px;">{grade}</span>'
+    '<p style="margin: 5px 0 0 0; color: #666; font-size: 14px;">{gpa}</p>'
+    '</div>'
+    '</div>'
+)
+_UPDATED_ROW = (
+    '<div style="padding: 15px; background: {bg}; border-radius: 8px; margin-bottom: 10px; '
+    'border-left: 4px solid #2196F3;">'
+    '<h4 style="margin: 0 0 10px 0; color: #333; font-size: 16px;">{name}</h4>'
+    '<div style="display: flex; justify-content: space-between; align-items: center;">'
+    '<div style="color: #666; font-size: 14px;">{code} · {category} · {credits}学分</div>'
+    '<div style="text-align: right;">'
+    '<div style="margin-bottom: 5px;"><span style="color: #999; font-size: 12px;">原成绩: </span>'
+    '<span style="text-decoration: line-through; color: #999;">{previous}</span></div>'
+    '<div><span style="color: #999; font-size: 12px;">新成绩: </span>'
+    '<span style="color: #2196F3; font-weight: bold; font-size: 16px;">{current}</span></div>'
+    '</div>'
+    '</div>'
+    '</div>'
+)
+
+_FOOTER = (
+    '<div style="text-align: center; color: #999; font-size: 12px; margin-top: 20px; padding: 20px;">'
+    '<p>{time_label}：{time}</p>'
+    '<p style="margin-top: 10px;">{slogan}</p>'
+    '</div>'
+)
+
+# 课程行的背景色（奇偶交替）和左边框
+_ROW_STYLES = {
+    'report': (("#f8f9fa", "#ffffff"), ""),
+    'new': (("#e8f5e8", "#f0f8f0"), " border-left: 4px solid #4CAF50;"),
+}
+_UPDATED_BACKGROUNDS = ("#e3f2fd", "#f0f8ff")
+
+
+def grade_color(grade):
+    """成绩标签的背景色"""
+    grade_type = grade.get('成绩类型', '未知')
+    if grade_type == '等级制':
+        return LETTER_COLORS.get(grade['等级'], DEFAULT_COLOR)
+    if grade_type == '百分制':
+        score = grade.get('分数', 0)
+        for lower, color in SCORE_COLORS:
+            if score >= lower:
+                return color
+        return SCORE_COLORS[-1][1]
+    if grade_type == '通过制':
+        return '#4CAF50' if grade['等级'] in PASS_LEVELS else '#F44336'
+    return DEFAULT_COLOR
+
+
+def gpa_color(gpa):
+    return "#4CAF50" if gpa >= 3.5 else "#2196F3" if gpa >= 3.0 else "#FF9800"
+
+
+def _course_row(grade, index, style='report'):
+    backgrounds, border = _ROW_STYLES[style]
+    if grade.get('成绩类型') == '百分制':
+        display_grade = f"{grade.get('分数', 0):.0f}分"
+    else:
+        display_grade = grade['等级']
+    if grade.get('绩点') is not None:
+        gpa_display = f"绩点 {grade['绩点']:.1f}"
+    else:
+        gpa_display = grade.get('绩点文本', '--')
+    return _COURSE_ROW.format(
+        bg=backgrounds[index % 2], border=border,
+        name=grade['课程名称'], code=grade['课程代码'], category=grade['课程类别'], credits=grade['学分'],
+        color=grade_color(grade), grade=display_grade, gpa=gpa_display,
+    )
+
+
+def _stats_card(parts, stats, gpa_label="加权平均绩点"):
+    """GPA大字 + 课程数/总学分/平均分（或等级制门数）"""
+    parts.append(_CARD_OPEN)
+    if stats.gpa_credits > 0:
+        parts.append(_GPA_BLOCK.format(color=gpa_color(stats.avg_gpa), gpa=stats.avg_gpa, label=gpa_label))
+    parts.append(_STAT_ROW_OPEN)
+    parts.append(_STAT_ITEM.format(label="课程数", value=len(stats)))
+    parts.append(_STAT_ITEM.format(label="总学分", value=f"{stats.total_credits:.1f}"))
+    # 动态显示第三个统计项
+    if stats.score_count:
+        parts.append(_STAT_ITEM.format(label="平均分", value=f"{stats.avg_score:.1f}分"))
+    elif stats.count('等级制'):
+        parts.append(_STAT_ITEM.format(label="等级制", value=f"{stats.count('等级制')}门"))
+    parts.append('</div></div>')
+
+
+def _course_section(parts, title, grades, color="#333", style='report'):
+    parts.append(_SECTION_OPEN.format(color=color, title=title))
+    parts.extend(_course_row(grade, i, style) for i, grade in enumerate(grades))
+    parts.append('</div>')
+
+
+def _now(now):
+    return (now or datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def render_grade_report(grades, semester_id, title_prefix="学期成绩单", now=None):
+    """单个学期的成绩单"""
+    if not grades:
+        return "<p>没有成绩数据</p>"
+
+    parts = [_PAGE_OPEN, _HEADER.format(gradient="#667eea 0%, #764ba2 100%", title=f"🎓 {title_prefix}",
+                                        subtitle=f"学期 {semester_id}")]
+    _stats_card(parts, GradeStats(grades))
+    _course_section(parts, "📚 课程成绩明细", grades)
+    parts.append(_FOOTER.format(time_label="查询时间", time=_now(now), slogan="🎉 继续加油！"))
+    parts.append(_PAGE_CLOSE)
+    return "".join(parts)
+
+
+def render_transcript(transcript, title_prefix="成绩总表", now=None):
+    """多学期成绩总表：顶部是累计统计，每个学期一个课程分区
+
+    transcript 是 get_all_grades 的返回值 {学期ID: {'semester': 学期信息, 'grades': [...]}}，
+    也可以直接传 {学期ID: [成绩, ...]}。
+    """
+    sections = []
+    stats = GradeStats()
+    for semester_id, entry in transcript.items():
+        if isinstance(entry, dict):
+            grades = entry.get('grades') or []
+            name = (entry.get('semester') or {}).get('display_name') or f"学期 {semester_id}"
+        else:
+            grades, name = entry or [], f"学期 {semester_id}"
+        if grades:
+            stats.sync(grades, scope=str(semester_id))
+            sections.append((name, grades))
+    if not sections:
+        return "<p>没有成绩数据</p>"
+
+    parts = [_PAGE_OPEN, _HEADER.format(gradient="#667eea 0%, #764ba2 100%", title=f"🎓 {title_prefix}",
+                                        subtitle=f"共 {len(sections)} 个学期")]
+    _stats_card(parts, stats, gpa_label="累计加权平均绩点")
+    for name, grades in sections:
+        semester_stats = GradeStats(grades)
+        title = f"📚 {name} · {len(grades)}门 · 绩点 {semester_stats.avg_gpa:.3f}"
+        _course_section(parts, title, grades)
+    parts.append(_FOOTER.format(time_label="查询时间", time=_now(now), slogan="🎉 继续加油！"))
+    parts.append(_PAGE_CLOSE)
+    return "".join(parts)
+
+
+def change_title(new_courses, updated_courses):
+    """成绩变化通知的标题"""
+    if new_courses and updated_courses:
+        return f"🎓 成绩更新通知 - 新增{len(new_courses)}门，更新{len(updated_courses)}门"
+    if new_courses:
+        return f"🎓 新增成绩通知 - {len(new_courses)}门课程"
+    return f"🎓 成绩更新通知 - {len(updated_courses)}门课程"
+
+
+def render_change_notification(new_courses, updated_courses, semester_id, summary=None, now=None):
+    """成绩变化通知：新增课程和成绩更新的课程
+
+    summary 为 GradeStats.summary() 的结果，有计入绩点的课程时附带当前的加权平均绩点。
+    """
+    total_changes = len(new_courses) + len(updated_courses)
+    parts = [
+        _PAGE_OPEN,
+        _HEADER.format(gradient="#FF6B6B 0%, #4ECDC4 100%", title="🎉 成绩更新通知",
+                       subtitle=f"学期 {semester_id} · 共 {total_changes} 门课程有变化"),
+        _CARD_OPEN,
+        '<div style="display: flex; justify-content: space-around; text-align: center;">',
+        _CHANGE_COUNT.format(color="#4CAF50", count=len(new_courses), label="新增课程"),
+        _CHANGE_COUNT.format(color="#2196F3", count=len(updated_courses), label="更新课程"),
+        '</div>',
+    ]
+    if summary and summary.get('gpa_credits'):
+        parts.append(_CURRENT_GPA.format(gpa=summary['avg_gpa'], courses=summary['courses'],
+                                         credits=summary['total_credits']))
+    parts.append('</div>')
+
+    if new_courses:
+        _course_section(parts, "🆕 新增课程", new_courses, color="#4CAF50", style='new')
+
+    if updated_courses:
+        parts.append(_SECTION_OPEN.format(color="#2196F3", title="📝 更新课程"))
+        for i, change in enumerate(updated_courses):
+            current = change['current']
+            parts.append(_UPDATED_ROW.format(
+                bg=_UPDATED_BACKGROUNDS[i % 2],
+                name=current['课程名称'], code=current['课程代码'], category=current['课程类别'],
+                credits=current['学分'], previous=change['previous']['等级'], current=current['等级'],
+            ))
+        parts.append('</div>')
+
+    parts.append(_FOOTER.format(time_label="检查时间", time=_now(now), slogan="🎉 恭喜获得新成绩！继续加油！"))
+    parts.append(_PAGE_CLOSE)
+    return "".join(parts)
+
+
+def render_change_text(new_courses, updated_courses, semester_id, summary=None, now=None):
+    """成绩变化通知的纯文本版本（邮件正文、Webhook等）"""
+    lines = [f"{change_title(new_courses, updated_courses)}", f"学期 {semester_id}"]
+    if summary and summary.get('gpa_credits'):
+        lines.append(f"当前加权平均绩点 {summary['avg_gpa']:.3f} · {summary['courses']} 门课程 · "
+                     f"{summary['total_credits']:.1f} 学分")
+    if new_courses:
+        lines.append("")
+        lines.append("🆕 新增课程")
+        lines.extend(f"- {g['课程名称']} ({g['课程代码']} · {g['学分']}学分): {g['等级']}" for g in new_courses)
+    if updated_courses:
+        lines.append("")
+        lines.append("📝 更新课程")
+        lines.extend(f"- {c['current']['课程名称']} ({c['current']['课程代码']}): "
+                     f"{c['previous']['等级']} → {c['current']['等级']}" for c in updated_courses)
+    lines.append("")
+    lines.append(f"检查时间：{_now(now)}")
+    return "\n".join(lines)
+
@@ -0,0 +1,152 @@
+"""
+南开大学 WebVPN 成绩查询工具 - 成绩统计
+
+命令行成绩单、HTML推送和GUI统计页共用同一套统计规则：
+1. 一次遍历得到总学分、加权平均绩点、百分制平均分/加权平均分、各成绩类型门数和等级分布
+2. 所有统计量都是可加的累加值，增加/更新/删除一门课程只需调整这门课程的贡献
+3. sync() 按课程比较新旧成绩，只对变化的课程做增量调整，适合监控每次轮询后更新多学期累计统计
+"""
+import threading
+from collections import Counter
+
+# 等级分布的显示顺序，未列出的等级（如百分制的“85.0分”）排在后面
+GRADE_ORDER = ['A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D', 'F', '通过', '合格', '不通过', '不合格']
+
+
+def course_key(grade):
+    """课程的唯一键：同一门课程在不同学期重修时分别统计"""
+    return grade.get('学年学期'), grade['课程代码'], grade.get('课程序号')
+
+
+class GradeStats:
+    """可增量更新的成绩统计，监控线程更新、守护进程读取时线程安全"""
+
+    def __init__(self, grades=None):
+        self._lock = threading.RLock()
+        self.courses = {}  # {课程键: 成绩}
+        self._scopes = {}  # {范围(如学期ID): 该范围内的课程键集合}
+        self.total_credits = 0.0
+        self.gpa_credits = 0.0  # 计入绩点的学分
+        self.weighted_gpa = 0.0  # Σ 学分 × 绩点
+        self.score_count = 0  # 百分制课程门数
+        self.score_sum = 0.0
+        self.score_credits = 0.0
+        self.weighted_score = 0.0  # Σ 学分 × 分数
+        self.type_counts = Counter()  # {成绩类型: 门数}
+        self.level_counts = Counter()  # {等级: 门数}
+        if grades:
+            for grade in grades:
+                self.add(grade)
+
+    def __len__(self):
+        return len(self.courses)
+
+    def _apply(self, grade, sign):
+        credits = grade['学分']
+        grade_type = grade.get('成绩类型', '未知')
+        self.total_credits += sign * credits
+        if grade.get('绩点') is not None:
+            self.gpa_credits += sign * credits
+            self.weighted_gpa += sign * credits * grade['绩点']
+        if grade_type == '百分制':
+            score = grade.get('分数', 0)
+            self.score_count += sign
+            self.score_sum += sign * score
+            self.score_credits += sign * credits
+            self.weighted_score += sign * credits * score
+        for counter, name in ((self.type_counts, grade_type), (self.level_counts, grade['等级'])):
+            counter[name] += sign
+            # 删除后计数为0的项不再出现在分布里
+            if counter[name] <= 0:
+                del counter[name]
+
+    def add(self, grade, scope=None):
+        """增加一门课程，已存在时按更新处理"""
+        key = course_key(grade)
+        with self._lock:
+            previous = self.courses.get(key)
+            if previous is not None:
+                self._apply(previous, -1)
+            self.courses[key] = grade
+            self._apply(grade, 1)
+            if scope is not None:
+                self._scopes.setdefault(scope, set()).add(key)
+
+    update = add
+
+    def remove(self, key):
+        """删除一门课程（课程键或成绩字典），返回被删除的成绩"""
+        if isinstance(key, dict):
+            key = course_key(key)
+        with self._lock:
+            grade = self.courses.pop(key, None)
+            if grade is not None:
+                self._apply(grade, -1)
+                for keys in self._scopes.values():
+                    keys.discard(key)
+        return grade
+
+    def sync(self, grades, scope=None):
+        """用一份完整的成绩列表替换某个范围内的课程，只调整有变化的课程
+
+        scope 为None时替换全部课程；多学期累计统计时传入学期ID，只影响该学期的课程。
+        返回 (新增门数, 更新门数, 删除门数)。
+        """
+        with self._lock:
+            old_keys = set(self.courses) if scope is None else set(self._scopes.get(scope, ()))
+            seen = set()
+            added = updated = 0
+            for grade in grades:
+                key = course_key(grade)
+                seen.add(key)
+                previous = self.courses.get(key)
+                if previous is None:
+                    added += 1
+                elif previous == grade:
+                    continue
+                else:
+                    updated += 1
+                self.add(grade, scope)
+            removed = old_keys - seen
+            for key in removed:
+                self.remove(key)
+            if scope is not None:
+                self._scopes[scope] = seen
+        return added, updated, len(removed)
+
+    @property
+    def avg_gpa(self):
+        """加权平均绩点，没有计入绩点的课程时为0"""
+        return self.weighted_gpa / self.gpa_credits if self.gpa_credits > 0 else 0
+
+    @property
+    def avg_score(self):
+        return self.score_sum / self.score_count if self.score_count else 0
+
+    @property
+    def weighted_avg_score(self):
+        return self.weighted_score / self.score_credits if self.score_credits > 0 else 0
+
+    def count(self, grade_type):
+        """某种成绩类型（等级制/百分制/通过制/其他）的门数"""
+        return self.type_counts.get(grade_type, 0)
+
+    def distribution(self):
+        """按等级顺序排列的 [(等级, 门数)]"""
+        ordered = [(level, self.level_counts[level]) for level in GRADE_ORDER if level in self.level_counts]
+        others = sorted(level for level in self.level_counts if level not in GRADE_ORDER)
+        return ordered + [(level, self.level_counts[level]) for level in others]
+
+    def summary(self):
+        with self._lock:
+            return {
+                'courses': len(self.courses),
+                'total_credits': self.total_credits,
+                'gpa_credits': self.gpa_credits,
+                'avg_gpa': round(self.avg_gpa, 3),
+                'score_courses': self.score_count,
+                'avg_score': round(self.avg_score, 1),
+                'weighted_avg_score': round(self.weighted_avg_score, 1),
+                'type_counts': dict(self.type_counts),
+                'distribution': dict(self.distribution()),
+            }
@@ -0,0 +1,165 @@
+"""
+南开大学 WebVPN 成绩查询工具 - SQLite 成绩历史存储
+
+替代单个 last_grades.json：
+1. 每个 (账号, 学期, 课程代码) 一行，记录首次出现和最后变化时间
+2. 只写入发生变化的课程（批量 upsert），不再整文件重写
+3. 多个监控（线程或进程）可以共享同一个数据库文件
+"""
+import sqlite3
+import threading
+import time
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS grades (
+    account      TEXT NOT NULL,
+    semester_id  TEXT NOT NULL,
+    course_code  TEXT NOT NULL,
+    course_name  TEXT,
+    level        TEXT,
+    credits      REAL,
+    gpa          REAL,
+    grade_type   TEXT,
+    score        REAL,
+    first_seen   REAL NOT NULL,
+    last_changed REAL NOT NULL,
+    PRIMARY KEY (account, semester_id, course_code)
+);
+CREATE TABLE IF NOT EXISTS page_digests (
+    account     TEXT NOT NULL,
+    semester_id TEXT NOT NULL,
+    digest      TEXT NOT NULL,
+    updated_at  REAL NOT NULL,
+    PRIMARY KEY (account, semester_id)
+);
+"""
+
+# 只有成绩字段真正变化时才更新，未变化的行保持原样（包括 last_changed）
+UPSERT_GRADE = """
+INSERT INTO grades (account, semester_id, course_code, course_name, level, credits, gpa,
+                    grade_type, score, first_seen, last_changed)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (account, semester_id, course_code) DO UPDATE SET
+    course_name = excluded.course_name,
+    level = excluded.level,
+    credits = excluded.credits,
+    gpa = excluded.gpa,
+    grade_type = excluded.grade_type,
+    score = excluded.score,
+    last_changed = excluded.last_changed
+WHERE grades.level IS NOT excluded.level
+   OR grades.gpa IS NOT excluded.gpa
+   OR grades.score IS NOT excluded.score
+   OR grades.credits IS NOT excluded.credits
+   OR grades.course_name IS NOT excluded.course_name
+   OR grades.grade_type IS NOT excluded.grade_type
+"""
+
+
+class SQLiteGradeStore:
+    """SQLite成绩历史存储，线程安全（每个线程一个连接）"""
+
+    def __init__(self, path="grades.db"):
+        self.path = path
+        self._local = threading.local()
+        # 所有线程打开的连接，close() 时统一关闭，线程结束后连接不会泄漏到进程退出
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # 不在集合中说明已被 close() 关闭，重新打开
+        if conn is None or conn not in self._connections:
+            # timeout 让多个进程同时写入时等待锁，而不是直接报错；
+            # 连接只在打开它的线程中使用，check_same_thread=False 只是为了让 close() 能在其他线程关闭它
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._connections_lock:
+                self._connections.add(conn)
+            self._local.conn = conn
+        return conn
+
+    def load_grades(self, account, semester_id):
+        """读取某账号某学期的历史成绩，格式与 last_grades.json 中的记录相同"""
+        rows = self._connect().execute(
+            "SELECT course_code, course_name, level, credits, gpa, grade_type, score "
+            "FROM grades WHERE account = ? AND semester_id = ?",
+            (account, str(semester_id))
+        ).fetchall()
+
+        return [{
+            '课程代码': course_code,
+            '课程名称': course_name,
+            '等级': level,
+            '学分': credits,
+            '绩点': gpa,
+            '成绩类型': grade_type,
+            '分数': score
+        } for course_code, course_name, level, credits, gpa, grade_type, score in rows]
+
+    def save_grades(self, account, semester_id, grades):
+        """批量写入课程成绩，只有内容变化的行会被更新，返回实际写入的行数"""
+        if not grades:
+            return 0
+
+        now = time.time()
+        params = [(
+            account, str(semester_id), g['课程代码'], g['课程名称'], g['等级'], g['学分'],
+            g.get('绩点'), g.get('成绩类型', '未知'), g.get('分数'), now, now
+        ) for g in grades]
+
+        conn = self._connect()
+        with conn:
+            before = conn.total_changes
+            conn.executemany(UPSERT_GRADE, params)
+            return conn.total_changes - before
+
+    def grade_history(self, account, semester_id=None):
+        """查询成绩记录及首次出现/最后变化时间"""
+        sql = ("SELECT semester_id, course_code, course_name, level, gpa, first_seen, last_changed "
+               "FROM grades WHERE account = ?")
+        args = [account]
+        if semester_id is not None:
+            sql += " AND semester_id = ?"
+            args.append(str(semester_id))
+        sql += " ORDER BY last_changed DESC"
+
+        return [{
+            'semester_id': row[0],
+            '课程代码': row[1],
+            '课程名称': row[2],
+            '等级': row[3],
+            '绩点': row[4],
+            'first_seen': row[5],
+            'last_changed': row[6],
+        } for row in self._connect().execute(sql, args)]
+
+    def get_digest(self, account, semester_id):
+        row = self._connect().execute(
+            "SELECT digest FROM page_digests WHERE account = ? AND semester_id = ?",
+            (account, str(semester_id))
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_digest(self, account, semester_id, digest):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT INTO page_digests (account, semester_id, digest, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (account, semester_id) DO UPDATE SET digest = excluded.digest, "
+                "updated_at = excluded.updated_at",
+                (account, str(semester_id), digest, time.time())
+            )
+
+    def close(self):
+        """关闭所有线程打开的连接，应在其他线程不再读写时调用；之后再使用会重新打开连接"""
+        with self._connections_lock:
+            connections = list(self._connections)
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        self._local.conn = None
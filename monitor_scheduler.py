@@ -0,0 +1,208 @@
+"""
+南开大学 WebVPN 成绩查询工具 - 共享监控调度器
+
+所有监控注册到同一个调度器：
+1. 一个调度线程维护"下次运行时间"的小顶堆，用 Condition.wait 等到最近的截止时间，空闲时不占CPU
+2. 到期的检查交给线程池执行，单个账号的慢请求不会拖住其他账号
+3. 取消立即生效，不必等待当前的睡眠结束
+4. 首次运行时间和每次的间隔都加入随机抖动，避免大量相同间隔的账号同时请求（包括启动时）
+"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from grade_logging import AccountLogger
+
+
+class ScheduledJob:
+    """调度器中的一个周期任务"""
+
+    def __init__(self, scheduler, func, interval, name=None, on_reschedule=None, on_error=None,
+                 interval_func=None):
+        self.scheduler = scheduler
+        self.func = func
+        self.interval = interval  # 秒，可在运行中修改，下次重新排期时生效
+        self.interval_func = interval_func  # 每次运行后调用，返回下次间隔(秒)，用于自适应轮询
+        self.name = name or getattr(func, '__name__', 'job')
+        self.on_reschedule = on_reschedule  # 每次排期后回调 on_reschedule(job)
+        self.on_error = on_error  # 任务抛出异常时回调 on_error(job, exc)
+
+        self.next_run = None  # time.monotonic() 截止时间，运行中或已取消时为None
+        self.running = False
+        self.run_count = 0
+        self.cancelled = False
+        self._cancelled_event = threading.Event()
+
+    def seconds_until_next(self):
+        """距下次运行的秒数，没有排期时返回None"""
+        next_run = self.next_run
+        if next_run is None:
+            return None
+        return max(0.0, next_run - time.monotonic())
+
+    def next_run_time(self):
+        """下次运行的本地时间，没有排期时返回None"""
+        remaining = self.seconds_until_next()
+        if remaining is None:
+            return None
+        return datetime.fromtimestamp(time.time() + remaining)
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+    def run_now(self):
+        return self.scheduler.run_now(self)
+
+    def wait_cancelled(self, timeout=None):
+        """阻塞直到任务被取消，超时返回False"""
+        return self._cancelled_event.wait(timeout)
+
+
+class MonitorScheduler:
+    """基于截止时间堆的共享调度器"""
+
+    def __init__(self, max_workers=8, jitter=0.1, retry_delay=60, log_callback=None):
+        self.jitter = jitter  # 间隔的随机抖动比例
+        self.retry_delay = retry_delay  # 任务出错后的重试等待(秒)
+        self.log_callback = log_callback
+        self.logger = AccountLogger(log_callback=log_callback)
+
+        self._heap = []  # [(截止时间, 序号, job)]，取消或重新排期的旧条目在弹出时丢弃
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="grade-monitor")
+        self._thread = None
+        self._stopped = False
+
+    def log(self, message):
+        self.logger.log_message(message)
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="grade-scheduler", daemon=True)
+                self._thread.start()
+        return self
+
+    def add_job(self, func, interval, name=None, first_delay=None, on_reschedule=None, on_error=None,
+                interval_func=None):
+        """注册周期任务，first_delay 秒后首次运行，之后每次运行结束后间隔 interval 秒
+
+        first_delay 为None时在 [0, jitter * interval] 内随机选取，同时注册的相同间隔任务错开首次运行；
+        需要立即运行时传入0。
+        提供 interval_func 时，每次成功运行后用它的返回值更新 interval。
+        """
+        job = ScheduledJob(self, func, interval, name, on_reschedule, on_error, interval_func)
+        if first_delay is None:
+            first_delay = random.uniform(0, self.jitter * interval)
+        self.start()
+        self._push(job, first_delay)
+        return job
+
+    def cancel(self, job):
+        with self._cond:
+            job.cancelled = True
+            job.next_run = None
+            self._cond.notify()
+        job._cancelled_event.set()
+
+    def run_now(self, job):
+        """立即运行任务（任务正在运行或已取消时返回False）"""
+        with self._cond:
+            # 与调度线程标记 running 在同一把锁下判断，避免同一任务并发运行两次
+            if job.cancelled or job.running:
+                return False
+            self._push(job, 0)
+        return True
+
+    def stop(self, wait=False):
+        """停止调度器，取消所有任务"""
+        with self._cond:
+            self._stopped = True
+            jobs = [job for _, _, job in self._heap]
+            self._heap.clear()
+            self._cond.notify()
+        for job in jobs:
+            job.cancelled = True
+            job._cancelled_event.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def jobs(self):
+        """已排期的任务（不含已取消的任务和重新排期留下的旧条目）"""
+        with self._cond:
+            return [job for deadline, _, job in self._heap if not job.cancelled and deadline == job.next_run]
+
+    def _jittered(self, interval):
+        if not self.jitter:
+            return interval
+        return max(0.0, interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def _push(self, job, delay):
+        with self._cond:
+            if self._stopped or job.cancelled:
+                return
+            job.next_run = time.monotonic() + delay
+            heapq.heappush(self._heap, (job.next_run, next(self._counter), job))
+            self._cond.notify()
+
+    def _loop(self):
+        with self._cond:
+            while not self._stopped:
+                # 丢弃已取消或已重新排期的旧条目
+                while self._heap and (self._heap[0][2].cancelled or self._heap[0][0] != self._heap[0][2].next_run):
+                    heapq.heappop(self._heap)
+
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+
+                deadline = self._heap[0][0]
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+
+                _, _, job = heapq.heappop(self._heap)
+                job.next_run = None
+                job.running = True
+                self._executor.submit(self._run_job, job)
+
+    def _run_job(self, job):
+        delay = min(self.retry_delay, job.interval)  # 出错时的重试等待
+        try:
+            job.func()
+            if job.interval_func:
+                job.interval = job.interval_func()
+            delay = job.interval
+        except Exception as e:
+            if job.on_error:
+                job.on_error(job, e)
+            else:
+                self.log(f"❌ 任务 {job.name} 出错: {e}")
+        finally:
+            with self._cond:
+                # 结束运行和重新排期之间不能插入 run_now，否则立即运行的请求会被覆盖
+                job.running = False
+                job.run_count += 1
+                self._push(job, self._jittered(delay))
+                scheduled = job.next_run is not None
+
+        if scheduled and job.on_reschedule:
+            job.on_reschedule(job)
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_default_scheduler():
+    """进程内共享的调度器，CLI、GUI和守护进程的监控都注册到这里"""
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = MonitorScheduler().start()
+        return _default_scheduler
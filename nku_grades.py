@@ -6,23 +6,109 @@
 2. 增强监控推送，使用HTML格式显示新成绩详情
 3. 统一日志接口，支持GUI和命令行双重输出
 """
-import requests
 import time
 import json
 import re
 import os
+import threading
+import hashlib
+import functools
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from html.parser import HTMLParser
 
-class WebVPNGradeChecker:
-    def __init__(self, username, encrypted_password, log_callback=None):
-        self.session = requests.Session()
-        self.base_url = "https://webvpn.nankai.edu.cn"
-        self.username = username
+from grade_cache import get_default_grade_cache
+from grade_logging import AccountLogger, flush_logs
+from grade_report import render_change_notification, render_grade_report, render_transcript
+from notifiers import Notification, PushPlusNotifier, create_notifier
+from push_dispatcher import get_default_dispatcher
+from semester_catalog import get_default_semester_catalog, parse_semester_calendar
+from grade_stats import GradeStats
+from transport import DEFAULT_TRANSPORT
+from monitor_scheduler import MonitorScheduler
+
+
+class SessionStore:
+    """WebVPN会话缓存 - 将登录后的Cookie和CSRF Token保存到磁盘，带过期时间
+
+    请求头不保存：基础请求头在创建会话时设置，其余请求头按次传入，登录不会改变它们。
+    缓存文件中是有效的登录Cookie，只允许当前用户读写。
+    """
+
+    DEFAULT_TTL = 2 * 60 * 60  # 缓存会话默认有效期(秒)
+
+    _lock = threading.Lock()  # 多个监控线程共享同一个缓存文件
+
+    def __init__(self, path="webvpn_session.json", ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    def _read_all(self):
+        try:
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception:
+            pass
+        return {}
+
+    def _write_all(self, data):
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def load(self, username):
+        """读取未过期的会话，过期或不存在返回None"""
+        with self._lock:
+            entry = self._read_all().get(username)
+        if not entry or entry.get('expires_at', 0) <= time.time():
+            return None
+        return entry
+
+    def save(self, username, session, csrf_token=None):
+        """保存会话的Cookie和CSRF Token"""
+        cookies = [{
+            'name': c.name,
+            'value': c.value,
+            'domain': c.domain,
+            'path': c.path,
+            'expires': c.expires,
+            'secure': c.secure,
+        } for c in session.cookies]
+
+        now = time.time()
+        entry = {
+            'cookies': cookies,
+            'csrf_token': csrf_token,
+            'saved_at': now,
+            'expires_at': now + self.ttl,
+        }
+
+        with self._lock:
+            data = self._read_all()
+            data[username] = entry
+            self._write_all(data)
+
+    def invalidate(self, username):
+        """删除指定账号的缓存会话"""
+        with self._lock:
+            data = self._read_all()
+            if data.pop(username, None) is not None:
+                self._write_all(data)
+
+
+class AccountSession:
+    """一个账号的登录状态：requests.Session、CSRF Token 和成绩页tagId，可被多个查询实例共享"""
+
+    def __init__(self, encrypted_password=None, transport=None):
+        self.transport = transport or DEFAULT_TRANSPORT
+        self.session = self.transport.create_session()
         self.encrypted_password = encrypted_password
-        self.semester_data = None
-        self.log_callback = log_callback  # GUI日志回调函数
         
-        # 设置请求头
+        # 基础请求头只在创建会话时设置一次，之后各请求的专用请求头按次传入
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/115.0',
             'Accept': '*/*',
@@ -33,21 +119,254 @@ class WebVPNGradeChecker:
             'Sec-Fetch-Mode': 'cors',
             'Sec-Fetch-Site': 'same-origin',
         })
+
+        self.lock = threading.RLock()  # 登录和恢复会话时持有；获取数据的请求不修改会话，无需加锁
+        self.csrf_token = None
+        self.logged_in = False
+        self.grade_tag_id = None
+        self.verified_at = None  # 最近一次确认会话有效的 time.monotonic()
+
+
+class SessionPool:
+    """已登录会话池 - 同一账号的验证、查询和监控共用一个会话，只在失效时重新登录"""
+
+    def __init__(self, verify_interval=60, transport=None):
+        self.verify_interval = verify_interval  # 秒，距上次确认有效不超过该时间时不再探测
+        self.transport = transport  # 池中会话的连接设置，为None时使用 DEFAULT_TRANSPORT
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, username, encrypted_password):
+        """返回账号的共享会话，密码变化时换用新会话"""
+        with self._lock:
+            account_session = self._sessions.get(username)
+            if account_session is None or account_session.encrypted_password != encrypted_password:
+                account_session = AccountSession(encrypted_password, self.transport)
+                self._sessions[username] = account_session
+            return account_session
+
+    def is_fresh(self, account_session):
+        verified_at = account_session.verified_at
+        return (account_session.logged_in and verified_at is not None
+                and time.monotonic() - verified_at < self.verify_interval)
+
+    def invalidate(self, username):
+        with self._lock:
+            self._sessions.pop(username, None)
+
+
+_default_session_pool = None
+_default_session_pool_lock = threading.Lock()
+
+
+def get_default_session_pool():
+    """进程内共享的会话池，GUI的验证、查询和监控都从这里取会话"""
+    global _default_session_pool
+    with _default_session_pool_lock:
+        if _default_session_pool is None:
+            _default_session_pool = SessionPool()
+        return _default_session_pool
+
+
+def _with_account_lock(method):
+    """登录、恢复会话等修改登录状态的流程，同一账号需串行执行"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.account_session.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class GradeTableParser(HTMLParser):
+    """流式成绩表格解析器 - 只收集tbody中的行和单元格文本，不构建完整文档树
+
+    结果与 BeautifulSoup（html.parser）的 tbody.find_all('tr') / tr.find_all('td') /
+    get_text(strip=True) 一致，包括不规范的HTML：
+    - 结束标签关闭到最近一个同名的未关闭标签，没有同名标签时忽略；未关闭的td/tr会嵌套
+    - 行和单元格按后代递归收集，嵌套表格中的行和单元格同样计入外层
+    - 相邻文本合并为一段后再去掉首尾空白；注释以及script/style/template/rt/rp中的文本不计入
+    """
+
+    # BeautifulSoup 视为空元素的标签，开始后立即关闭
+    VOID_TAGS = frozenset((
+        'area', 'base', 'basefont', 'bgsound', 'br', 'col', 'command', 'embed', 'frame', 'hr', 'image', 'img',
+        'input', 'isindex', 'keygen', 'link', 'menuitem', 'meta', 'nextid', 'param', 'source', 'spacer',
+        'track', 'wbr',
+    ))
+    # 其中的文本不属于 get_text() 的结果
+    SKIP_TEXT_TAGS = frozenset(('script', 'style', 'template', 'rt', 'rp'))
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.tbodies = []  # [(tbody id, [[单元格文本, ...], ...]), ...]，按开始标签的顺序
+        self._stack = []  # 未关闭的标签名
+        self._open = {}  # {标签名: 未关闭的数量}
+        self._open_tbodies = []  # 未关闭tbody的行列表
+        self._open_rows = []  # 未关闭tr的单元格列表
+        self._open_cells = []  # 未关闭td的文本片段列表
+        self._skip_depth = 0
+        self._text = []  # 尚未归属的相邻文本
+
+    def handle_starttag(self, tag, attrs):
+        self._flush_text()
+        if tag in self.VOID_TAGS:
+            return
+        self._stack.append(tag)
+        self._open[tag] = self._open.get(tag, 0) + 1
+        if tag == 'tbody':
+            rows = []
+            self.tbodies.append((dict(attrs).get('id') or '', rows))
+            self._open_tbodies.append(rows)
+        elif tag == 'tr':
+            cells = []
+            for rows in self._open_tbodies:
+                rows.append(cells)
+            self._open_rows.append(cells)
+        elif tag == 'td':
+            parts = []
+            for cells in self._open_rows:
+                cells.append(parts)
+            self._open_cells.append(parts)
+        elif tag in self.SKIP_TEXT_TAGS:
+            self._skip_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        # <td/> 等自闭合写法：打开后立即关闭
+        self.handle_starttag(tag, attrs)
+        if tag not in self.VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._flush_text()
+        if not self._open.get(tag):
+            return
+        while self._stack:
+            name = self._stack.pop()
+            self._open[name] -= 1
+            if name == 'tbody':
+                self._open_tbodies.pop()
+            elif name == 'tr':
+                self._open_rows.pop()
+            elif name == 'td':
+                self._open_cells.pop()
+            elif name in self.SKIP_TEXT_TAGS:
+                self._skip_depth -= 1
+            if name == tag:
+                break
+
+    def handle_data(self, data):
+        if self._open_cells:
+            self._text.append(data)
+
+    def unknown_decl(self, data):
+        # <![CDATA[...]]> 的内容计入文本
+        self._flush_text()
+        if data.startswith('CDATA['):
+            self.handle_data(data[6:])
+            self._flush_text()
+
+    def handle_comment(self, data):
+        self._flush_text()
+
+    def handle_decl(self, decl):
+        self._flush_text()
+
+    def handle_pi(self, data):
+        self._flush_text()
+
+    def _flush_text(self):
+        if not self._text:
+            return
+        text = ''.join(self._text).strip()
+        self._text = []
+        if text and not self._skip_depth:
+            for parts in self._open_cells:
+                parts.append(text)
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        self.tbodies = [(tbody_id, [[''.join(parts) for parts in cells] for cells in rows])
+                        for tbody_id, rows in self.tbodies]
+
+
+class WebVPNGradeChecker:
+    # 成绩表格解析后端："fast" 为流式解析器，"bs4" 为 BeautifulSoup
+    GRADE_PARSERS = ("fast", "bs4")
+
+    def __init__(self, username, encrypted_password, log_callback=None, session_store=None, grade_parser="fast",
+                 grade_cache=None, session_pool=None, transport=None, semester_catalog=None, account_session=None):
+        # 使用会话池时与同一账号的其他实例共享会话和登录状态（连接设置以会话池为准）
+        # 直接传入 account_session 时使用给定的会话，如异步引擎中所有账号共用、不发起请求的会话
+        self.session_pool = session_pool
+        if account_session is not None:
+            self.account_session = account_session
+        elif session_pool is not None:
+            self.account_session = session_pool.acquire(username, encrypted_password)
+        else:
+            self.account_session = AccountSession(encrypted_password, transport)
+        self.session = self.account_session.session
+        self.transport = self.account_session.transport
+        self.base_url = "https://webvpn.nankai.edu.cn"
+        self.username = username
+        self.encrypted_password = encrypted_password
+        self.semester_data = None
+        self.log_callback = log_callback  # GUI日志回调函数
+        self.logger = AccountLogger(username, log_callback)
+        self.session_store = session_store  # 会话缓存，为None时每次都完整登录
+        self.grade_parser = grade_parser if grade_parser in self.GRADE_PARSERS else "fast"
+        self.grade_cache = grade_cache  # 成绩缓存（如 grade_cache.GradeCache），为None时每次都重新获取
+        self.semester_catalog = semester_catalog or get_default_semester_catalog()
     
-    def log(self, message, level="INFO"):
-        """统一日志输出"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        formatted_message = f"[{timestamp}] {message}"
-        
-        # 控制台输出
-        print(formatted_message)
+    # 登录状态保存在 account_session 中，共享会话的实例看到的是同一份
+    @property
+    def csrf_token(self):
+        return self.account_session.csrf_token
+
+    @csrf_token.setter
+    def csrf_token(self, value):
+        self.account_session.csrf_token = value
+
+    @property
+    def logged_in(self):
+        return self.account_session.logged_in
+
+    @logged_in.setter
+    def logged_in(self, value):
+        self.account_session.logged_in = value
+        self.account_session.verified_at = time.monotonic() if value else None
+
+    @property
+    def grade_tag_id(self):
+        """本会话已获取的成绩页tagId，存在时跳过成绩预请求"""
+        return self.account_session.grade_tag_id
+
+    @grade_tag_id.setter
+    def grade_tag_id(self, value):
+        self.account_session.grade_tag_id = value
+
+    def log(self, message, level=None):
+        """统一日志输出 - 放入日志队列，由后台线程输出到控制台和GUI回调
         
-        # GUI回调输出
-        if self.log_callback:
-            self.log_callback(formatted_message)
+        level 为 "DEBUG"/"INFO"/"WARNING"/"ERROR"，不指定时按 ❌/⚠️ 前缀推断。
+        """
+        self.logger.log_message(message, level)
+    
+    def log_request_metrics(self, limit=10):
+        """把各接口的请求延迟统计写入日志"""
+        metrics = self.transport.metrics
+        if metrics is None:
+            return
+        for line in metrics.summary_lines(limit):
+            self.log(line)
     
-    def get_dynamic_semesters(self):
-        """动态获取当前用户的所有学期数据"""
+    def get_dynamic_semesters(self, force_refresh=False):
+        """获取当前用户的所有学期数据 - 优先使用学期目录缓存，过期时在后台刷新"""
+        return self.semester_catalog.get(self.username, self.fetch_semesters, force_refresh=force_refresh,
+                                         revalidate=self.logged_in, log=self.log)
+    
+    def fetch_semesters(self):
+        """从教务系统获取学期数据，失败返回None"""
         self.log("正在获取学期列表...")
         
         try:
@@ -59,13 +378,14 @@ class WebVPNGradeChecker:
                 'Referer': f'{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/home.action'
             }
             
-            self.session.headers.update(headers)
-            response = self.session.get(person_url, params={'vpn-12-o2-eamis.nankai.edu.cn': ''})
+            response = self.session.get(person_url, params={'vpn-12-o2-eamis.nankai.edu.cn': ''}, headers=headers,
+                                        timeout=self.transport.timeout('eams'))
             
             # 提取tagId
             tag_id_match = re.search(r'semesterBar(\d+)Semester', response.text)
             if tag_id_match:
                 tag_id = f"semesterBar{tag_id_match.group(1)}Semester"
+                self.grade_tag_id = tag_id
                 self.log(f"✅ 获取到tagId: {tag_id}")
             else:
                 self.log("⚠️ 未能获取到tagId，使用默认值")
@@ -87,111 +407,50 @@ class WebVPNGradeChecker:
                 'Referer': f'{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/home.action'
             }
             
-            self.session.headers.update(headers)
-            response = self.session.post(data_query_url, data=data, params={'vpn-12-o2-eamis.nankai.edu.cn': ''})
+            response = self.session.post(data_query_url, data=data, params={'vpn-12-o2-eamis.nankai.edu.cn': ''},
+                                         headers=headers, timeout=self.transport.timeout('eams'))
             
             if response.status_code == 200:
                 self.log("✅ 成功获取学期数据")
-                semester_info = self._parse_semester_response(response.text)
-                if semester_info:
-                    formatted_semesters = self._format_semesters(semester_info)
+                formatted_semesters = self._parse_semester_response(response.text)
+                if formatted_semesters:
                     self.log(f"✅ 找到 {len(formatted_semesters)} 个可用学期")
                     return formatted_semesters
                 else:
-                    self.log("⚠️ 解析学期数据失败，使用默认数据")
-                    return self._get_default_semesters()
+                    self.log("⚠️ 解析学期数据失败")
+                    return None
             else:
                 self.log(f"❌ 获取学期数据失败，状态码: {response.status_code}")
-                return self._get_default_semesters()
+                return None
                 
         except Exception as e:
             self.log(f"❌ 获取学期数据时出错: {e}")
-            return self._get_default_semesters()
+            return None
     
     def _parse_semester_response(self, response_text):
-        """解析学期数据响应"""
+        """解析学期数据响应，返回格式化后的学期列表"""
         try:
-            response_text = response_text.strip()
-            semesters_match = re.search(r'semesters:\s*({.*?})\s*,\s*yearIndex', response_text, re.DOTALL)
-            if semesters_match:
-                semesters_text = semesters_match.group(1)
-                return self._parse_semesters_object(semesters_text)
-            else:
+            semesters = parse_semester_calendar(response_text)
+            if semesters is None:
                 self.log("❌ 未找到semesters数据")
-                return None
+            return semesters
         except Exception as e:
             self.log(f"❌ 解析学期数据时出错: {e}")
             return None
     
-    def _parse_semesters_object(self, semesters_text):
-        """解析semesters对象"""
-        semester_data = {}
-        year_pattern = r'(y\d+):\s*\[(.*?)\]'
-        year_matches = re.finditer(year_pattern, semesters_text, re.DOTALL)
-        
-        for year_match in year_matches:
-            year_key = year_match.group(1)
-            year_data_text = year_match.group(2)
-            semester_list = []
-            semester_pattern = r'\{id:(\d+),schoolYear:"([^"]+)",name:"([^"]+)"\}'
-            semester_matches = re.finditer(semester_pattern, year_data_text)
-            
-            for sem_match in semester_matches:
-                semester_info = {
-                    'id': int(sem_match.group(1)),
-                    'schoolYear': sem_match.group(2),
-                    'name': sem_match.group(3)
-                }
-                semester_list.append(semester_info)
-            
-            if semester_list:
-                semester_data[year_key] = semester_list
-        
-        return semester_data
-    
-    def _format_semesters(self, semester_data):
-        """格式化学期数据，只保留4位数ID的学期"""
-        formatted_semesters = []
-        sorted_years = sorted(semester_data.keys(), reverse=True)
-        
-        for year_key in sorted_years:
-            semesters = semester_data[year_key]
-            sorted_semesters = sorted(semesters, key=lambda x: int(x['name']), reverse=True)
-            
-            for semester in sorted_semesters:
-                semester_id = str(semester['id'])
-                if len(semester_id) == 4:
-                    semester_info = {
-                        'id': semester_id,
-                        'display_name': f"{semester['schoolYear']} 第{semester['name']}学期",
-                        'school_year': semester['schoolYear'],
-                        'term': semester['name']
-                    }
-                    formatted_semesters.append(semester_info)
-        
-        return formatted_semesters
-    
-    def _get_default_semesters(self):
-        """返回默认的学期数据"""
-        return [
-            {'id': '4364', 'display_name': '2025-2026 第1学期', 'school_year': '2025-2026', 'term': '1'},
-            {'id': '4344', 'display_name': '2024-2025 第3学期', 'school_year': '2024-2025', 'term': '3'},
-            {'id': '4324', 'display_name': '2024-2025 第2学期', 'school_year': '2024-2025', 'term': '2'},
-            {'id': '4262', 'display_name': '2024-2025 第1学期', 'school_year': '2024-2025', 'term': '1'},
-            {'id': '4304', 'display_name': '2023-2024 第3学期', 'school_year': '2023-2024', 'term': '3'},
-            {'id': '4284', 'display_name': '2023-2024 第2学期', 'school_year': '2023-2024', 'term': '2'},
-            {'id': '4263', 'display_name': '2023-2024 第1学期', 'school_year': '2023-2024', 'term': '1'},
-        ]
-    
+    @_with_account_lock
     def login(self):
         """完整的登录流程"""
         self.log("正在登录WebVPN...")
+        self.grade_tag_id = None  # 新会话需要重新执行成绩预请求
         
         try:
             # 初始化session
             self.log("初始化会话...")
-            self.session.get(f"{self.base_url}/")
-            self.session.get(f"{self.base_url}/https/77726476706e69737468656265737421f9f64cd22931665b7f01c7a99c406d36af/login")
+            timeout = self.transport.timeout('login')
+            self.session.get(f"{self.base_url}/", timeout=timeout)
+            self.session.get(f"{self.base_url}/https/77726476706e69737468656265737421f9f64cd22931665b7f01c7a99c406d36af/login",
+                             timeout=timeout)
             
             # 获取CSRF Token
             self.log("获取CSRF Token...")
@@ -205,7 +464,7 @@ class WebVPNGradeChecker:
                 'vpn_timestamp': timestamp
             }
             
-            response = self.session.get(token_url, params=params)
+            response = self.session.get(token_url, params=params, timeout=timeout)
             csrf_match = re.search(r'csrf-token=([^;]+)', response.text)
             
             if not csrf_match:
@@ -213,15 +472,19 @@ class WebVPNGradeChecker:
                 return False
             
             csrf_token = csrf_match.group(1)
+            self.csrf_token = csrf_token
             self.log(f"✅ 获取到CSRF Token: {csrf_token[:10]}...")
             
             # 输入用户名和密码
             self.log("输入登录信息...")
             input_url = f"{self.base_url}/wengine-vpn/input"
-            self.session.headers['Content-Type'] = 'text/plain;charset=UTF-8'
+            # 请求头按次传入，登录后 session.headers 保持不变，同一会话上的请求可以并发
+            input_headers = {'Content-Type': 'text/plain;charset=UTF-8'}
             
-            self.session.post(input_url, json={"name": "", "type": "text", "value": self.username})
-            self.session.post(input_url, json={"name": "", "type": "password", "value": self.encrypted_password})
+            self.session.post(input_url, json={"name": "", "type": "text", "value": self.username},
+                              headers=input_headers, timeout=timeout)
+            self.session.post(input_url, json={"name": "", "type": "password", "value": self.encrypted_password},
+                              headers=input_headers, timeout=timeout)
         
             # 提交登录
             self.log("提交登录请求...")
@@ -241,8 +504,8 @@ class WebVPNGradeChecker:
                 'Accept-Language': 'zh-CN',
             }
             
-            self.session.headers.update(headers)
-            response = self.session.post(login_url, json=login_data, params={'vpn-12-o2-iam.nankai.edu.cn': '', 'os': 'web'})
+            response = self.session.post(login_url, json=login_data, params={'vpn-12-o2-iam.nankai.edu.cn': '', 'os': 'web'},
+                                         headers=headers, timeout=timeout)
             
             if response.status_code == 200 and 'success' in response.text.lower():
                 self.log("✅ WebVPN登录成功")
@@ -263,11 +526,13 @@ class WebVPNGradeChecker:
             timestamp = int(time.time() * 1000)
             
             # 访问教务系统
-            self.session.get(f"{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams?wrdrecordvisit={timestamp}")
+            timeout = self.transport.timeout('eams')
+            self.session.get(f"{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams?wrdrecordvisit={timestamp}",
+                             timeout=timeout)
             
             # 访问主页
             home_url = f"{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/home.action"
-            home_response = self.session.get(home_url)
+            home_response = self.session.get(home_url, timeout=timeout)
             
             if home_response.status_code == 200 or "教务系统" in home_response.text:
                 self.log("✅ 成功进入教务系统")
@@ -280,132 +545,344 @@ class WebVPNGradeChecker:
             self.log(f"❌ 访问教务系统出错: {e}")
             return False
     
-    def get_grades(self, semester_id="4324"):
-        """获取指定学期的成绩"""
+    def is_session_alive(self):
+        """用一次请求探测当前会话是否仍然有效"""
+        home_url = f"{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/home.action"
+        
+        try:
+            # 会话失效时WebVPN/教务系统会重定向到登录页，因此不跟随重定向
+            response = self.session.get(home_url, allow_redirects=False, timeout=self.transport.timeout('probe'))
+            return response.status_code == 200
+        except Exception as e:
+            self.log(f"⚠️ 会话探测出错: {e}")
+            return False
+    
+    @_with_account_lock
+    def restore_session(self):
+        """从会话缓存恢复Cookie和CSRF Token"""
+        if not self.session_store:
+            return False
+        
+        entry = self.session_store.load(self.username)
+        if not entry:
+            return False
+        
+        self.session.cookies.clear()
+        for cookie in entry.get('cookies', []):
+            self.session.cookies.set(
+                cookie['name'], cookie['value'],
+                domain=cookie.get('domain'),
+                path=cookie.get('path', '/'),
+                expires=cookie.get('expires'),
+                secure=cookie.get('secure', False)
+            )
+        self.csrf_token = entry.get('csrf_token')
+        return True
+    
+    @_with_account_lock
+    def ensure_login(self):
+        """确保已登录并进入教务系统 - 优先复用已有会话，失效时才完整登录"""
+        # 0. 会话池中刚确认过有效的共享会话，不再探测
+        if self.session_pool is not None and self.session_pool.is_fresh(self.account_session):
+            self.log("♻️ 复用已登录的共享会话")
+            return True
+        
+        # 1. 当前进程内已有会话
+        if self.logged_in:
+            if self.is_session_alive():
+                self.log("♻️ 会话仍然有效，跳过登录")
+                self.logged_in = True
+                return True
+            self.log("⚠️ 会话已失效，重新登录")
+            self.logged_in = False
+        
+        # 2. 磁盘缓存的会话
+        elif self.restore_session():
+            if self.is_session_alive():
+                self.log("♻️ 已恢复缓存会话，跳过登录")
+                self.logged_in = True
+                return True
+            self.log("⚠️ 缓存会话已失效，重新登录")
+            self.session_store.invalidate(self.username)
+            self.session.cookies.clear()
+        
+        # 3. 完整登录流程
+        if not self.login():
+            return False
+        if not self.access_eamis():
+            return False
+        
+        self.logged_in = True
+        if self.session_store:
+            try:
+                self.session_store.save(self.username, self.session, self.csrf_token)
+            except Exception as e:
+                self.log(f"⚠️ 保存会话缓存失败: {e}")
+        return True
+    
+    def get_grades(self, semester_id="4324", force_refresh=False):
+        """获取指定学期的成绩，force_refresh=True 时跳过缓存"""
+        if not force_refresh:
+            grades = self.get_cached_grades(semester_id)
+            if grades is not None:
+                return grades
+        
         self.log(f"正在获取学期 {semester_id} 的成绩...")
         
+        response_text = self.get_grade_page(semester_id)
+        if response_text is None:
+            return None
+        
+        self.log("🔍 开始解析成绩数据...")
+        grades = self.parse_grades(response_text)
+        if self.grade_cache is not None:
+            self.grade_cache.put(self.username, semester_id, grades)
+        return grades
+    
+    def get_cached_grades(self, semester_id="4324"):
+        """从缓存读取成绩（不发起请求），未命中或未启用缓存时返回None"""
+        if self.grade_cache is None:
+            return None
+        
+        grades = self.grade_cache.get(self.username, semester_id)
+        if grades is not None:
+            age = self.grade_cache.age(self.username, semester_id) or 0
+            self.log(f"⚡ 使用 {age:.0f} 秒前缓存的学期 {semester_id} 成绩（{len(grades)} 门）")
+        return grades
+
+    def get_grade_page(self, semester_id="4324"):
+        """获取成绩页面HTML，页面中没有成绩表格时返回None
+        
+        本会话已经获取过tagId时直接请求 person!search.action（1次请求），
+        返回内容不是成绩表格时再执行完整的预请求流程（4次请求）。
+        """
+        try:
+            if self.grade_tag_id:
+                response_text = self._fetch_grade_page(semester_id)
+                if self.has_grade_table(response_text):
+                    self.log("⚡ 已跳过预请求，直接获取成绩")
+                    return response_text
+                self.log("⚠️ 直接获取未返回成绩表格，执行完整预请求...")
+            
+            self._grade_preflight(semester_id)
+            response_text = self._fetch_grade_page(semester_id)
+            if self.has_grade_table(response_text):
+                return response_text
+            
+            self.log("❌ 未能获取到完整的成绩数据（可能该学期没有成绩）")
+            # 也可能是会话已失效，下次 ensure_login 时重新探测
+            self.account_session.verified_at = None
+            return None
+                
+        except Exception as e:
+            self.log(f"❌ 获取成绩时出错: {e}")
+            self.account_session.verified_at = None
+            return None
+
+    def _grade_preflight(self, semester_id):
+        """成绩查询前的预请求：获取tagId、查询学期日历和实体ID"""
         person_url = f"{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/teach/grade/course/person.action"
         
+        # 请求头按次传入，不修改共享的 session.headers，便于多线程同时获取不同学期
         headers = {
             'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
             'X-Requested-With': 'XMLHttpRequest',
             'Referer': f'{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/home.action'
         }
         
-        original_headers = self.session.headers.copy()
-        self.session.headers.update(headers)
+        # POST请求
+        response = self.session.post(person_url, 
+                                data={'project.id': '1', 'semester.id': semester_id}, 
+                                params={'vpn-12-o2-eamis.nankai.edu.cn': ''},
+                                headers=headers,
+                                timeout=self.transport.timeout('grades'))
+        
+        # 提取tagId，找到后缓存到本会话
+        tag_id_match = re.search(r'semesterBar(\d+)Semester', response.text)
+        if tag_id_match:
+            tag_id = f"semesterBar{tag_id_match.group(1)}Semester"
+            self.grade_tag_id = tag_id
+        else:
+            tag_id = "semesterBar13572391471Semester"
+        
+        # 步骤2：查询学期日历数据
+        data_query_url = f"{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/dataQuery.action"
+        
+        self.session.post(data_query_url, 
+                        data={'tagId': tag_id, 'dataType': 'semesterCalendar', 'value': semester_id, 'empty': 'false'},
+                        params={'vpn-12-o2-eamis.nankai.edu.cn': ''},
+                        headers=headers,
+                        timeout=self.transport.timeout('grades'))
+        
+        # 步骤3：查询实体ID
+        self.session.post(data_query_url, 
+                        data={'entityId': '1'},
+                        params={'vpn-12-o2-eamis.nankai.edu.cn': ''},
+                        headers=headers,
+                        timeout=self.transport.timeout('grades'))
+
+    def _fetch_grade_page(self, semester_id):
+        """最终GET请求获取成绩数据，返回响应文本"""
+        timestamp = int(time.time() * 1000)
+        final_url = f"{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/teach/grade/course/person!search.action"
         
-        try:
-            # POST请求
-            response = self.session.post(person_url, 
-                                    data={'project.id': '1', 'semester.id': semester_id}, 
-                                    params={'vpn-12-o2-eamis.nankai.edu.cn': ''})
-            
-            # 提取tagId
-            tag_id_match = re.search(r'semesterBar(\d+)Semester', response.text)
-            tag_id = f"semesterBar{tag_id_match.group(1)}Semester" if tag_id_match else "semesterBar13572391471Semester"
-            
-            # 步骤2：查询学期日历数据
-            data_query_url = f"{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/dataQuery.action"
-            
-            self.session.post(data_query_url, 
-                            data={'tagId': tag_id, 'dataType': 'semesterCalendar', 'value': semester_id, 'empty': 'false'},
-                            params={'vpn-12-o2-eamis.nankai.edu.cn': ''})
-            
-            # 步骤3：查询实体ID
-            self.session.post(data_query_url, 
-                            data={'entityId': '1'},
-                            params={'vpn-12-o2-eamis.nankai.edu.cn': ''})
-            
-            # 步骤4：最终GET请求获取成绩数据
-            timestamp = int(time.time() * 1000)
-            final_url = f"{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/teach/grade/course/person!search.action"
-            
-            ajax_headers = {
-                'Accept': 'text/html, */*; q=0.01',
-                'X-Requested-With': 'XMLHttpRequest',
-                'Referer': f'{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/teach/grade/course/person!search.action?semesterId={semester_id}&projectType='
-            }
-            
-            self.session.headers.update(ajax_headers)
-            
-            final_response = self.session.get(final_url, 
-                                            params={'vpn-12-o2-eamis.nankai.edu.cn': '', 'semesterId': semester_id, 
-                                                'projectType': '', '_': timestamp})
-            
-            # 兼容不同成绩制度的检查条件
-            response_text = final_response.text
-            has_grade_table = False
-            
-            # 检查是否包含成绩表格
-            if 'tbody' in response_text and ('grid' in response_text and '_data' in response_text):
-                has_grade_table = True
-                self.log("✅ 检测到成绩表格结构")
-            elif '等级' in response_text and '绩点' in response_text:
-                has_grade_table = True
-                self.log("✅ 检测到等级制成绩表格")
-            elif ('总评成绩' in response_text or '最终' in response_text or 
-                '课程名称' in response_text and '学分' in response_text):
-                has_grade_table = True
-                self.log("✅ 检测到百分制成绩表格")
-            elif re.search(r'\b\d{1,3}\b', response_text) and '课程' in response_text:
-                has_grade_table = True
-                self.log("✅ 检测到数字成绩表格")
+        ajax_headers = {
+            'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+            'Accept': 'text/html, */*; q=0.01',
+            'X-Requested-With': 'XMLHttpRequest',
+            'Referer': f'{self.base_url}/https/77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5/eams/teach/grade/course/person!search.action?semesterId={semester_id}&projectType='
+        }
+        
+        final_response = self.session.get(final_url, 
+                                        params={'vpn-12-o2-eamis.nankai.edu.cn': '', 'semesterId': semester_id, 
+                                            'projectType': '', '_': timestamp},
+                                        headers=ajax_headers,
+                                        timeout=self.transport.timeout('grades'))
+        return final_response.text
+
+    def get_grades_concurrent(self, semester_ids, max_workers=4, executor=None, force_refresh=False):
+        """在同一个已登录会话上并发获取多个学期的成绩
+        
+        每个请求单独传入请求头，不修改共享的 session.headers，可以放到任意线程池中运行；
+        传入 executor 时复用调用方的线程池。返回 {学期ID: 成绩列表或None}，顺序与 semester_ids 一致。
+        """
+        semester_ids = list(dict.fromkeys(semester_ids))
+        fetch = lambda semester_id: self.get_grades(semester_id, force_refresh=force_refresh)
+        
+        if executor is not None:
+            results = list(executor.map(fetch, semester_ids))
+        else:
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(semester_ids)))) as own_executor:
+                results = list(own_executor.map(fetch, semester_ids))
+        return dict(zip(semester_ids, results))
+    
+    def get_all_grades(self, semesters=None, max_workers=4):
+        """获取全部学期的成绩单 - 在同一个已登录会话上用线程池并行请求各学期
+        
+        返回按学期ID索引的字典（顺序与学期列表一致，新学期在前）：
+        {学期ID: {'semester': 学期信息, 'grades': [成绩, ...]}}
+        没有成绩的学期不会出现在结果中。
+        """
+        if semesters is None:
+            semesters = self.get_dynamic_semesters()
+        if not semesters:
+            self.log("❌ 无法获取学期数据")
+            return {}
+        
+        self.log(f"📚 开始获取 {len(semesters)} 个学期的成绩（并发数 {max_workers}）...")
+        results = self.get_grades_concurrent([sem['id'] for sem in semesters], max_workers=max_workers)
+        
+        # 合并并去重：同一学年学期的同一课程只保留一次
+        transcript = {}
+        seen = set()
+        for semester in semesters:
+            unique_grades = []
+            for grade in results.get(semester['id']) or []:
+                key = (grade['学年学期'], grade['课程代码'], grade['课程序号'])
+                if key not in seen:
+                    seen.add(key)
+                    unique_grades.append(grade)
+            if unique_grades:
+                transcript[semester['id']] = {'semester': semester, 'grades': unique_grades}
+        
+        total = sum(len(entry['grades']) for entry in transcript.values())
+        self.log(f"✅ 成绩单获取完成：{len(transcript)} 个学期，共 {total} 门课程")
+        return transcript
+
+    def has_grade_table(self, response_text):
+        """兼容不同成绩制度的检查条件"""
+        # 检查是否包含成绩表格
+        if 'tbody' in response_text and ('grid' in response_text and '_data' in response_text):
+            self.log("✅ 检测到成绩表格结构")
+            return True
+        elif '等级' in response_text and '绩点' in response_text:
+            self.log("✅ 检测到等级制成绩表格")
+            return True
+        elif ('总评成绩' in response_text or '最终' in response_text or 
+            '课程名称' in response_text and '学分' in response_text):
+            self.log("✅ 检测到百分制成绩表格")
+            return True
+        elif re.search(r'\b\d{1,3}\b', response_text) and '课程' in response_text:
+            self.log("✅ 检测到数字成绩表格")
+            return True
+        return False
+
+    def _extract_rows_fast(self, html_content):
+        """流式解析器提取成绩行，返回单元格文本列表的列表"""
+        parser = GradeTableParser()
+        parser.feed(html_content)
+        parser.close()
+        
+        for tbody_id, rows in parser.tbodies:
+            if 'grid' in tbody_id and '_data' in tbody_id:
+                return rows
+        
+        self.log("❌ 未找到成绩表格tbody，尝试其他方式...")
+        self.log(f"📊 找到 {len(parser.tbodies)} 个tbody")
+        if not parser.tbodies:
+            return None
+        
+        rows = max((rows for _, rows in parser.tbodies), key=len)
+        self.log(f"✅ 选择包含 {len(rows)} 行的tbody")
+        return rows
+    
+    def _extract_rows_bs4(self, html_content):
+        """BeautifulSoup提取成绩行，返回单元格文本列表的列表"""
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html_content, 'html.parser')
+        
+        grade_tbody = soup.find('tbody', id=lambda x: x and 'grid' in x and '_data' in x)
+        if grade_tbody:
+            tr_list = grade_tbody.find_all('tr')
+        else:
+            self.log("❌ 未找到成绩表格tbody，尝试其他方式...")
+            all_tbodies = soup.find_all('tbody')
+            self.log(f"📊 找到 {len(all_tbodies)} 个tbody")
             
-            if has_grade_table:
-                self.log("🔍 开始解析成绩数据...")
-                return self.parse_grades(response_text)
-            else:
-                self.log("❌ 未能获取到完整的成绩数据（可能该学期没有成绩）")
+            if not all_tbodies:
                 return None
-                
-        except Exception as e:
-            self.log(f"❌ 获取成绩时出错: {e}")
-            return None
-        finally:
-            self.session.headers = original_headers
+            tr_list = max((tbody.find_all('tr') for tbody in all_tbodies), key=len)
+            self.log(f"✅ 选择包含 {len(tr_list)} 行的tbody")
+        
+        return [[cell.get_text(strip=True) for cell in row.find_all('td')] for row in tr_list]
 
     def parse_grades(self, html_content):
         """解析成绩HTML - 自动识别不同成绩制度"""
         try:
-            from bs4 import BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
+            if self.grade_parser == "fast":
+                try:
+                    rows = self._extract_rows_fast(html_content)
+                except Exception as e:
+                    self.log(f"⚠️ 快速解析失败，改用BeautifulSoup: {e}")
+                    rows = self._extract_rows_bs4(html_content)
+            else:
+                rows = self._extract_rows_bs4(html_content)
             
-            grade_tbody = soup.find('tbody', id=lambda x: x and 'grid' in x and '_data' in x)
-            if not grade_tbody:
-                self.log("❌ 未找到成绩表格tbody，尝试其他方式...")
-                all_tbodies = soup.find_all('tbody')
-                self.log(f"📊 找到 {len(all_tbodies)} 个tbody")
-                
-                if all_tbodies:
-                    grade_tbody = max(all_tbodies, key=lambda x: len(x.find_all('tr')))
-                    self.log(f"✅ 选择包含 {len(grade_tbody.find_all('tr'))} 行的tbody")
-                else:
-                    return None
+            if rows is None:
+                return None
             
             grades = []
-            rows = grade_tbody.find_all('tr')
             
             self.log(f"📊 找到 {len(rows)} 行成绩数据")
+            # 逐行日志只在DEBUG级别输出，未启用时不做字符串格式化
+            debug = self.logger.isEnabledFor(logging.DEBUG)
             
-            for i, row in enumerate(rows):
-                cells = row.find_all('td')
-                
+            for i, cells in enumerate(rows):
                 if len(cells) >= 8:
                     try:
                         # 基础信息（前6列固定）
                         grade_info = {
-                            '学年学期': cells[0].get_text(strip=True),
-                            '课程代码': cells[1].get_text(strip=True),
-                            '课程序号': cells[2].get_text(strip=True),
-                            '课程名称': cells[3].get_text(strip=True),
-                            '课程类别': cells[4].get_text(strip=True),
-                            '学分': float(cells[5].get_text(strip=True))
+                            '学年学期': cells[0],
+                            '课程代码': cells[1],
+                            '课程序号': cells[2],
+                            '课程名称': cells[3],
+                            '课程类别': cells[4],
+                            '学分': float(cells[5])
                         }
                         
                         # 解析第7列和第8列
-                        col7_text = cells[6].get_text(strip=True)
-                        col8_text = cells[7].get_text(strip=True)
+                        col7_text = cells[6]
+                        col8_text = cells[7]
                         
                         # 判断成绩制度
                         if self._is_letter_grade(col7_text):
@@ -418,7 +895,8 @@ class WebVPNGradeChecker:
                                 gpa = None
                             grade_info['绩点'] = gpa
                             grade_info['绩点文本'] = col8_text
-                            self.log(f"✅ {grade_info['课程名称']}: {col7_text} (绩点: {col8_text}) - 等级制")
+                            if debug:
+                                self.log(f"✅ {grade_info['课程名称']}: {col7_text} (绩点: {col8_text}) - 等级制", "DEBUG")
                             
                         elif col7_text in ['通过', '不通过', '合格', '不合格']:
                             # 通过制
@@ -426,7 +904,8 @@ class WebVPNGradeChecker:
                             grade_info['等级'] = col7_text
                             grade_info['绩点'] = None
                             grade_info['绩点文本'] = '--'
-                            self.log(f"✅ {grade_info['课程名称']}: {col7_text} - 通过制")
+                            if debug:
+                                self.log(f"✅ {grade_info['课程名称']}: {col7_text} - 通过制", "DEBUG")
                             
                         else:
                             # 百分制
@@ -437,7 +916,8 @@ class WebVPNGradeChecker:
                                 grade_info['等级'] = f"{score}分"
                                 grade_info['绩点'] = self._score_to_gpa(score)
                                 grade_info['绩点文本'] = str(grade_info['绩点']) if grade_info['绩点'] else "--"
-                                self.log(f"✅ {grade_info['课程名称']}: {score}分 (绩点: {grade_info['绩点']}) - 百分制")
+                                if debug:
+                                    self.log(f"✅ {grade_info['课程名称']}: {score}分 (绩点: {grade_info['绩点']}) - 百分制", "DEBUG")
                             except ValueError:
                                 # 未知格式
                                 grade_info['成绩类型'] = '其他'
@@ -452,7 +932,8 @@ class WebVPNGradeChecker:
                         self.log(f"❌ 解析第{i+1}行出错: {e}")
                         continue
                 else:
-                    self.log(f"⚠️ 第{i+1}行列数不足({len(cells)}列)，跳过")
+                    if debug:
+                        self.log(f"⚠️ 第{i+1}行列数不足({len(cells)}列)，跳过", "DEBUG")
             
             self.log(f"📊 成功解析 {len(grades)} 门课程")
             return grades if grades else None
@@ -495,292 +976,91 @@ class WebVPNGradeChecker:
             self.log("没有成绩数据可显示")
             return
         
-        self.log(f"\n{'='*80}")
-        self.log(f"{'学期成绩单':^80}")
-        self.log(f"{'='*80}")
+        # 整张成绩单作为一条日志输出，避免几十行逐条入队
+        lines = []
+        out = lines.append
+        
+        out(f"\n{'='*80}")
+        out(f"{'学期成绩单':^80}")
+        out(f"{'='*80}")
         
-        # 统计
-        total_credits = 0
-        gpa_credits = 0
-        weighted_gpa = 0
-        score_courses = []
-        grade_courses = []
         pass_courses = []
         other_courses = []
         
         for i, grade in enumerate(grades, 1):
             credits = grade['学分']
-            total_credits += credits
             
-            self.log(f"\n{i}. {grade['课程名称']}")
-            self.log(f"   课程代码: {grade['课程代码']} | 学分: {credits}")
-            self.log(f"   成绩类型: {grade.get('成绩类型', '未知')}")
+            out(f"\n{i}. {grade['课程名称']}")
+            out(f"   课程代码: {grade['课程代码']} | 学分: {credits}")
+            out(f"   成绩类型: {grade.get('成绩类型', '未知')}")
             
             grade_type = grade.get('成绩类型', '未知')
             
             if grade_type == '百分制':
-                self.log(f"   成绩分数: {grade.get('分数', '未知')}分 | 对应绩点: {grade.get('绩点', 0)}")
-                score_courses.append(grade)
-                if grade.get('绩点') is not None:
-                    gpa_credits += credits
-                    weighted_gpa += credits * grade['绩点']
-                    
+                out(f"   成绩分数: {grade.get('分数', '未知')}分 | 对应绩点: {grade.get('绩点', 0)}")
             elif grade_type == '等级制':
-                self.log(f"   成绩等级: {grade['等级']} | 绩点: {grade.get('绩点', '无')}")
-                grade_courses.append(grade)
-                if grade.get('绩点') is not None:
-                    gpa_credits += credits
-                    weighted_gpa += credits * grade['绩点']
-                    
+                out(f"   成绩等级: {grade['等级']} | 绩点: {grade.get('绩点', '无')}")
             elif grade_type == '通过制':
-                self.log(f"   成绩: {grade['等级']}")
+                out(f"   成绩: {grade['等级']}")
                 pass_courses.append(grade)
-                
             else:
-                self.log(f"   成绩: {grade['等级']}")
+                out(f"   成绩: {grade['等级']}")
                 other_courses.append(grade)
         
         # 统计信息
-        avg_gpa = weighted_gpa / gpa_credits if gpa_credits > 0 else 0
+        stats = GradeStats(grades)
         
-        self.log(f"\n{'='*80}")
-        self.log(f"📊 学期统计:")
-        self.log(f"   总课程数: {len(grades)} 门")
-        self.log(f"   总学分: {total_credits}")
+        out(f"\n{'='*80}")
+        out(f"📊 学期统计:")
+        out(f"   总课程数: {len(grades)} 门")
+        out(f"   总学分: {stats.total_credits:.1f}")
         
-        if score_courses:
-            total_score = sum(g.get('分数', 0) for g in score_courses)
-            score_credits = sum(g['学分'] for g in score_courses)
-            avg_score = total_score / len(score_courses) if score_courses else 0
-            weighted_avg_score = sum(g.get('分数', 0) * g['学分'] for g in score_courses) / score_credits if score_credits > 0 else 0
-            self.log(f"\n   📊 百分制课程: {len(score_courses)} 门")
-            self.log(f"   平均分数: {avg_score:.1f}分")
-            self.log(f"   加权平均分数: {weighted_avg_score:.1f}分")
+        if stats.score_count:
+            out(f"\n   📊 百分制课程: {stats.score_count} 门")
+            out(f"   平均分数: {stats.avg_score:.1f}分")
+            out(f"   加权平均分数: {stats.weighted_avg_score:.1f}分")
         
-        if grade_courses:
-            self.log(f"\n   🎯 等级制课程: {len(grade_courses)} 门")
+        if stats.count('等级制'):
+            out(f"\n   🎯 等级制课程: {stats.count('等级制')} 门")
         
-        if gpa_credits > 0:
-            self.log(f"\n   ⭐ 计入绩点学分: {gpa_credits}")
-            self.log(f"   加权平均绩点: {avg_gpa:.3f}")
+        if stats.gpa_credits > 0:
+            out(f"\n   ⭐ 计入绩点学分: {stats.gpa_credits}")
+            out(f"   加权平均绩点: {stats.avg_gpa:.3f}")
         
         if pass_courses:
-            self.log(f"\n   ✅ 通过制课程: {len(pass_courses)} 门")
+            out(f"\n   ✅ 通过制课程: {len(pass_courses)} 门")
             for course in pass_courses:
-                self.log(f"   - {course['课程名称']} ({course['学分']} 学分): {course['等级']}")
+                out(f"   - {course['课程名称']} ({course['学分']} 学分): {course['等级']}")
         
         if other_courses:
-            self.log(f"\n   ❓ 其他课程: {len(other_courses)} 门")
+            out(f"\n   ❓ 其他课程: {len(other_courses)} 门")
             for course in other_courses:
-                self.log(f"   - {course['课程名称']} ({course['学分']} 学分): {course['等级']}")
+                out(f"   - {course['课程名称']} ({course['学分']} 学分): {course['等级']}")
         
-        self.log(f"{'='*80}\n")
+        out(f"{'='*80}\n")
+        self.log("\n".join(lines))
 
     def send_pushplus(self, token, title, content):
-        """发送PushPlus通知"""
+        """立即发送PushPlus通知（不经过推送队列），返回是否成功
+        
+        不使用WebVPN会话：它的Cookie和请求头不应发给第三方的推送服务。
+        """
         if not token:
             self.log("❌ 未配置PushPlus Token")
             return False
         
-        url = "http://www.pushplus.plus/send"
-        data = {
-            "token": token,
-            "title": title,
-            "content": content,
-            "template": "html"
-        }
-        
-        try:
-            response = requests.post(url, json=data, timeout=10)
-            result = response.json()
-            if result.get('code') == 200:
-                self.log("✅ 推送成功")
-                return True
-            else:
-                self.log(f"❌ 推送失败: {result.get('msg')}")
-                return False
-        except Exception as e:
-            self.log(f"❌ 推送异常: {e}")
-            return False
+        ok, _, message = PushPlusNotifier(token).send(Notification(title, html=content),
+                                                      timeout=self.transport.timeout('push'))
+        self.log(f"✅ {message}" if ok else f"❌ {message}")
+        return ok
     
     def build_grade_html(self, grades, semester_id, title_prefix="学期成绩单"):
         """构建成绩HTML格式 - 兼容多种成绩制度"""
-        if not grades:
-            return "<p>没有成绩数据</p>"
-        
-        # 分类统计
-        total_credits = 0
-        gpa_credits = 0
-        weighted_gpa = 0
-        grade_courses = []
-        score_courses = []
-        pass_courses = []
-        
-        for grade in grades:
-            credits = grade['学分']
-            total_credits += credits
-            
-            grade_type = grade.get('成绩类型', '未知')
-            
-            if grade_type == '等级制':
-                grade_courses.append(grade)
-                if grade.get('绩点') is not None:
-                    gpa_credits += credits
-                    weighted_gpa += credits * grade['绩点']
-            elif grade_type == '百分制':
-                score_courses.append(grade)
-                if grade.get('绩点') is not None:
-                    gpa_credits += credits
-                    weighted_gpa += credits * grade['绩点']
-            elif grade_type == '通过制':
-                pass_courses.append(grade)
-        
-        avg_gpa = weighted_gpa / gpa_credits if gpa_credits > 0 else 0
-        gpa_color = "#4CAF50" if avg_gpa >= 3.5 else "#2196F3" if avg_gpa >= 3.0 else "#FF9800"
-        
-        # 计算平均分数
-        avg_score = 0
-        if score_courses:
-            total_score = sum(g.get('分数', 0) for g in score_courses)
-            avg_score = total_score / len(score_courses)
-        
-        # 构建HTML
-        html = f"""
-        <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <!-- 标题卡片 -->
-            <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 25px; border-radius: 15px 15px 0 0; text-align: center;">
-                <h2 style="margin: 0; font-size: 28px;">🎓 {title_prefix}</h2>
-                <p style="margin: 10px 0 0 0; opacity: 0.9;">学期 {semester_id}</p>
-            </div>
-            
-            <!-- 统计卡片 -->
-            <div style="background: white; padding: 20px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); margin-bottom: 20px;">
-        """
-        
-        # 如果有绩点课程，显示GPA
-        if gpa_credits > 0:
-            html += f"""
-                <div style="text-align: center;">
-                    <h1 style="margin: 0; color: {gpa_color}; font-size: 48px; font-weight: bold;">{avg_gpa:.3f}</h1>
-                    <p style="margin: 5px 0 15px 0; color: #666; font-size: 18px;">加权平均绩点</p>
-                </div>
-            """
-        
-        html += f"""
-                <div style="display: flex; justify-content: space-around; text-align: center; border-top: 1px solid #eee; padding-top: 15px;">
-                    <div>
-                        <p style="margin: 0; color: #999; font-size: 14px;">课程数</p>
-                        <p style="margin: 5px 0 0 0; color: #333; font-size: 24px; font-weight: bold;">{len(grades)}</p>
-                    </div>
-                    <div>
-                        <p style="margin: 0; color: #999; font-size: 14px;">总学分</p>
-                        <p style="margin: 5px 0 0 0; color: #333; font-size: 24px; font-weight: bold;">{total_credits}</p>
-                    </div>
-        """
-        
-        # 动态显示第三个统计项
-        if score_courses:
-            html += f"""
-                    <div>
-                        <p style="margin: 0; color: #999; font-size: 14px;">平均分</p>
-                        <p style="margin: 5px 0 0 0; color: #333; font-size: 24px; font-weight: bold;">{avg_score:.1f}分</p>
-                    </div>
-            """
-        elif grade_courses:
-            html += f"""
-                    <div>
-                        <p style="margin: 0; color: #999; font-size: 14px;">等级制</p>
-                        <p style="margin: 5px 0 0 0; color: #333; font-size: 24px; font-weight: bold;">{len(grade_courses)}门</p>
-                    </div>
-            """
-        
-        html += """
-                </div>
-            </div>
-            
-            <!-- 成绩详情 -->
-            <div style="background: white; padding: 20px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); border-radius: 10px;">
-                <h3 style="margin: 0 0 20px 0; color: #333; font-size: 20px;">📚 课程成绩明细</h3>
-        """
-        
-        # 添加每门课程
-        for i, grade in enumerate(grades):
-            grade_type = grade.get('成绩类型', '未知')
-            
-            # 根据成绩类型设置颜色
-            if grade_type == '等级制':
-                grade_colors = {
-                    'A': '#4CAF50', 'A-': '#66BB6A',
-                    'B+': '#42A5F5', 'B': '#2196F3', 'B-': '#1E88E5',
-                    'C+': '#FFA726', 'C': '#FF9800', 'C-': '#FB8C00',
-                    'D': '#EF5350', 'F': '#F44336'
-                }
-                grade_color = grade_colors.get(grade['等级'], '#757575')
-            elif grade_type == '百分制':
-                score = grade.get('分数', 0)
-                if score >= 90:
-                    grade_color = '#4CAF50'
-                elif score >= 80:
-                    grade_color = '#2196F3'
-                elif score >= 70:
-                    grade_color = '#FF9800'
-                elif score >= 60:
-                    grade_color = '#FFC107'
-                else:
-                    grade_color = '#F44336'
-            elif grade_type == '通过制':
-                if grade['等级'] in ['通过', '合格']:
-                    grade_color = '#4CAF50'
-                else:
-                    grade_color = '#F44336'
-            else:
-                grade_color = '#757575'
-            
-            bg_color = "#f8f9fa" if i % 2 == 0 else "#ffffff"
-            
-            # 显示的成绩文本
-            if grade_type == '百分制':
-                display_grade = f"{grade.get('分数', 0):.0f}分"
-            else:
-                display_grade = grade['等级']
-            
-            # 绩点信息
-            if grade.get('绩点') is not None:
-                gpa_display = f"绩点 {grade['绩点']:.1f}"
-            else:
-                gpa_display = grade.get('绩点文本', '--')
-            
-            html += f"""
-            <div style="display: flex; align-items: center; padding: 15px; background: {bg_color}; border-radius: 8px; margin-bottom: 10px;">
-                <div style="flex: 1;">
-                    <h4 style="margin: 0; color: #333; font-size: 16px;">{grade['课程名称']}</h4>
-                    <p style="margin: 5px 0 0 0; color: #666; font-size: 14px;">
-                        {grade['课程代码']} · {grade['课程类别']} · {grade['学分']}学分
-                    </p>
-                </div>
-                <div style="text-align: right;">
-                    <span style="display: inline-block; padding: 6px 12px; background: {grade_color}; color: white; border-radius: 20px; font-weight: bold; font-size: 16px;">
-                        {display_grade}
-                    </span>
-                    <p style="margin: 5px 0 0 0; color: #666; font-size: 14px;">
-                        {gpa_display}
-                    </p>
-                </div>
-            </div>
-            """
-        
-        html += f"""
-            </div>
-            
-            <!-- 底部信息 -->
-            <div style="text-align: center; color: #999; font-size: 12px; margin-top: 20px; padding: 20px;">
-                <p>查询时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                <p style="margin-top: 10px;">🎉 继续加油！</p>
-            </div>
-        </div>
-        """
-        
-        return html
+        return render_grade_report(grades, semester_id, title_prefix)
+
+    def build_transcript_html(self, transcript, title_prefix="成绩总表"):
+        """构建多学期成绩总表，transcript 为 get_all_grades 的返回值"""
+        return render_transcript(transcript, title_prefix)
 
     def select_semester(self):
         """让用户选择学期"""
@@ -811,6 +1091,7 @@ class WebVPNGradeChecker:
         self.log("="*60)
         self.log(f"共找到 {len(available_semesters)} 个学期")
         
+        flush_logs()
         choice = input("\n请选择学期 (输入数字或直接输入学期ID): ").strip()
         
         if not choice:
@@ -835,10 +1116,7 @@ class WebVPNGradeChecker:
     
     def run(self, semester_id=None, pushplus_token=None):
         """运行完整流程"""
-        if not self.login():
-            return
-        
-        if not self.access_eamis():
+        if not self.ensure_login():
             return
         
         if not semester_id:
@@ -851,6 +1129,7 @@ class WebVPNGradeChecker:
             self.display_grades(grades)
             
             if pushplus_token:
+                flush_logs()
                 push = input("\n是否将成绩推送到微信? (y/n): ").strip().lower()
                 if push == 'y':
                     html = self.build_grade_html(grades, semester_id)
@@ -860,6 +1139,7 @@ class WebVPNGradeChecker:
         
         # 询问是否查询其他学期
         while True:
+            flush_logs()
             another = input("\n是否查询其他学期? (y/n): ").strip().lower()
             if another == 'y':
                 semester_id = self.select_semester()
@@ -867,6 +1147,7 @@ class WebVPNGradeChecker:
                 if grades:
                     self.display_grades(grades)
                     if pushplus_token:
+                        flush_logs()
                         push = input("\n是否将成绩推送到微信? (y/n): ").strip().lower()
                         if push == 'y':
                             html = self.build_grade_html(grades, semester_id)
@@ -875,26 +1156,126 @@ class WebVPNGradeChecker:
                 break
 
 
+# 成绩页面中每次请求都会变化的内容，计算摘要前去掉
+_VOLATILE_PATTERNS = [
+    (re.compile(r'grid\d+'), 'grid'),                                 # 每次渲染随机生成的表格ID
+    (re.compile(r'semesterBar\d+Semester'), 'semesterBar'),
+    (re.compile(r'[?&;](?:_|vpn_timestamp|wrdrecordvisit)=\d+'), ''),  # 请求时间戳
+    (re.compile(r'(?i)(?:jsessionid|csrf[-_]?token)[=:]\s*["\']?[\w.-]+'), ''),
+    (re.compile(r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(?::\d{2})?'), ''),       # 页面中的当前时间
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def grade_page_digest(html_content):
+    """对成绩页面做归一化后计算摘要，内容未变化时摘要相同"""
+    for pattern, replacement in _VOLATILE_PATTERNS:
+        html_content = pattern.sub(replacement, html_content)
+    return hashlib.sha256(html_content.encode('utf-8')).hexdigest()
+
+
 # 🔧 重点改进：成绩监控类
 class GradeMonitor(WebVPNGradeChecker):
-    def __init__(self, username, encrypted_password, pushplus_token, log_callback=None):
-        super().__init__(username, encrypted_password, log_callback)
+    def __init__(self, username, encrypted_password, pushplus_token, log_callback=None, session_store=None,
+                 grade_store=None, grade_cache=None, session_pool=None, transport=None, dispatcher=None,
+                 notifiers=None, account_session=None):
+        # 监控默认启用会话缓存，避免每次检查都完整登录
+        if session_store is None:
+            session_store = SessionStore()
+        # 检查结果写入进程内共享的成绩缓存，GUI查询可以直接使用
+        if grade_cache is None:
+            grade_cache = get_default_grade_cache()
+        super().__init__(username, encrypted_password, log_callback, session_store, grade_cache=grade_cache,
+                         session_pool=session_pool, transport=transport, account_session=account_session)
         self.pushplus_token = pushplus_token
+        # PushPlus之外的通知渠道配置，如 [{"type": "smtp", ...}, {"type": "webhook", ...}]，见 notifiers
+        # 也可以传入 Notifier 实例，统一转换成配置字典（可写入JSON）
+        self.notifiers = [create_notifier(notifier).to_config() for notifier in notifiers or []]
+        # 成绩变化通知交给后台推送分发器（见 push_dispatcher），默认使用进程内共享的实例
+        self.dispatcher = dispatcher or get_default_dispatcher()
+        # 渠道凭据只登记在分发器内存中，重启后队列里恢复的本账号推送按此发送
+        self.register_notification_channels()
         self.last_grades_file = "last_grades.json"
+        # 成绩历史存储（如 grade_store.SQLiteGradeStore），为None时使用 last_grades_file
+        self.grade_store = grade_store
+        self.check_count = 0
+        
+        # 自适应轮询：发现变化后缩短到下限，无变化时按倍数退避到上限（单位：分钟）
+        self.adaptive = False
+        self.min_interval = 5
+        self.max_interval = 120
+        self.backoff_factor = 1.5
+        self.current_interval = None
+        self.metrics_log_every = 10  # 每隔多少次检查在日志中输出一次请求统计，0 表示不输出
+        self._page_digests = None  # {学期ID: 上次成绩页面摘要}，首次使用时从文件加载
+        
+        # 最近一次检查的结果，守护进程直接从内存读取，不再访问WebVPN
+        self.latest_grades = {}  # {学期ID: 最近一次解析出的完整成绩列表}
+        self.stats = GradeStats()  # 所有监控学期的累计统计，每次解析后按变化的课程增量更新
+        self.last_check_time = None
+        self.last_result = None  # True/False 是否有变化，None 表示登录失败或尚未检查
+    
+    @property
+    def digest_file(self):
+        return f"{os.path.splitext(self.last_grades_file)[0]}_digest.json"
+    
+    def _load_page_digest(self, semester_id):
+        """读取上次成绩页面的摘要"""
+        if self.grade_store:
+            return self.grade_store.get_digest(self.username, semester_id)
         
-    def load_last_grades(self):
-        """加载上次的成绩"""
+        if self._page_digests is None:
+            self._page_digests = {}
+            try:
+                if os.path.exists(self.digest_file):
+                    with open(self.digest_file, 'r', encoding='utf-8') as f:
+                        self._page_digests = json.load(f)
+            except Exception as e:
+                self.log(f"加载页面摘要失败: {e}")
+        
+        # 历史成绩文件不存在时摘要无效，必须重新解析保存
+        if not os.path.exists(self.last_grades_file):
+            return None
+        return self._page_digests.get(str(semester_id))
+    
+    def _save_page_digest(self, semester_id, digest):
+        """保存成绩页面摘要"""
+        if self.grade_store:
+            self.grade_store.set_digest(self.username, semester_id, digest)
+            return
+        
+        self._page_digests[str(semester_id)] = digest
+        try:
+            with open(self.digest_file, 'w', encoding='utf-8') as f:
+                json.dump(self._page_digests, f)
+        except Exception as e:
+            self.log(f"保存页面摘要失败: {e}")
+        
+    def load_last_grades(self, semester_id=None):
+        """加载上次的成绩，指定 semester_id 时只返回该学期的记录"""
         try:
+            if self.grade_store:
+                return self.grade_store.load_grades(self.username, semester_id)
             if os.path.exists(self.last_grades_file):
                 with open(self.last_grades_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    grades = json.load(f)
+                if semester_id is None:
+                    return grades
+                # 旧版本保存的记录没有学期ID，只可能是当时监控的学期，按原样使用
+                return [g for g in grades if g.get('学期ID') in (None, str(semester_id))]
         except Exception as e:
             self.log(f"加载历史成绩失败: {e}")
         return []
     
-    def save_last_grades(self, grades):
+    def save_last_grades(self, grades, semester_id=None):
         """保存成绩"""
         try:
+            if self.grade_store:
+                # 数据库只更新内容有变化的课程
+                written = self.grade_store.save_grades(self.username, semester_id, grades)
+                self.log(f"已保存 {len(grades)} 门课程记录（写入 {written} 行）")
+                return
+            
             grades_data = [{
                 '课程代码': g['课程代码'],
                 '课程名称': g['课程名称'],
@@ -902,7 +1283,8 @@ class GradeMonitor(WebVPNGradeChecker):
                 '学分': g['学分'],
                 '绩点': g['绩点'],
                 '成绩类型': g.get('成绩类型', '未知'),
-                '分数': g.get('分数', None)
+                '分数': g.get('分数', None),
+                '学期ID': str(semester_id) if semester_id is not None else None
             } for g in grades]
             
             with open(self.last_grades_file, 'w', encoding='utf-8') as f:
@@ -916,16 +1298,52 @@ class GradeMonitor(WebVPNGradeChecker):
         """检查成绩变化 - 增强版"""
         self.log(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 开始检查学期 {semester_id} 的成绩...")
         
-        # 获取当前成绩
-        current_grades = self.get_grades(semester_id)
+        # 获取当前成绩页面
+        response_text = self.get_grade_page(semester_id)
+        return self.check_grade_page(response_text, semester_id)
+    
+    def check_grade_page(self, response_text, semester_id):
+        """页面摘要与上次相同时跳过解析、比较和写文件"""
+        if response_text is None:
+            self.log("❌ 未获取到成绩数据，跳过本次检查")
+            return False
+        
+        digest = grade_page_digest(response_text)
+        if digest == self._load_page_digest(semester_id):
+            self.log("✅ 成绩页面未变化，跳过解析")
+            if self.grade_cache is not None:
+                self.grade_cache.touch(self.username, semester_id)
+            if str(semester_id) not in self.latest_grades:
+                # 重启后的首次检查：页面与上次保存时相同，直接使用保存的成绩填充内存结果和统计
+                last_grades = self.load_last_grades(semester_id)
+                if last_grades:
+                    self.latest_grades[str(semester_id)] = last_grades
+                    self.stats.sync(last_grades, scope=str(semester_id))
+            return False
+        
+        self.log("🔍 开始解析成绩数据...")
+        current_grades = self.parse_grades(response_text)
+        if current_grades:
+            self.latest_grades[str(semester_id)] = current_grades
+            if self.grade_cache is not None:
+                self.grade_cache.put(self.username, semester_id, current_grades)
+        has_changes = self.process_grades(current_grades, semester_id)
+        
+        if current_grades:
+            self._save_page_digest(semester_id, digest)
+        return has_changes
+    
+    def process_grades(self, current_grades, semester_id):
+        """与上次成绩比较、推送并保存 - 同步和异步引擎共用"""
         if not current_grades:
             self.log("❌ 未获取到成绩数据，跳过本次检查")
             return False
         
         self.log(f"✅ 当前获取到 {len(current_grades)} 门课程")
+        self.stats.sync(current_grades, scope=str(semester_id))
         
         # 加载上次成绩
-        last_grades = self.load_last_grades()
+        last_grades = self.load_last_grades(semester_id)
         self.log(f"📚 历史记录中有 {len(last_grades)} 门课程")
         
         # 比较变化
@@ -959,248 +1377,166 @@ class GradeMonitor(WebVPNGradeChecker):
             self.log(f"   更新课程: {len(updated_courses)} 门")
             
             # 🔧 重点改进：发送详细的HTML推送
-            if self.pushplus_token:
+            if self.notification_channels():
                 self._send_grade_change_notification(new_courses, updated_courses, semester_id)
             else:
-                self.log("⚠️ 未配置推送Token，跳过通知")
+                self.log("⚠️ 未配置推送Token或其他通知渠道，跳过通知")
                 
         else:
             self.log(f"✅ 暂无新变化 (当前共 {len(current_grades)} 门课程)")
         
         # 保存当前成绩
-        self.save_last_grades(current_grades)
+        self.save_last_grades(current_grades, semester_id)
         
         return total_changes > 0
     
+    def notification_channels(self):
+        """本账号的所有通知渠道配置：PushPlus（配置了Token时）+ notifiers"""
+        channels = list(self.notifiers)
+        if self.pushplus_token:
+            channels.insert(0, {'type': 'pushplus', 'token': self.pushplus_token})
+        return channels
+    
+    def register_notification_channels(self):
+        """把本账号当前的通知渠道登记到推送分发器，修改Token或渠道后需重新调用"""
+        self.dispatcher.register_channels(self.username, self.notification_channels())
+    
     def _send_grade_change_notification(self, new_courses, updated_courses, semester_id):
-        """发送成绩变化通知 - 增强的HTML推送"""
+        """把成绩变化交给推送分发器，发送在后台进行，检查不等待推送结果"""
         try:
             total_changes = len(new_courses) + len(updated_courses)
-            
-            # 构建推送标题
-            if new_courses and updated_courses:
-                title = f"🎓 成绩更新通知 - 新增{len(new_courses)}门，更新{len(updated_courses)}门"
-            elif new_courses:
-                title = f"🎓 新增成绩通知 - {len(new_courses)}门课程"
-            else:
-                title = f"🎓 成绩更新通知 - {len(updated_courses)}门课程"
-            
-            # 构建HTML内容
-            html_content = self._build_change_notification_html(new_courses, updated_courses, semester_id)
-            
-            # 发送推送
-            if self.send_pushplus(self.pushplus_token, title, html_content):
-                self.log(f"✅ 成绩变化通知已推送到微信 ({total_changes}门课程)")
-            else:
-                self.log("❌ 推送失败")
-                
+            self.dispatcher.submit_changes(self.username, self.notification_channels(), semester_id, new_courses,
+                                           updated_courses, summary=self.stats.summary(), logger=self.logger)
+            self.log(f"📮 成绩变化通知已加入推送队列 ({total_changes}门课程)")
         except Exception as e:
             self.log(f"❌ 发送通知时出错: {e}")
     
-    def _build_change_notification_html(self, new_courses, updated_courses, semester_id):
-        """构建成绩变化通知的HTML"""
-        total_changes = len(new_courses) + len(updated_courses)
+    def _build_change_notification_html(self, new_courses, updated_courses, semester_id, stats=None):
+        """构建成绩变化通知的HTML，传入 stats 时附带当前的累计绩点"""
+        summary = stats.summary() if stats is not None else None
+        return render_change_notification(new_courses, updated_courses, semester_id, summary=summary)
+    
+    def run_check(self, semester_id="4324"):
+        """执行一次完整检查（登录 + 检查成绩），返回是否有变化，登录失败返回None"""
+        self.check_count += 1
+        self.log(f"\n{'='*60}")
+        self.log(f"🔍 第 {self.check_count} 次检查 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        self.log(f"{'='*60}")
+        
+        self.last_check_time = datetime.now()
+        
+        # 登录检查（优先复用缓存会话）
+        if not self.ensure_login():
+            self.log("❌ 登录失败，等待下次检查")
+            self.last_result = None
+            return None
         
-        html = f"""
-        <div style="font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif; max-width: 600px; margin: 0 auto;">
-            <!-- 标题卡片 -->
-            <div style="background: linear-gradient(135deg, #FF6B6B 0%, #4ECDC4 100%); color: white; padding: 25px; border-radius: 15px 15px 0 0; text-align: center;">
-                <h2 style="margin: 0; font-size: 28px;">🎉 成绩更新通知</h2>
-                <p style="margin: 10px 0 0 0; opacity: 0.9;">学期 {semester_id} · 共 {total_changes} 门课程有变化</p>
-            </div>
-            
-            <!-- 统计卡片 -->
-            <div style="background: white; padding: 20px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); margin-bottom: 20px;">
-                <div style="display: flex; justify-content: space-around; text-align: center;">
-                    <div>
-                        <h3 style="margin: 0; color: #4CAF50; font-size: 36px; font-weight: bold;">{len(new_courses)}</h3>
-                        <p style="margin: 5px 0 0 0; color: #666; font-size: 16px;">新增课程</p>
-                    </div>
-                    <div>
-                        <h3 style="margin: 0; color: #2196F3; font-size: 36px; font-weight: bold;">{len(updated_courses)}</h3>
-                        <p style="margin: 5px 0 0 0; color: #666; font-size: 16px;">更新课程</p>
-                    </div>
-                </div>
-            </div>
-        """
+        # 检查成绩
+        has_changes = self.check_grades(semester_id)
+        self.last_result = has_changes
         
-        # 新增课程部分
-        if new_courses:
-            html += """
-            <div style="background: white; padding: 20px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); border-radius: 10px; margin-bottom: 20px;">
-                <h3 style="margin: 0 0 20px 0; color: #4CAF50; font-size: 20px;">🆕 新增课程</h3>
-            """
-            
-            for i, grade in enumerate(new_courses):
-                grade_type = grade.get('成绩类型', '未知')
-                
-                # 设置颜色
-                if grade_type == '等级制':
-                    grade_colors = {
-                        'A': '#4CAF50', 'A-': '#66BB6A',
-                        'B+': '#42A5F5', 'B': '#2196F3', 'B-': '#1E88E5',
-                        'C+': '#FFA726', 'C': '#FF9800', 'C-': '#FB8C00',
-                        'D': '#EF5350', 'F': '#F44336'
-                    }
-                    grade_color = grade_colors.get(grade['等级'], '#757575')
-                elif grade_type == '百分制':
-                    score = grade.get('分数', 0)
-                    if score >= 90:
-                        grade_color = '#4CAF50'
-                    elif score >= 80:
-                        grade_color = '#2196F3'
-                    elif score >= 70:
-                        grade_color = '#FF9800'
-                    elif score >= 60:
-                        grade_color = '#FFC107'
-                    else:
-                        grade_color = '#F44336'
-                elif grade_type == '通过制':
-                    grade_color = '#4CAF50' if grade['等级'] in ['通过', '合格'] else '#F44336'
-                else:
-                    grade_color = '#757575'
-                
-                # 显示文本
-                if grade_type == '百分制':
-                    display_grade = f"{grade.get('分数', 0):.0f}分"
-                else:
-                    display_grade = grade['等级']
-                
-                # 绩点信息
-                if grade.get('绩点') is not None:
-                    gpa_display = f"绩点 {grade['绩点']:.1f}"
-                else:
-                    gpa_display = grade.get('绩点文本', '--')
-                
-                bg_color = "#e8f5e8" if i % 2 == 0 else "#f0f8f0"
-                
-                html += f"""
-                <div style="display: flex; align-items: center; padding: 15px; background: {bg_color}; border-radius: 8px; margin-bottom: 10px; border-left: 4px solid #4CAF50;">
-                    <div style="flex: 1;">
-                        <h4 style="margin: 0; color: #333; font-size: 16px;">{grade['课程名称']}</h4>
-                        <p style="margin: 5px 0 0 0; color: #666; font-size: 14px;">
-                            {grade['课程代码']} · {grade['课程类别']} · {grade['学分']}学分
-                        </p>
-                    </div>
-                    <div style="text-align: right;">
-                        <span style="display: inline-block; padding: 6px 12px; background: {grade_color}; color: white; border-radius: 20px; font-weight: bold; font-size: 16px;">
-                            {display_grade}
-                        </span>
-                        <p style="margin: 5px 0 0 0; color: #666; font-size: 14px;">
-                            {gpa_display}
-                        </p>
-                    </div>
-                </div>
-                """
-            
-            html += "</div>"
-        
-        # 更新课程部分
-        if updated_courses:
-            html += """
-            <div style="background: white; padding: 20px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); border-radius: 10px; margin-bottom: 20px;">
-                <h3 style="margin: 0 0 20px 0; color: #2196F3; font-size: 20px;">📝 更新课程</h3>
-            """
-            
-            for i, change in enumerate(updated_courses):
-                current = change['current']
-                previous = change['previous']
-                
-                bg_color = "#e3f2fd" if i % 2 == 0 else "#f0f8ff"
-                
-                html += f"""
-                <div style="padding: 15px; background: {bg_color}; border-radius: 8px; margin-bottom: 10px; border-left: 4px solid #2196F3;">
-                    <h4 style="margin: 0 0 10px 0; color: #333; font-size: 16px;">{current['课程名称']}</h4>
-                    <div style="display: flex; justify-content: space-between; align-items: center;">
-                        <div style="color: #666; font-size: 14px;">
-                            {current['课程代码']} · {current['课程类别']} · {current['学分']}学分
-                        </div>
-                        <div style="text-align: right;">
-                            <div style="margin-bottom: 5px;">
-                                <span style="color: #999; font-size: 12px;">原成绩: </span>
-                                <span style="text-decoration: line-through; color: #999;">{previous['等级']}</span>
-                            </div>
-                            <div>
-                                <span style="color: #999; font-size: 12px;">新成绩: </span>
-                                <span style="color: #2196F3; font-weight: bold; font-size: 16px;">{current['等级']}</span>
-                            </div>
-                        </div>
-                    </div>
-                </div>
-                """
-            
-            html += "</div>"
-        
-        # 底部信息
-        html += f"""
-            <div style="text-align: center; color: #999; font-size: 12px; margin-top: 20px; padding: 20px;">
-                <p>检查时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                <p style="margin-top: 10px;">🎉 恭喜获得新成绩！继续加油！</p>
-            </div>
-        </div>
+        if has_changes:
+            self.log("🎊 本次检查发现成绩变化！")
+        else:
+            self.log("😴 本次检查无变化")
+        
+        if self.metrics_log_every and self.check_count % self.metrics_log_every == 0:
+            self.log_request_metrics()
+        return has_changes
+    
+    def enable_adaptive(self, min_interval=5, max_interval=120, backoff_factor=1.5):
+        """启用自适应轮询间隔（单位：分钟）"""
+        self.adaptive = True
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff_factor = backoff_factor
+    
+    def next_interval(self, has_changes):
+        """根据本次检查结果计算下次间隔（分钟）
+        
+        成绩往往集中在期末几天发布：发现变化后立即缩短到下限，
+        之后每次无变化按 backoff_factor 倍数退避，直到上限。登录失败时保持不变。
         """
+        current = self.current_interval
+        if has_changes:
+            new_interval = self.min_interval
+        elif has_changes is None:
+            new_interval = current
+        else:
+            new_interval = min(self.max_interval, current * self.backoff_factor)
         
-        return html
+        new_interval = max(self.min_interval, min(self.max_interval, new_interval))
+        if round(new_interval) != round(current):
+            self.log(f"📈 自适应间隔调整: {current:.0f} → {new_interval:.0f} 分钟")
+        self.current_interval = new_interval
+        return new_interval
     
-    def monitor_loop(self, semester_id="4324", interval=30):
-        """持续监控成绩 - 增强版"""
+    def schedule(self, scheduler, semester_id="4324", interval=30, on_result=None, first_delay=None):
+        """把本监控注册到共享调度器，返回 ScheduledJob（调用 job.cancel() 停止）
+        
+        on_result(has_changes) 在每次检查完成后回调，登录失败时参数为None。
+        启用自适应轮询时，interval 作为初始间隔。
+        first_delay（秒）为None时由调度器随机错开首次检查，避免多个账号同时请求。
+        """
+        self.current_interval = interval
+        self.register_notification_channels()
+        last_result = [None]
+        
+        def _check():
+            has_changes = self.run_check(semester_id)
+            last_result[0] = has_changes
+            if on_result:
+                on_result(has_changes)
+        
+        def _next_interval():
+            if not self.adaptive:
+                return interval * 60
+            return self.next_interval(last_result[0]) * 60
+        
+        def _on_reschedule(job):
+            next_check_time = job.next_run_time()
+            self.log(f"⏰ 下次检查时间: {next_check_time.strftime('%H:%M:%S')}")
+            self.log(f"💤 等待 {job.seconds_until_next() / 60:.0f} 分钟...")
+        
+        def _on_error(job, e):
+            # 与调度器实际使用的重试等待一致（不超过检查间隔）
+            delay = min(job.scheduler.retry_delay, job.interval)
+            wait = f"{delay / 60:.0f} 分钟" if delay >= 60 else f"{delay:.0f} 秒"
+            self.log(f"❌ 监控过程出错: {e}")
+            self.log(f"⏱️ 等待{wait}后继续...")
+        
+        return scheduler.add_job(_check, interval * 60, name=f"{self.username}:{semester_id}",
+                                 first_delay=first_delay, on_reschedule=_on_reschedule, on_error=_on_error,
+                                 interval_func=_next_interval)
+    
+    def monitor_loop(self, semester_id="4324", interval=30, scheduler=None):
+        """持续监控成绩 - 增强版，阻塞直到 Ctrl+C"""
         self.log(f"🚀 开始监控学期 {semester_id}，每 {interval} 分钟检查一次")
+        if self.adaptive:
+            self.log(f"📈 自适应间隔: {self.min_interval}~{self.max_interval} 分钟")
         self.log(f"📱 推送Token: {'已配置' if self.pushplus_token else '未配置'}")
+        if self.notifiers:
+            self.log(f"📨 其他通知渠道: {', '.join(str(create_notifier(n)) for n in self.notifiers)}")
         
-        check_count = 0
+        own_scheduler = scheduler is None
+        if own_scheduler:
+            scheduler = MonitorScheduler(max_workers=1)
+        job = self.schedule(scheduler, semester_id, interval)
         
-        while True:
-            try:
-                check_count += 1
-                self.log(f"\n{'='*60}")
-                self.log(f"🔍 第 {check_count} 次检查 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                self.log(f"{'='*60}")
-                
-                # 登录检查
-                if not self.login():
-                    self.log("❌ 登录失败，等待下次检查")
-                elif not self.access_eamis():
-                    self.log("❌ 访问教务系统失败，等待下次检查")
-                else:
-                    # 检查成绩
-                    has_changes = self.check_grades(semester_id)
-                    
-                    if has_changes:
-                        self.log("🎊 本次检查发现成绩变化！")
-                    else:
-                        self.log("😴 本次检查无变化")
-                
-                # 计算下次检查时间
-                next_check_time = datetime.now()
-                next_check_time = next_check_time.replace(
-                    hour=(next_check_time.hour + interval // 60) % 24,
-                    minute=(next_check_time.minute + interval % 60) % 60,
-                    second=0,
-                    microsecond=0
-                )
-                
-                self.log(f"⏰ 下次检查时间: {next_check_time.strftime('%H:%M:%S')}")
-                self.log(f"💤 等待 {interval} 分钟...")
-                
-            except KeyboardInterrupt:
-                self.log("\n⚡ 收到中断信号，停止监控")
-                break
-            except Exception as e:
-                self.log(f"❌ 监控过程出错: {e}")
-                self.log("⏱️ 等待1分钟后继续...")
-                time.sleep(60)
-                continue
-            
-            # 等待指定时间，每分钟显示一次剩余时间
-            for i in range(interval):
-                try:
-                    time.sleep(60)  # 等待1分钟
-                    remaining = interval - i - 1
-                    if remaining > 0 and remaining % 5 == 0:  # 每5分钟显示一次
-                        self.log(f"⏳ 还有 {remaining} 分钟进行下次检查...")
-                except KeyboardInterrupt:
-                    self.log("\n⚡ 收到中断信号，停止监控")
-                    return
+        try:
+            # 检查在调度器线程中进行，主线程只等待中断信号
+            while not job.wait_cancelled(timeout=1):
+                pass
+        except KeyboardInterrupt:
+            self.log("\n⚡ 收到中断信号，停止监控")
+        finally:
+            job.cancel()
+            if own_scheduler:
+                scheduler.stop()
+            # 退出前把合并窗口中的通知发出去，发送失败的留在队列文件中下次继续
+            if self.dispatcher.pending():
+                self.log("📮 正在发送队列中的推送...")
+                self.dispatcher.flush(timeout=15)
 
 
 if __name__ == "__main__":
@@ -1214,8 +1550,9 @@ if __name__ == "__main__":
     print("选择运行模式:")
     print("1. 普通查询")
     print("2. 成绩监控")
+    print("3. 全部学期成绩单")
     
-    mode = input("请选择 (1/2): ").strip()
+    mode = input("请选择 (1/2/3): ").strip()
     
     if mode == "2":
         # 监控模式
@@ -1241,6 +1578,8 @@ if __name__ == "__main__":
             print("⚠️ 输入无效，使用默认间隔30分钟")
             interval = 30
         
+        adaptive = input("是否启用自适应间隔（发现成绩后加快检查，无变化时逐渐放慢）? (y/n): ").strip().lower() == 'y'
+        
         print(f"\n🚀 开始监控...")
         print(f"📚 监控学期: {semester_id}")
         print(f"⏱️ 检查间隔: {interval} 分钟")
@@ -1249,8 +1588,20 @@ if __name__ == "__main__":
         print("="*50)
         
         monitor = GradeMonitor(USERNAME, ENCRYPTED_PASSWORD, PUSHPLUS_TOKEN)
+        if adaptive:
+            monitor.enable_adaptive(min_interval=5, max_interval=max(interval * 4, 60))
         monitor.monitor_loop(semester_id=semester_id, interval=interval)
         
+    elif mode == "3":
+        # 全部学期成绩单
+        print(f"\n🎯 获取全部学期成绩单")
+        checker = WebVPNGradeChecker(USERNAME, ENCRYPTED_PASSWORD)
+        if checker.ensure_login():
+            transcript = checker.get_all_grades()
+            for entry in transcript.values():
+                checker.log(f"\n📅 {entry['semester']['display_name']} (ID: {entry['semester']['id']})")
+                checker.display_grades(entry['grades'])
+        
     else:
         # 普通查询模式
         print(f"\n🎯 启动普通查询模式")
@@ -5,14 +5,21 @@ from tkinter import messagebox
 import threading
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import datetime
 import webbrowser
 import time
 import asyncio
 import sys
+import queue
+import logging
+import logging.handlers
 
 # 导入你的核心功能类
-from nku_grades import WebVPNGradeChecker, GradeMonitor
+from nku_grades import WebVPNGradeChecker, GradeMonitor, SessionStore, get_default_session_pool
+from grade_cache import get_default_grade_cache
+from grade_stats import GradeStats
+from semester_catalog import get_default_semester_catalog
+from monitor_scheduler import get_default_scheduler
 
 # 导入密码获取功能
 from get_encrypted_password import get_login_payload
@@ -21,11 +28,272 @@ from get_encrypted_password import get_login_payload
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
-class EnhancedGradeMonitor(threading.Thread):
-    """增强的GUI成绩监控线程"""
+class BufferedLogView:
+    """批量刷新的日志视图
     
-    def __init__(self, username, password, token, semester_id, interval, log_callback, status_callback):
-        super().__init__()
+    工作线程只把消息放入队列；GUI主线程按固定帧率一次性写入一批，
+    文本框超过 max_lines 行时删除最早的行（可选写入滚动日志文件）。
+    """
+    
+    def __init__(self, textbox, max_lines=2000, flush_interval_ms=100, max_batch=500,
+                 spill_file=None, spill_max_bytes=1024 * 1024, spill_backups=3):
+        self.textbox = textbox
+        self.max_lines = max_lines
+        self.flush_interval_ms = flush_interval_ms
+        self.max_batch = max_batch
+        self.line_count = 0
+        self._queue = queue.SimpleQueue()
+        self._after_id = None
+        
+        # 被移出文本框的旧日志写入滚动文件
+        self._spill = None
+        if spill_file:
+            self._spill = logging.handlers.RotatingFileHandler(
+                spill_file, maxBytes=spill_max_bytes, backupCount=spill_backups, encoding="utf-8")
+    
+    def write(self, message):
+        """线程安全，可以在任意线程调用"""
+        # 核心模块的日志回调已带时间戳，其余消息在这里补上
+        if not message.startswith("["):
+            message = f"[{datetime.now().strftime('%H:%M:%S')}] {message}"
+        self._queue.put(message)
+    
+    def start(self):
+        if self._after_id is None:
+            self._after_id = self.textbox.after(self.flush_interval_ms, self._flush)
+    
+    def stop(self):
+        """停止定时刷新，队列中剩余的消息写入滚动文件"""
+        if self._after_id is not None:
+            self.textbox.after_cancel(self._after_id)
+            self._after_id = None
+        remaining = self._drain(None)
+        if remaining:
+            self._spill_lines(remaining)
+        if self._spill:
+            self._spill.close()
+    
+    def clear(self):
+        self.textbox.delete("1.0", "end")
+        self.line_count = 0
+    
+    def _drain(self, limit):
+        messages = []
+        while limit is None or len(messages) < limit:
+            try:
+                messages.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return messages
+    
+    def _flush(self):
+        try:
+            messages = self._drain(self.max_batch)
+            if messages:
+                text = "\n".join(messages) + "\n"
+                self.textbox.insert("end", text)
+                self.line_count += text.count("\n")
+                self._trim()
+                self.textbox.see("end")
+        finally:
+            self._after_id = self.textbox.after(self.flush_interval_ms, self._flush)
+    
+    def _trim(self):
+        excess = self.line_count - self.max_lines
+        if excess <= 0:
+            return
+        end = f"{excess + 1}.0"
+        if self._spill:
+            self._spill_lines(self.textbox.get("1.0", end).rstrip("\n").split("\n"))
+        self.textbox.delete("1.0", end)
+        self.line_count -= excess
+    
+    def _spill_lines(self, lines):
+        if not self._spill:
+            return
+        for line in lines:
+            self._spill.emit(logging.makeLogRecord({'msg': line}))
+
+
+GRADE_COLORS = {
+    'A': '#4CAF50', 'A-': '#66BB6A',
+    'B+': '#42A5F5', 'B': '#2196F3', 'B-': '#1E88E5',
+    'C+': '#FFA726', 'C': '#FF9800', 'C-': '#FB8C00',
+    'D': '#EF5350', 'F': '#F44336',
+    '通过': '#9E9E9E', '不通过': '#F44336'
+}
+
+
+class GradeCard(ctk.CTkFrame):
+    """可复用的成绩卡片，重新绑定课程时只更新内容有变化的标签"""
+    
+    def __init__(self, parent, fonts, height):
+        super().__init__(parent, height=height)
+        self.pack_propagate(False)
+        self.rendered = None
+        
+        # 左侧信息
+        left_frame = ctk.CTkFrame(self, fg_color="transparent")
+        left_frame.pack(side="left", fill="both", expand=True, padx=12, pady=12)
+        self.name_label = ctk.CTkLabel(left_frame, text="", font=fonts['name'], anchor="w")
+        self.name_label.pack(fill="x")
+        self.info_label = ctk.CTkLabel(left_frame, text="", font=fonts['info'], text_color="gray", anchor="w")
+        self.info_label.pack(fill="x", pady=(3, 0))
+        
+        # 右侧成绩
+        right_frame = ctk.CTkFrame(self, fg_color="transparent")
+        right_frame.pack(side="right", padx=12, pady=12)
+        self.grade_label = ctk.CTkLabel(right_frame, text="", font=fonts['grade'])
+        self.grade_label.pack()
+        self.gpa_label = ctk.CTkLabel(right_frame, text="", font=fonts['gpa'], text_color="gray")
+        self.gpa_label.pack(pady=(2, 0))
+    
+    @staticmethod
+    def render_key(grade):
+        """卡片上显示的全部内容，相同则无需重绘"""
+        gpa = f"绩点 {grade['绩点']}" if grade['绩点'] is not None else grade['绩点文本']
+        return (
+            grade['课程名称'],
+            f"{grade['课程代码']} · {grade['课程类别']} · {grade['学分']}学分",
+            grade['等级'],
+            gpa,
+        )
+    
+    def show(self, key):
+        """显示一门课程，返回是否实际更新了标签"""
+        if key == self.rendered:
+            return False
+        old = self.rendered or (None, None, None, None)
+        name, info, level, gpa = key
+        if name != old[0]:
+            self.name_label.configure(text=name)
+        if info != old[1]:
+            self.info_label.configure(text=info)
+        if level != old[2]:
+            self.grade_label.configure(text=level, text_color=GRADE_COLORS.get(level, '#757575'))
+        if gpa != old[3]:
+            self.gpa_label.configure(text=gpa)
+        self.rendered = key
+        return True
+
+
+class GradeCardList(ctk.CTkFrame):
+    """虚拟化的成绩列表
+    
+    只创建填满可见区域所需的几张卡片，滚动时把它们移动到新位置并绑定对应的课程；
+    重新查询时按卡片显示内容比较，只有成绩变化的卡片才会重新配置。
+    """
+    
+    CARD_HEIGHT = 75
+    CARD_GAP = 8
+    
+    def __init__(self, parent, hint_text="", **kwargs):
+        super().__init__(parent, **kwargs)
+        self.row_height = self.CARD_HEIGHT + self.CARD_GAP
+        self.keys = []  # 每门课程的显示内容
+        self.cards = []  # [(卡片, 画布窗口ID)]
+        
+        # 所有卡片共用一组字体
+        self.fonts = {
+            'name': ctk.CTkFont(size=15, weight="bold"),
+            'info': ctk.CTkFont(size=11),
+            'grade': ctk.CTkFont(size=18, weight="bold"),
+            'gpa': ctk.CTkFont(size=10),
+        }
+        
+        self.canvas = tk.Canvas(self, highlightthickness=0, borderwidth=0, yscrollincrement=20,
+                                bg=self._apply_appearance_mode(self._fg_color))
+        self.scrollbar = ctk.CTkScrollbar(self, command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_canvas_scroll)
+        self.scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True, padx=(6, 0), pady=6)
+        
+        self.hint = ctk.CTkLabel(self, text=hint_text, font=ctk.CTkFont(size=16), text_color="gray")
+        self.hint.place(relx=0.5, rely=0.4, anchor="center")
+        
+        self.canvas.bind("<Configure>", self._on_resize)
+        self.bind("<Enter>", self._bind_wheel)
+        self.bind("<Leave>", self._unbind_wheel)
+    
+    def show_hint(self, text):
+        """没有成绩时显示的提示"""
+        self.hint.configure(text=text)
+        if not self.keys:
+            self.hint.place(relx=0.5, rely=0.4, anchor="center")
+    
+    def set_grades(self, grades):
+        """替换列表内容，返回实际重绘的卡片数"""
+        self.keys = [GradeCard.render_key(g) for g in grades]
+        if self.keys:
+            self.hint.place_forget()
+        else:
+            self.hint.place(relx=0.5, rely=0.4, anchor="center")
+        self.canvas.configure(scrollregion=(0, 0, 0, max(len(self.keys) * self.row_height - self.CARD_GAP, 0)))
+        return self._render()
+    
+    def _ensure_pool(self):
+        """卡片数 = 可见行数 + 2，窗口变高时补充"""
+        height = max(self.canvas.winfo_height(), self.row_height)
+        needed = min(len(self.keys), height // self.row_height + 2)
+        width = self.canvas.winfo_width()
+        while len(self.cards) < needed:
+            card = GradeCard(self.canvas, self.fonts, self.CARD_HEIGHT)
+            window = self.canvas.create_window(0, 0, window=card, anchor="nw", width=width, state="hidden")
+            self.cards.append((card, window))
+    
+    def _render(self):
+        self._ensure_pool()
+        first = int(self.canvas.canvasy(0)) // self.row_height
+        changed = 0
+        # 每张卡片固定负责 index % 卡片数 的行，滚动一行只需重绑一张卡片
+        count = len(self.cards)
+        for offset in range(count):
+            index = first + offset
+            card, window = self.cards[index % count]
+            if index < len(self.keys):
+                changed += card.show(self.keys[index])
+                self.canvas.coords(window, 0, index * self.row_height)
+                self.canvas.itemconfigure(window, state="normal")
+            else:
+                self.canvas.itemconfigure(window, state="hidden")
+        return changed
+    
+    def _on_canvas_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self._render()
+    
+    def _on_resize(self, event):
+        for _, window in self.cards:
+            self.canvas.itemconfigure(window, width=event.width)
+        self._render()
+    
+    def _on_mousewheel(self, event):
+        if self.canvas.yview() == (0.0, 1.0):
+            return
+        if event.num == 4:
+            step = -1
+        elif event.num == 5:
+            step = 1
+        else:
+            step = -1 if event.delta > 0 else 1
+        self.canvas.yview_scroll(step, "units")
+    
+    def _bind_wheel(self, event=None):
+        self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
+        self.canvas.bind_all("<Button-4>", self._on_mousewheel)
+        self.canvas.bind_all("<Button-5>", self._on_mousewheel)
+    
+    def _unbind_wheel(self, event=None):
+        self.canvas.unbind_all("<MouseWheel>")
+        self.canvas.unbind_all("<Button-4>")
+        self.canvas.unbind_all("<Button-5>")
+
+
+class EnhancedGradeMonitor:
+    """增强的GUI成绩监控 - 注册到共享调度器，不单独占用线程"""
+    
+    def __init__(self, username, password, token, semester_id, interval, log_callback, status_callback,
+                 scheduler=None):
         self.username = username
         self.password = password
         self.token = token
@@ -33,13 +301,14 @@ class EnhancedGradeMonitor(threading.Thread):
         self.interval = interval
         self.log_callback = log_callback
         self.status_callback = status_callback
+        self.scheduler = scheduler or get_default_scheduler()
         
         self.running = False
-        self.daemon = True
+        self.job = None
         
         # 创建监控实例，传入日志回调
-        from nku_grades import GradeMonitor
-        self.monitor = GradeMonitor(username, password, token, log_callback=self.log)
+        self.monitor = GradeMonitor(username, password, token, log_callback=self.log,
+                                    session_pool=get_default_session_pool())
     
     def log(self, message):
         """日志回调"""
@@ -54,74 +323,31 @@ class EnhancedGradeMonitor(threading.Thread):
     def start_monitoring(self):
         """开始监控"""
         self.running = True
-        self.start()
+        self.log(f"🚀 开始监控学期 {self.semester_id}，每 {self.interval} 分钟检查一次")
+        self.log(f"📱 推送Token: {'已配置' if self.token else '未配置'}")
+        self.job = self.monitor.schedule(self.scheduler, self.semester_id, self.interval,
+                                         on_result=self._on_result, first_delay=0)
     
     def stop_monitoring(self):
-        """停止监控"""
+        """停止监控（立即生效）"""
         self.running = False
+        if self.job:
+            self.job.cancel()
+            self.job = None
+            self.log("🛑 监控已停止")
+            self.update_status("⚪ 监控已停止", "white")
     
-    def run(self):
-        """监控主循环"""
-        self.log(f"🚀 开始监控学期 {self.semester_id}，每 {self.interval} 分钟检查一次")
-        self.log(f"📱 推送Token: {'已配置' if self.token else '未配置'}")
-        
-        check_count = 0
-        
-        while self.running:
-            try:
-                check_count += 1
-                self.log(f"\n{'='*60}")
-                self.log(f"🔍 第 {check_count} 次检查 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                self.log(f"{'='*60}")
-                
-                self.update_status(f"🔄 正在进行第 {check_count} 次检查...", "yellow")
-                
-                # 登录检查
-                if not self.monitor.login():
-                    self.log("❌ 登录失败，等待下次检查")
-                    self.update_status("❌ 登录失败", "red")
-                elif not self.monitor.access_eamis():
-                    self.log("❌ 访问教务系统失败，等待下次检查")
-                    self.update_status("❌ 访问教务系统失败", "red")
-                else:
-                    # 检查成绩
-                    has_changes = self.monitor.check_grades(self.semester_id)
-                    
-                    if has_changes:
-                        self.log("🎊 本次检查发现成绩变化！")
-                        self.update_status("🎉 发现成绩变化！", "green")
-                    else:
-                        self.log("😴 本次检查无变化")
-                        self.update_status("✅ 监控正常，无变化", "green")
-                
-                if not self.running:
-                    break
-                
-                # 计算下次检查时间
-                next_check_time = datetime.now() + timedelta(minutes=self.interval)
-                self.log(f"⏰ 下次检查时间: {next_check_time.strftime('%H:%M:%S')}")
-                self.log(f"💤 等待 {self.interval} 分钟...")
-                
-                # 等待指定时间，期间可以被中断
-                for i in range(self.interval):
-                    if not self.running:
-                        break
-                    
-                    remaining = self.interval - i
-                    if remaining % 5 == 0 and remaining > 0:  # 每5分钟更新一次状态
-                        self.update_status(f"⏳ {remaining} 分钟后检查", "blue")
-                    
-                    time.sleep(60)  # 等待1分钟
-                
-            except Exception as e:
-                self.log(f"❌ 监控过程出错: {e}")
-                self.update_status("❌ 监控出错", "red")
-                if self.running:
-                    self.log("⏱️ 等待1分钟后继续...")
-                    time.sleep(60)
-        
-        self.log("🛑 监控已停止")
-        self.update_status("⚪ 监控已停止", "white")
+    def is_alive(self):
+        return self.running
+    
+    def _on_result(self, has_changes):
+        """每次检查完成后更新状态"""
+        if has_changes is None:
+            self.update_status("❌ 登录失败", "red")
+        elif has_changes:
+            self.update_status("🎉 发现成绩变化！", "green")
+        else:
+            self.update_status(f"✅ 监控正常，无变化（{self.interval} 分钟后检查）", "green")
 
 class ModernGradeApp(ctk.CTk):
     def __init__(self):
@@ -417,6 +643,17 @@ class ModernGradeApp(ctk.CTk):
         )
         self.query_btn.pack(fill="x", padx=15, pady=(0, 6))  # 减少间距
         
+        # 强制刷新：跳过成绩缓存，重新从教务系统获取
+        self.force_refresh_var = tk.BooleanVar(value=False)
+        ctk.CTkCheckBox(
+            function_frame,
+            text="强制刷新（不使用缓存）",
+            variable=self.force_refresh_var,
+            checkbox_width=18,
+            checkbox_height=18,
+            font=ctk.CTkFont(size=12)
+        ).pack(anchor="w", padx=15, pady=(0, 6))
+        
         # 监控按钮
         self.monitor_btn = ctk.CTkButton(
             function_frame,
@@ -450,6 +687,18 @@ class ModernGradeApp(ctk.CTk):
         )
         interval_entry.pack(side="left")
         
+        # 自适应间隔：发现成绩后加快检查，无变化时逐渐放慢
+        self.adaptive_var = tk.BooleanVar(value=self.config.get('adaptive_interval', False))
+        ctk.CTkCheckBox(
+            monitor_settings,
+            text="自适应",
+            variable=self.adaptive_var,
+            width=20,
+            checkbox_width=18,
+            checkbox_height=18,
+            font=ctk.CTkFont(size=12)
+        ).pack(side="left", padx=(10, 0))
+        
         # 监控状态显示
         self.monitor_status = ctk.CTkLabel(
             function_frame,
@@ -751,18 +1000,10 @@ class ModernGradeApp(ctk.CTk):
         self.create_stats_tab()
         
     def create_grade_tab(self):
-        # 成绩显示区域
-        self.grade_frame = ctk.CTkScrollableFrame(self.grade_tab)
-        self.grade_frame.pack(fill="both", expand=True, padx=10, pady=10)
-        
-        # 初始提示
-        self.grade_hint = ctk.CTkLabel(
-            self.grade_frame,
-            text="请先验证账号，然后点击「查询成绩」获取最新成绩",
-            font=ctk.CTkFont(size=16),
-            text_color="gray"
-        )
-        self.grade_hint.pack(expand=True, pady=100)
+        # 成绩显示区域（虚拟化列表，只渲染可见的卡片）
+        self.grade_list = GradeCardList(
+            self.grade_tab, hint_text="请先验证账号，然后点击「查询成绩」获取最新成绩")
+        self.grade_list.pack(fill="both", expand=True, padx=10, pady=10)
         
     def create_log_tab(self):
         # 日志文本框
@@ -773,13 +1014,21 @@ class ModernGradeApp(ctk.CTk):
         )
         self.log_text.pack(fill="both", expand=True, padx=10, pady=10)
         
+        # 日志批量写入，长时间监控时文本框保持在固定行数内
+        self.log_view = BufferedLogView(
+            self.log_text,
+            max_lines=self.config.get('log_max_lines', 2000),
+            spill_file=self.config.get('log_spill_file')
+        )
+        self.log_view.start()
+        
         # 清空按钮
         clear_btn = ctk.CTkButton(
             self.log_tab,
             text="清空日志",
             height=30,
             font=ctk.CTkFont(size=12),
-            command=lambda: self.log_text.delete("1.0", "end")
+            command=self.log_view.clear
         )
         clear_btn.pack(side="left", padx=(10, 5), pady=(0, 10))
         
@@ -854,42 +1103,37 @@ class ModernGradeApp(ctk.CTk):
         try:
             checker = WebVPNGradeChecker(
                 self.username_var.get(),
-                self.password_var.get()
+                self.password_var.get(),
+                session_store=SessionStore(),
+                session_pool=get_default_session_pool()
             )
             
-            # 步骤1：验证登录
-            if checker.login():
-                self.log("✅ WebVPN登录成功")
+            # 步骤1：登录并进入教务系统（会话池中已有有效会话时直接复用）
+            if checker.ensure_login():
+                self.log("✅ 登录并进入教务系统成功")
+                
+                # 步骤2：获取学期数据
+                self.log("正在获取学期列表...")
+                semester_list = checker.get_dynamic_semesters()
                 
-                # 步骤2：访问教务系统
-                if checker.access_eamis():
-                    self.log("✅ 教务系统访问成功")
+                if semester_list:
+                    self.log(f"✅ 成功获取 {len(semester_list)} 个学期")
                     
-                    # 步骤3：获取学期数据
-                    self.log("正在获取学期列表...")
-                    semester_list = checker.get_dynamic_semesters()
+                    # 更新UI
+                    self.after(0, self._update_semester_options, semester_list)
+                    self.after(0, self._set_verification_success)
+                    
+                    # 保存学期数据到配置
+                    self.config['semester_data'] = semester_list
+                    self.log(f"学期数据已加入配置，共 {len(semester_list)} 个学期")
+                    self.after(0, self.save_config_clicked)
                     
-                    if semester_list:
-                        self.log(f"✅ 成功获取 {len(semester_list)} 个学期")
-                        
-                        # 更新UI
-                        self.after(0, self._update_semester_options, semester_list)
-                        self.after(0, self._set_verification_success)
-                        
-                        # 保存学期数据到配置
-                        self.config['semester_data'] = semester_list
-                        self.log(f"学期数据已加入配置，共 {len(semester_list)} 个学期")
-                        self.after(0, self.save_config_clicked)
-                        
-                    else:
-                        self.log("❌ 获取学期列表失败")
-                        self.after(0, self._set_verification_failed, "获取学期列表失败")
                 else:
-                    self.log("❌ 教务系统访问失败")
-                    self.after(0, self._set_verification_failed, "教务系统访问失败")
+                    self.log("❌ 获取学期列表失败")
+                    self.after(0, self._set_verification_failed, "获取学期列表失败")
             else:
-                self.log("❌ WebVPN登录失败")
-                self.after(0, self._set_verification_failed, "WebVPN登录失败")
+                self.log("❌ 登录或访问教务系统失败")
+                self.after(0, self._set_verification_failed, "登录或访问教务系统失败")
                 
         except Exception as e:
             self.log(f"❌ 验证过程出错: {e}")
@@ -934,7 +1178,7 @@ class ModernGradeApp(ctk.CTk):
         self.monitor_btn.configure(state="normal")
         
         # 更新提示文本
-        self.grade_hint.configure(text="点击「查询成绩」获取最新成绩")
+        self.grade_list.show_hint("点击「查询成绩」获取最新成绩")
         
     def _set_verification_failed(self, error_msg):
         """设置验证失败状态"""
@@ -947,11 +1191,20 @@ class ModernGradeApp(ctk.CTk):
         self.verify_btn.configure(state="normal", text="验证账号")
         
     def load_semester_data(self):
-        """加载配置中的学期数据"""
-        if 'semester_data' in self.config and self.config['semester_data']:
+        """加载学期数据：优先使用与命令行、监控共享的学期目录缓存，其次是配置中保存的数据"""
+        catalog = get_default_semester_catalog()
+        username = self.username_var.get().strip()
+        semester_list = catalog.peek(username)[0] if username else None
+        source = "学期目录缓存"
+        if not semester_list and self.config.get('semester_data'):
             semester_list = self.config['semester_data']
+            source = "配置"
+        if not semester_list:
+            semester_list = catalog.latest()
+        
+        if semester_list:
             self._update_semester_options(semester_list)
-            self.log(f"从配置加载了 {len(semester_list)} 个学期")
+            self.log(f"从{source}加载了 {len(semester_list)} 个学期")
             
             # 显示已保存的学期概要
             if len(semester_list) > 0:
@@ -1000,35 +1253,32 @@ class ModernGradeApp(ctk.CTk):
         try:
             checker = WebVPNGradeChecker(
                 self.username_var.get(),
-                self.password_var.get()
+                self.password_var.get(),
+                session_store=SessionStore(),
+                session_pool=get_default_session_pool()
             )
             
-            if checker.login():
-                self.log("✅ 登录成功")
-                if checker.access_eamis():
-                    self.log("✅ 进入教务系统")
+            if checker.ensure_login():
+                self.log("✅ 已进入教务系统")
+                
+                # 手动刷新时跳过学期目录缓存，结果会写回缓存供命令行和监控使用
+                semester_list = checker.get_dynamic_semesters(force_refresh=True)
+                
+                if semester_list:
+                    self.log(f"✅ 刷新成功，获取到 {len(semester_list)} 个学期")
                     
-                    # 使用动态获取方法
-                    semester_list = checker.get_dynamic_semesters()
+                    # 更新UI
+                    self.after(0, self._update_semester_options, semester_list)
+                    self.after(0, lambda: self.set_status("✅ 学期列表已刷新", "green"))
+                    
+                    # 保存到配置
+                    self.config['semester_data'] = semester_list
+                    self.log(f"学期数据已更新到配置，共 {len(semester_list)} 个学期")
+                    self.after(0, self.save_config_clicked)
                     
-                    if semester_list:
-                        self.log(f"✅ 刷新成功，获取到 {len(semester_list)} 个学期")
-                        
-                        # 更新UI
-                        self.after(0, self._update_semester_options, semester_list)
-                        self.after(0, lambda: self.set_status("✅ 学期列表已刷新", "green"))
-                        
-                        # 保存到配置
-                        self.config['semester_data'] = semester_list
-                        self.log(f"学期数据已更新到配置，共 {len(semester_list)} 个学期")
-                        self.after(0, self.save_config_clicked)
-                        
-                    else:
-                        self.log("❌ 获取学期列表失败")
-                        self.after(0, lambda: self.set_status("❌ 获取学期列表失败", "red"))
                 else:
-                    self.log("❌ 访问教务系统失败")
-                    self.after(0, lambda: self.set_status("❌ 访问教务系统失败", "red"))
+                    self.log("❌ 获取学期列表失败")
+                    self.after(0, lambda: self.set_status("❌ 获取学期列表失败", "red"))
             else:
                 self.log("❌ 登录失败")
                 self.after(0, lambda: self.set_status("❌ 登录失败", "red"))
@@ -1039,11 +1289,8 @@ class ModernGradeApp(ctk.CTk):
             self.after(0, lambda: self.refresh_btn.configure(state="normal", text="刷新学期列表"))
         
     def log(self, message):
-        """添加日志"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_message = f"[{timestamp}] {message}\n"
-        self.log_text.insert("end", log_message)
-        self.log_text.see("end")
+        """添加日志（线程安全，由 BufferedLogView 批量写入文本框）"""
+        self.log_view.write(message)
         
     def set_status(self, text, color="white"):
         """设置状态"""
@@ -1067,44 +1314,47 @@ class ModernGradeApp(ctk.CTk):
         self.log(f"开始查询 {selected_name} (ID: {semester_id}) 的成绩...")
         
         # 在新线程中运行
-        thread = threading.Thread(target=self._query_grades_thread, args=(semester_id,))
+        thread = threading.Thread(target=self._query_grades_thread, args=(semester_id, self.force_refresh_var.get()))
         thread.daemon = True
         thread.start()
         
-    def _query_grades_thread(self, semester_id):
+    def _query_grades_thread(self, semester_id, force_refresh=False):
         """查询成绩线程 - 增强日志版"""
         try:
-            # 创建查询实例，传入日志回调
+            # 创建查询实例，传入日志回调；与监控共享成绩缓存
             from nku_grades import WebVPNGradeChecker
             checker = WebVPNGradeChecker(
                 self.username_var.get(),
                 self.password_var.get(),
-                log_callback=self.log  # 传入日志回调
+                log_callback=self.log,  # 传入日志回调
+                session_store=SessionStore(),
+                grade_cache=get_default_grade_cache(),
+                session_pool=get_default_session_pool()
             )
             
-            # 后续代码保持不变，因为现在 checker 会自动将日志输出到GUI
-            if checker.login():
-                if checker.access_eamis():
-                    grades = checker.get_grades(semester_id)
-                    
-                    if grades:
-                        self.log(f"✅ 获取到 {len(grades)} 门成绩")
-                        self.after(0, self.display_grades, grades)
-                        self.after(0, self.update_stats, grades)
-                        self.after(0, lambda: self.set_status("✅ 查询成功", "green"))
-                        
-                        # 询问是否推送
-                        if self.token_var.get():
-                            self.after(0, self.ask_push, grades, checker, semester_id)
-                    else:
-                        self.log("❌ 未获取到成绩（该学期可能没有成绩）")
-                        self.after(0, lambda: self.set_status("❌ 未获取到成绩", "red"))
-                else:
-                    self.log("❌ 访问教务系统失败")
-                    self.after(0, lambda: self.set_status("❌ 访问失败", "red"))
+            # 缓存命中（如监控刚检查过）时不需要登录
+            grades = None if force_refresh else checker.get_cached_grades(semester_id)
+            
+            if grades is None:
+                # 验证账号或监控已经登录过时复用同一个会话
+                if not checker.ensure_login():
+                    self.log("❌ 登录或访问教务系统失败")
+                    self.after(0, lambda: self.set_status("❌ 登录失败", "red"))
+                    return
+                grades = checker.get_grades(semester_id, force_refresh=True)
+            
+            if grades:
+                self.log(f"✅ 获取到 {len(grades)} 门成绩")
+                self.after(0, self.display_grades, grades)
+                self.after(0, self.update_stats, grades)
+                self.after(0, lambda: self.set_status("✅ 查询成功", "green"))
+                
+                # 询问是否推送
+                if self.token_var.get():
+                    self.after(0, self.ask_push, grades, checker, semester_id)
             else:
-                self.log("❌ 登录失败")
-                self.after(0, lambda: self.set_status("❌ 登录失败", "red"))
+                self.log("❌ 未获取到成绩（该学期可能没有成绩）")
+                self.after(0, lambda: self.set_status("❌ 未获取到成绩", "red"))
                 
         except Exception as e:
             self.log(f"❌ 出错: {str(e)}")
@@ -1113,80 +1363,8 @@ class ModernGradeApp(ctk.CTk):
             self.after(0, lambda: self.query_btn.configure(state="normal", text="查询成绩"))
             
     def display_grades(self, grades):
-        """显示成绩"""
-        # 清空原有内容
-        for widget in self.grade_frame.winfo_children():
-            widget.destroy()
-            
-        # 显示每门课程
-        for i, grade in enumerate(grades):
-            self.create_grade_card(self.grade_frame, grade, i)
-            
-    def create_grade_card(self, parent, grade, index):
-        """创建成绩卡片"""
-        # 根据等级设置颜色
-        grade_colors = {
-            'A': '#4CAF50', 'A-': '#66BB6A',
-            'B+': '#42A5F5', 'B': '#2196F3', 'B-': '#1E88E5',
-            'C+': '#FFA726', 'C': '#FF9800', 'C-': '#FB8C00',
-            'D': '#EF5350', 'F': '#F44336',
-            '通过': '#9E9E9E', '不通过': '#F44336'
-        }
-        
-        color = grade_colors.get(grade['等级'], '#757575')
-        
-        # 卡片容器
-        card = ctk.CTkFrame(parent, height=75)
-        card.pack(fill="x", pady=(0, 8))
-        card.pack_propagate(False)
-        
-        # 左侧信息
-        left_frame = ctk.CTkFrame(card, fg_color="transparent")
-        left_frame.pack(side="left", fill="both", expand=True, padx=12, pady=12)
-        
-        ctk.CTkLabel(
-            left_frame,
-            text=grade['课程名称'],
-            font=ctk.CTkFont(size=15, weight="bold"),
-            anchor="w"
-        ).pack(fill="x")
-        
-        ctk.CTkLabel(
-            left_frame,
-            text=f"{grade['课程代码']} · {grade['课程类别']} · {grade['学分']}学分",
-            font=ctk.CTkFont(size=11),
-            text_color="gray",
-            anchor="w"
-        ).pack(fill="x", pady=(3, 0))
-        
-        # 右侧成绩
-        right_frame = ctk.CTkFrame(card, fg_color="transparent")
-        right_frame.pack(side="right", padx=12, pady=12)
-        
-        # 等级标签
-        grade_label = ctk.CTkLabel(
-            right_frame,
-            text=grade['等级'],
-            font=ctk.CTkFont(size=18, weight="bold"),
-            text_color=color
-        )
-        grade_label.pack()
-        
-        # 绩点标签
-        if grade['绩点'] is not None:
-            ctk.CTkLabel(
-                right_frame,
-                text=f"绩点 {grade['绩点']}",
-                font=ctk.CTkFont(size=10),
-                text_color="gray"
-            ).pack(pady=(2, 0))
-        else:
-            ctk.CTkLabel(
-                right_frame,
-                text=grade['绩点文本'],
-                font=ctk.CTkFont(size=10),
-                text_color="gray"
-            ).pack(pady=(2, 0))
+        """显示成绩（复用已有卡片，只重绘内容变化的行）"""
+        self.grade_list.set_grades(grades)
             
     def update_stats(self, grades):
         """更新统计信息"""
@@ -1195,31 +1373,14 @@ class ModernGradeApp(ctk.CTk):
             widget.destroy()
             
         # 计算统计数据
-        total_credits = sum(g['学分'] for g in grades)
-        graded_courses = [g for g in grades if g['绩点'] is not None]
-        
-        if graded_courses:
-            gpa_credits = sum(g['学分'] for g in graded_courses)
-            weighted_gpa = sum(g['学分'] * g['绩点'] for g in graded_courses)
-            avg_gpa = weighted_gpa / gpa_credits
-        else:
-            avg_gpa = 0
-            gpa_credits = 0
-            
-        # 等级统计
-        grade_stats = {}
-        for grade in grades:
-            level = grade['等级']
-            if level not in grade_stats:
-                grade_stats[level] = 0
-            grade_stats[level] += 1
+        stats = GradeStats(grades)
             
         # 显示统计卡片
         stats_data = [
             ("📚 总课程数", f"{len(grades)} 门"),
-            ("💯 总学分", f"{total_credits} 分"),
-            ("⭐ 平均绩点", f"{avg_gpa:.3f}"),
-            ("📊 等级制课程", f"{len(graded_courses)} 门")
+            ("💯 总学分", f"{stats.total_credits:.1f} 分"),
+            ("⭐ 平均绩点", f"{stats.avg_gpa:.3f}"),
+            ("📊 等级制课程", f"{stats.count('等级制')} 门")
         ]
         
         # 创建2x2网格
@@ -1249,7 +1410,8 @@ class ModernGradeApp(ctk.CTk):
         self.stats_frame.grid_columnconfigure(1, weight=1)
         
         # 等级分布
-        if grade_stats:
+        distribution = stats.distribution()
+        if distribution:
             grade_dist_frame = ctk.CTkFrame(self.stats_frame)
             grade_dist_frame.grid(row=2, column=0, columnspan=2, padx=8, pady=8, sticky="ew")
             
@@ -1259,27 +1421,15 @@ class ModernGradeApp(ctk.CTk):
                 font=ctk.CTkFont(size=13, weight="bold")
             ).pack(pady=(10, 5))
             
-            # 按等级顺序排列
-            grade_order = ['A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D', 'F', '通过', '不通过']
-            for grade_level in grade_order:
-                if grade_level in grade_stats:
-                    grade_info = ctk.CTkLabel(
-                        grade_dist_frame,
-                        text=f"{grade_level}: {grade_stats[grade_level]} 门",
-                        font=ctk.CTkFont(size=11)
-                    )
-                    grade_info.pack(pady=1)
-            
-            # 其他等级
-            other_grades = [g for g in grade_stats if g not in grade_order]
-            for grade_level in other_grades:
+            # 按等级顺序排列，其他等级在后
+            for grade_level, count in distribution:
                 grade_info = ctk.CTkLabel(
                     grade_dist_frame,
-                    text=f"{grade_level}: {grade_stats[grade_level]} 门",
+                    text=f"{grade_level}: {count} 门",
                     font=ctk.CTkFont(size=11)
                 )
                 grade_info.pack(pady=1)
-                
+            
             # 底部留白
             ctk.CTkLabel(grade_dist_frame, text="").pack(pady=5)
         
@@ -1359,10 +1509,9 @@ class ModernGradeApp(ctk.CTk):
                 self.monitor_thread.stop_monitoring()
             
     def _create_enhanced_monitor(self, semester_id, interval):
-        """创建增强的监控线程"""
-        class EnhancedGUIMonitor(threading.Thread):
+        """创建增强的监控（注册到共享调度器）"""
+        class EnhancedGUIMonitor:
             def __init__(self, username, password, token, semester_id, interval, gui_app):
-                super().__init__()
                 self.username = username
                 self.password = password
                 self.token = token
@@ -1370,15 +1519,16 @@ class ModernGradeApp(ctk.CTk):
                 self.interval = interval
                 self.gui_app = gui_app
                 self.running = False
-                self.daemon = True
+                self.job = None
                 
                 # 创建监控实例，传入日志回调
                 from nku_grades import GradeMonitor
-                self.monitor = GradeMonitor(username, password, token, log_callback=self.log)
+                self.monitor = GradeMonitor(username, password, token, log_callback=self.log,
+                                            session_pool=get_default_session_pool())
             
             def log(self, message):
-                """日志回调到GUI"""
-                self.gui_app.after(0, lambda: self.gui_app.log(message))
+                """日志回调到GUI（入队即返回，由日志视图批量刷新）"""
+                self.gui_app.log(message)
             
             def update_status(self, message, color="white"):
                 """状态更新回调到GUI"""
@@ -1387,84 +1537,55 @@ class ModernGradeApp(ctk.CTk):
             def start_monitoring(self):
                 """开始监控"""
                 self.running = True
-                self.start()
-            
-            def stop_monitoring(self):
-                """停止监控"""
-                self.running = False
-            
-            def run(self):
-                """监控主循环"""
                 self.log(f"🚀 开始监控学期 {self.semester_id}，每 {self.interval} 分钟检查一次")
                 self.log(f"📱 推送Token: {'已配置' if self.token else '未配置'}")
+                self.update_status("🔄 正在进行第 1 次检查...", "yellow")
                 
-                check_count = 0
-                
-                while self.running:
-                    try:
-                        check_count += 1
-                        self.log(f"\n{'='*60}")
-                        self.log(f"🔍 第 {check_count} 次检查 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-                        self.log(f"{'='*60}")
-                        
-                        self.update_status(f"🔄 正在进行第 {check_count} 次检查...", "yellow")
-                        
-                        # 登录检查
-                        if not self.monitor.login():
-                            self.log("❌ 登录失败，等待下次检查")
-                            self.update_status("❌ 登录失败", "red")
-                        elif not self.monitor.access_eamis():
-                            self.log("❌ 访问教务系统失败，等待下次检查")
-                            self.update_status("❌ 访问教务系统失败", "red")
-                        else:
-                            # 检查成绩
-                            has_changes = self.monitor.check_grades(self.semester_id)
-                            
-                            if has_changes:
-                                self.log("🎊 本次检查发现成绩变化！")
-                                self.update_status("🎉 发现成绩变化！", "green")
-                            else:
-                                self.log("😴 本次检查无变化")
-                                self.update_status("✅ 监控正常，无变化", "green")
-                        
-                        if not self.running:
-                            break
-                        
-                        # 计算下次检查时间并更新GUI状态
-                        next_check_time = datetime.now() + timedelta(minutes=self.interval)
-                        self.log(f"⏰ 下次检查时间: {next_check_time.strftime('%H:%M:%S')}")
-                        self.log(f"💤 等待 {self.interval} 分钟...")
-                        
-                        # 等待指定时间，期间定期更新状态
-                        for i in range(self.interval):
-                            if not self.running:
-                                break
-                            
-                            remaining = self.interval - i
-                            
-                            # 更新监控状态显示
-                            if remaining > 1:
-                                self.gui_app.after(0, lambda r=remaining: self.gui_app.monitor_status.configure(
-                                    text=f"下次检查: {r-1} 分钟后",
-                                    text_color="green"
-                                ))
-                            
-                            time.sleep(60)  # 等待1分钟
-                        
-                    except Exception as e:
-                        self.log(f"❌ 监控过程出错: {e}")
-                        self.update_status("❌ 监控出错", "red")
-                        if self.running:
-                            self.log("⏱️ 等待1分钟后继续...")
-                            time.sleep(60)
-                
+                # 用户手动启动的监控立即检查，状态栏提示与实际一致
+                self.job = self.monitor.schedule(get_default_scheduler(), self.semester_id, self.interval,
+                                                 on_result=self._on_result, first_delay=0)
+                # 剩余时间由GUI主线程定时刷新，不需要监控线程轮询
+                self.gui_app.after(1000, self._refresh_countdown)
+            
+            def stop_monitoring(self):
+                """停止监控（立即生效）"""
+                if not self.running:
+                    return
+                self.running = False
+                if self.job:
+                    self.job.cancel()
                 self.log("🛑 监控已停止")
                 self.update_status("⚪ 就绪", "white")
                 
                 # 清空监控状态
                 self.gui_app.after(0, lambda: self.gui_app.monitor_status.configure(text="", text_color="gray"))
+            
+            def is_alive(self):
+                return self.running
+            
+            def _on_result(self, has_changes):
+                """检查完成后更新GUI状态"""
+                if has_changes is None:
+                    self.update_status("❌ 登录失败", "red")
+                elif has_changes:
+                    self.update_status("🎉 发现成绩变化！", "green")
+                else:
+                    self.update_status("✅ 监控正常，无变化", "green")
+            
+            def _refresh_countdown(self):
+                """在GUI主线程中刷新下次检查的剩余时间"""
+                if not self.running:
+                    return
+                
+                remaining = self.job.seconds_until_next() if self.job else None
+                if remaining is None:
+                    text = f"🔄 正在进行第 {self.monitor.check_count} 次检查..."
+                else:
+                    text = f"下次检查: {max(1, round(remaining / 60))} 分钟后"
+                self.gui_app.monitor_status.configure(text=text, text_color="green")
+                self.gui_app.after(30 * 1000, self._refresh_countdown)
         
-        return EnhancedGUIMonitor(
+        gui_monitor = EnhancedGUIMonitor(
             self.username_var.get(),
             self.password_var.get(), 
             self.token_var.get(),
@@ -1472,6 +1593,10 @@ class ModernGradeApp(ctk.CTk):
             interval,
             self
         )
+        if self.adaptive_var.get():
+            gui_monitor.monitor.enable_adaptive(min_interval=5, max_interval=max(interval * 4, 60))
+            self.log(f"📈 自适应间隔: 5~{gui_monitor.monitor.max_interval} 分钟")
+        return gui_monitor
 
     def show_config_info(self):
         """显示配置文件信息"""
@@ -1654,7 +1779,8 @@ Token的作用：
         self.config.update({
             'username': self.username_var.get(),
             'password': self.password_var.get(),
-            'token': self.token_var.get()
+            'token': self.token_var.get(),
+            'adaptive_interval': self.adaptive_var.get()
         })
         
         try:
@@ -1689,7 +1815,8 @@ Token的作用：
         if self.monitoring:
             self.monitoring = False
             if self.monitor_thread and self.monitor_thread.is_alive():
-                self.monitor_thread.join(timeout=1)
+                self.monitor_thread.stop_monitoring()
+        self.log_view.stop()
         self.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,270 @@
+"""
+南开大学 WebVPN 成绩查询工具 - 通知渠道
+
+所有渠道实现同一个接口 send(notification, session, timeout)，由推送分发器（push_dispatcher）统一调度：
+    pushplus  PushPlus微信推送（HTML）
+    smtp      邮件（纯文本 + HTML 两种格式）
+    webhook   向任意地址 POST JSON
+    file      追加写入本地文件，每行一个JSON
+
+渠道用可以写入JSON的配置字典描述，例如：
+    {"type": "smtp", "host": "smtp.example.com", "port": 465, "ssl": true,
+     "username": "me@example.com", "password": "...", "to": ["me@example.com"]}
+    {"type": "webhook", "url": "https://example.com/hook", "headers": {"Authorization": "Bearer ..."}}
+    {"type": "file", "path": "notifications.jsonl"}
+
+同一条通知在每种格式下只渲染一次（Notification 内部缓存），再分发给账号配置的所有渠道。
+"""
+import json
+import re
+from abc import ABC, abstractmethod
+import smtplib
+import ssl
+import threading
+from datetime import datetime
+from email.message import EmailMessage
+
+import requests
+
+from grade_report import render_change_notification, render_change_text
+
+PUSHPLUS_URL = "http://www.pushplus.plus/send"
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_BLANK_RE = re.compile(r'\s*\n\s*')
+
+
+class Notification:
+    """一条待发送的通知，按格式（html/text/json）缓存渲染结果"""
+
+    def __init__(self, title, account=None, semesters=(), new_courses=(), updated_courses=(), summary=None,
+                 html=None, created_at=None):
+        self.title = title
+        self.account = account
+        self.semesters = list(semesters)
+        self.new_courses = list(new_courses)
+        self.updated_courses = list(updated_courses)
+        self.summary = summary
+        self.html = html  # 已渲染好的HTML消息（不是成绩变化通知时）
+        self.created_at = created_at or datetime.now()
+        self._rendered = {}
+
+    def render(self, fmt):
+        if fmt not in self._rendered:
+            self._rendered[fmt] = getattr(self, f"_render_{fmt}")()
+        return self._rendered[fmt]
+
+    def _render_html(self):
+        if self.html is not None:
+            return self.html
+        return render_change_notification(self.new_courses, self.updated_courses, ", ".join(self.semesters),
+                                          summary=self.summary, now=self.created_at)
+
+    def _render_text(self):
+        if self.html is not None:
+            return _BLANK_RE.sub("\n", _TAG_RE.sub("\n", self.html)).strip()
+        return render_change_text(self.new_courses, self.updated_courses, ", ".join(self.semesters),
+                                  summary=self.summary, now=self.created_at)
+
+    def _render_json(self):
+        payload = {
+            'title': self.title,
+            'account': self.account,
+            'time': self.created_at.isoformat(timespec='seconds'),
+            'text': self.render('text'),
+        }
+        if self.html is None:
+            payload.update({
+                'semesters': self.semesters,
+                'new_courses': self.new_courses,
+                'updated_courses': self.updated_courses,
+                'summary': self.summary,
+            })
+        return payload
+
+
+class Notifier(ABC):
+    """通知渠道的公共接口，子类必须实现 send 和 to_config"""
+
+    type = None
+
+    @abstractmethod
+    def send(self, notification, session=None, timeout=None):
+        """发送通知，返回 (是否成功, 是否值得重试, 说明)
+
+        session 为HTTP渠道使用的会话（如分发器的连接池），为None时直接使用 requests。
+        """
+
+    @abstractmethod
+    def to_config(self):
+        """可以写入JSON、并能由 create_notifier 还原的配置字典"""
+
+    def __str__(self):
+        return self.type
+
+
+class PushPlusNotifier(Notifier):
+    type = "pushplus"
+
+    def __init__(self, token, url=PUSHPLUS_URL):
+        self.token = token
+        self.url = url
+
+    def send(self, notification, session=None, timeout=None):
+        session = session or requests
+        data = {
+            "token": self.token,
+            "title": notification.title,
+            "content": notification.render('html'),
+            "template": "html"
+        }
+        try:
+            response = session.post(self.url, json=data, timeout=timeout)
+        except Exception as e:
+            return False, True, f"推送异常: {e}"
+        if response.status_code >= 500 or response.status_code == 429:
+            return False, True, f"推送服务返回 HTTP {response.status_code}"
+        try:
+            result = response.json()
+        except ValueError:
+            return False, True, f"推送服务返回了无法解析的内容 (HTTP {response.status_code})"
+        if result.get('code') == 200:
+            return True, False, "推送成功"
+        return False, False, f"推送失败: {result.get('msg')}"
+
+    def to_config(self):
+        config = {'type': self.type, 'token': self.token}
+        if self.url != PUSHPLUS_URL:
+            config['url'] = self.url
+        return config
+
+    def __str__(self):
+        return "PushPlus"
+
+
+class WebhookNotifier(Notifier):
+    """向任意地址 POST 通知的JSON，2xx 视为成功"""
+
+    type = "webhook"
+
+    def __init__(self, url, headers=None):
+        self.url = url
+        self.headers = dict(headers or {})
+
+    def send(self, notification, session=None, timeout=None):
+        session = session or requests
+        try:
+            response = session.post(self.url, json=notification.render('json'), headers=self.headers,
+                                    timeout=timeout)
+        except Exception as e:
+            return False, True, f"Webhook请求异常: {e}"
+        if 200 <= response.status_code < 300:
+            return True, False, "Webhook已送达"
+        retryable = response.status_code >= 500 or response.status_code in (408, 429)
+        return False, retryable, f"Webhook返回 HTTP {response.status_code}"
+
+    def to_config(self):
+        return {'type': self.type, 'url': self.url, 'headers': self.headers}
+
+    def __str__(self):
+        return f"Webhook({self.url})"
+
+
+class SMTPNotifier(Notifier):
+    """邮件通知，正文同时包含纯文本和HTML"""
+
+    type = "smtp"
+
+    def __init__(self, host, to, port=None, username=None, password=None, sender=None, ssl=False,
+                 starttls=False):
+        self.host = host
+        self.to = [to] if isinstance(to, str) else list(to)
+        self.ssl = ssl
+        self.starttls = starttls
+        self.port = port or (465 if ssl else 587 if starttls else 25)
+        self.username = username
+        self.password = password
+        self.sender = sender or username or f"nku-grades@{host}"
+
+    def send(self, notification, session=None, timeout=None):
+        message = EmailMessage()
+        message['Subject'] = notification.title
+        message['From'] = self.sender
+        message['To'] = ", ".join(self.to)
+        message.set_content(notification.render('text'))
+        message.add_alternative(notification.render('html'), subtype='html')
+
+        # smtplib 只接受单个超时值，取 (连接, 读取) 中较大的一个
+        if isinstance(timeout, tuple):
+            timeout = max(timeout)
+        try:
+            if self.ssl:
+                client = smtplib.SMTP_SSL(self.host, self.port, timeout=timeout,
+                                          context=ssl_context())
+            else:
+                client = smtplib.SMTP(self.host, self.port, timeout=timeout)
+            with client:
+                if self.starttls:
+                    client.starttls(context=ssl_context())
+                if self.username and self.password:
+                    client.login(self.username, self.password)
+                client.send_message(message)
+        except (smtplib.SMTPAuthenticationError, smtplib.SMTPRecipientsRefused,
+                smtplib.SMTPSenderRefused) as e:
+            return False, False, f"邮件发送失败: {e}"
+        except Exception as e:
+            return False, True, f"邮件发送异常: {e}"
+        return True, False, "邮件已发送"
+
+    def to_config(self):
+        return {'type': self.type, 'host': self.host, 'port': self.port, 'to': self.to,
+                'username': self.username, 'password': self.password, 'sender': self.sender,
+                'ssl': self.ssl, 'starttls': self.starttls}
+
+    def __str__(self):
+        return f"邮件({', '.join(self.to)})"
+
+
+class FileNotifier(Notifier):
+    """把通知追加写入本地文件，每行一个JSON"""
+
+    type = "file"
+
+    _lock = threading.Lock()
+
+    def __init__(self, path="notifications.jsonl"):
+        self.path = path
+
+    def send(self, notification, session=None, timeout=None):
+        line = json.dumps(notification.render('json'), ensure_ascii=False)
+        try:
+            with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + "\n")
+        except OSError as e:
+            return False, True, f"写入通知文件失败: {e}"
+        return True, False, f"已写入 {self.path}"
+
+    def to_config(self):
+        return {'type': self.type, 'path': self.path}
+
+    def __str__(self):
+        return f"文件({self.path})"
+
+
+NOTIFIER_TYPES = {cls.type: cls for cls in (PushPlusNotifier, WebhookNotifier, SMTPNotifier, FileNotifier)}
+
+
+def ssl_context():
+    return ssl.create_default_context()
+
+
+def create_notifier(config):
+    """由配置字典创建通知渠道，已经是 Notifier 实例时原样返回"""
+    if isinstance(config, Notifier):
+        return config
+    options = dict(config)
+    notifier_type = options.pop('type', None)
+    cls = NOTIFIER_TYPES.get(notifier_type)
+    if cls is None:
+        raise ValueError(f"未知的通知渠道类型: {notifier_type}")
+    return cls(**options)
@@ -0,0 +1,363 @@
+"""
+南开大学 WebVPN 成绩查询工具 - 推送分发
+
+监控检查不再同步发送通知：
+1. 成绩变化放入推送队列后立即返回，由后台线程发送到账号配置的所有通知渠道（见 notifiers）
+2. 队列保存在磁盘上（push_queue.json），进程重启后继续发送未完成的推送
+3. 同一账号在合并窗口内的多次变化合并成一条消息（同一课程保留最早的原成绩和最新的成绩）
+4. 每条消息每种格式只渲染一次，再分发给各个渠道；只有失败的渠道会重试
+5. 网络错误或服务器5xx时按指数退避重试，业务错误（如Token无效、收件人被拒）不再重试
+6. HTTP渠道复用同一个带连接池的会话，不再每次新建TCP+TLS连接
+
+队列文件中只保存渠道的类型和位置，不保存Token、邮箱密码等凭据：
+渠道配置由监控通过 register_channels 登记在内存中，发送时再按账号取出。
+进程重启后恢复的任务要等对应账号的监控重新登记渠道后才会发送。
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+from grade_logging import AccountLogger
+from grade_report import change_title
+from notifiers import PUSHPLUS_URL, Notification, create_notifier
+from transport import DEFAULT_TRANSPORT
+
+
+class PushDispatcher:
+    """带持久化队列、合并和重试的通知分发器"""
+
+    def __init__(self, queue_file="push_queue.json", url=PUSHPLUS_URL, transport=None, coalesce_window=30,
+                 max_attempts=6, retry_base=10, retry_max=600, log_callback=None):
+        self.queue_file = queue_file  # None 时只保存在内存中
+        self.url = url  # 未指定地址的PushPlus渠道使用的地址
+        self.transport = transport or DEFAULT_TRANSPORT
+        self.coalesce_window = coalesce_window  # 秒，窗口内同一账号的变化合并为一条消息
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base  # 秒，第n次重试前等待 retry_base * 2^(n-1)，不超过 retry_max
+        self.retry_max = retry_max
+        self.logger = AccountLogger(None, log_callback)
+        self.sent = 0
+        self.failed = 0
+
+        self.session = self.transport.create_session()
+        self._jobs = {}  # {任务ID: 任务}，任务是可以直接写入JSON的字典
+        self._channels = {}  # {账号或任务ID: [渠道配置, ...]}，含凭据，只保存在内存中
+        self._loggers = {}  # {任务ID: 提交者的日志器}，不持久化
+        self._cond = threading.Condition()
+        self._worker = None
+        self._stopped = False
+        self._load()
+
+    # ---- 队列持久化 ----
+
+    def _load(self):
+        if not self.queue_file or not os.path.exists(self.queue_file):
+            return
+        try:
+            with open(self.queue_file, 'r', encoding='utf-8') as f:
+                jobs = json.load(f)
+        except Exception as e:
+            self.logger.log_message(f"⚠️ 读取推送队列失败: {e}")
+            return
+        for job in jobs:
+            job['sending'] = False
+            if job['kind'] == 'message':
+                # 一次性消息的渠道只登记在上次运行的进程中，无法恢复
+                self.logger.log_message(f"⚠️ 无法恢复消息「{job['title']}」的通知渠道，已丢弃")
+                continue
+            self._jobs[job['id']] = job
+        if len(self._jobs) != len(jobs):
+            self._persist()
+        if self._jobs:
+            waiting = sum(1 for job in self._jobs.values() if not self._resolvable(job))
+            note = f"，其中 {waiting} 条等待对应账号的监控启动后发送" if waiting else ""
+            self.logger.log_message(f"📮 恢复了 {len(self._jobs)} 条未完成的推送{note}")
+            self.start()
+
+    def _persist(self):
+        """在持有 _cond 时调用"""
+        if not self.queue_file:
+            return
+        try:
+            tmp_path = f"{self.queue_file}.tmp"
+            # 队列中有成绩信息，只允许当前用户读写
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump(list(self._jobs.values()), f, ensure_ascii=False)
+            os.replace(tmp_path, self.queue_file)
+        except Exception as e:
+            self.logger.log_message(f"⚠️ 保存推送队列失败: {e}")
+
+    # ---- 渠道登记 ----
+
+    def register_channels(self, account, channels):
+        """登记账号当前的通知渠道配置（含凭据，只保存在内存中），该账号的待发送任务按此发送"""
+        configs = self._channel_configs(channels)
+        with self._cond:
+            self._channels[account] = configs
+            self._cond.notify_all()
+        return configs
+
+    @staticmethod
+    def _channel_key(job):
+        # 成绩变化按账号取渠道（监控会重新登记），一次性消息的渠道按任务单独登记
+        return job['account'] if job['kind'] == 'changes' else job['id']
+
+    def _resolvable(self, job):
+        """在持有 _cond 时调用"""
+        return self._channel_key(job) in self._channels
+
+    # ---- 提交 ----
+
+    def submit_changes(self, account, channels, semester_id, new_courses, updated_courses, summary=None,
+                       logger=None):
+        """提交一次成绩变化，立即返回任务ID
+
+        channels 是通知渠道的配置字典列表（或 Notifier 实例），同时登记为该账号的当前渠道。
+        合并窗口内还未发送的同账号、同渠道任务会直接合并，不产生新消息。
+        """
+        now = time.time()
+        semester_id = str(semester_id)
+        channels = [config['type'] for config in self.register_channels(account, channels)]
+        with self._cond:
+            job = self._find_pending(account, channels)
+            merged = job is not None
+            if not merged:
+                job = {
+                    'id': uuid.uuid4().hex,
+                    'kind': 'changes',
+                    'account': account,
+                    'channels': channels,
+                    'done': [],  # 已送达或放弃的渠道下标
+                    'semesters': [],
+                    'new': {},
+                    'updated': {},
+                    'summary': None,
+                    'created_at': now,
+                    'due_at': now + self.coalesce_window,
+                    'attempts': 0,
+                    'sending': False,
+                }
+                self._jobs[job['id']] = job
+            self._merge(job, semester_id, new_courses, updated_courses)
+            if summary is not None:
+                job['summary'] = summary
+            if logger is not None:
+                self._loggers[job['id']] = logger
+            if merged:
+                self._log(job, "📮 成绩变化已合并到待发送的通知中")
+            self._persist()
+            self._cond.notify()
+        self.start()
+        return job['id']
+
+    def submit(self, channels, title, content, account=None, logger=None):
+        """提交一条已经渲染好的HTML消息（不参与合并）"""
+        now = time.time()
+        configs = self._channel_configs(channels)
+        job = {
+            'id': uuid.uuid4().hex,
+            'kind': 'message',
+            'account': account,
+            'channels': [config['type'] for config in configs],
+            'done': [],
+            'title': title,
+            'content': content,
+            'created_at': now,
+            'due_at': now,
+            'attempts': 0,
+            'sending': False,
+        }
+        with self._cond:
+            self._jobs[job['id']] = job
+            self._channels[job['id']] = configs
+            if logger is not None:
+                self._loggers[job['id']] = logger
+            self._persist()
+            self._cond.notify()
+        self.start()
+        return job['id']
+
+    @staticmethod
+    def _channel_configs(channels):
+        return [create_notifier(channel).to_config() for channel in channels]
+
+    def _find_pending(self, account, channels):
+        for job in self._jobs.values():
+            if (job['kind'] == 'changes' and job['account'] == account and job['channels'] == channels
+                    and not job['sending'] and job['attempts'] == 0):
+                return job
+        return None
+
+    @staticmethod
+    def _merge(job, semester_id, new_courses, updated_courses):
+        if semester_id not in job['semesters']:
+            job['semesters'].append(semester_id)
+        for grade in new_courses:
+            job['new'][f"{semester_id}:{grade['课程代码']}"] = grade
+        for change in updated_courses:
+            key = f"{semester_id}:{change['current']['课程代码']}"
+            if key in job['new']:
+                # 窗口内新增后又更新：仍然是新增课程，显示最新成绩
+                job['new'][key] = change['current']
+            elif key in job['updated']:
+                job['updated'][key] = {'current': change['current'], 'previous': job['updated'][key]['previous']}
+            else:
+                job['updated'][key] = change
+
+    # ---- 发送 ----
+
+    def _notification(self, job):
+        if job['kind'] == 'message':
+            return Notification(job['title'], account=job.get('account'), html=job['content'])
+        new_courses = list(job['new'].values())
+        updated_courses = list(job['updated'].values())
+        return Notification(change_title(new_courses, updated_courses), account=job.get('account'),
+                            semesters=job['semesters'], new_courses=new_courses,
+                            updated_courses=updated_courses, summary=job.get('summary'))
+
+    def _notifier(self, config):
+        if config.get('type') == 'pushplus' and 'url' not in config:
+            config = dict(config, url=self.url)
+        return create_notifier(config)
+
+    def _deliver(self, job, configs):
+        """把通知发送到所有尚未送达的渠道，渲染结果在渠道之间共享
+
+        configs 是登记的渠道配置，与 job['channels'] 按位置对应。
+        返回 [(渠道下标, 渠道, 是否成功, 是否值得重试, 说明)]。
+        """
+        notification = self._notification(job)
+        results = []
+        for index, channel_type in enumerate(job['channels']):
+            if index in job['done']:
+                continue
+            config = configs[index] if index < len(configs) else None
+            if config is None or config.get('type') != channel_type:
+                results.append((index, channel_type, False, False, "通知渠道已被移除"))
+                continue
+            try:
+                notifier = self._notifier(config)
+                ok, retryable, message = notifier.send(notification, self.session, self.transport.timeout('push'))
+            except Exception as e:
+                notifier = config.get('type')
+                ok, retryable, message = False, False, f"通知渠道出错: {e}"
+            results.append((index, notifier, ok, retryable, message))
+        return notification.title, results
+
+    def _log(self, job, message):
+        logger = self._loggers.get(job['id']) or AccountLogger(job.get('account'), None)
+        logger.log_message(message)
+
+    def _next_due(self):
+        """在持有 _cond 时调用，返回 (最早到期的任务, 需要等待的秒数)"""
+        now = time.time()
+        waiting = [job for job in self._jobs.values() if not job['sending'] and self._resolvable(job)]
+        if not waiting:
+            return None, None
+        job = min(waiting, key=lambda j: j['due_at'])
+        return job, max(0.0, job['due_at'] - now)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    job, delay = self._next_due()
+                    if job is not None and delay <= 0:
+                        break
+                    self._cond.wait(timeout=delay)
+                job['sending'] = True
+                configs = self._channels[self._channel_key(job)]
+
+            title = job.get('title') or "成绩变化通知"
+            try:
+                title, results = self._deliver(job, configs)
+            except Exception as e:
+                results = [(None, None, False, False, f"生成通知内容出错: {e}")]
+
+            with self._cond:
+                job['sending'] = False
+                job['attempts'] += 1
+                retry = []
+                for index, notifier, ok, retryable, message in results:
+                    if ok:
+                        self.sent += 1
+                        job['done'].append(index)
+                        self._log(job, f"✅ {title}：已发送到{notifier}")
+                    elif retryable and job['attempts'] < self.max_attempts:
+                        retry.append(f"{notifier}: {message}")
+                    else:
+                        self.failed += 1
+                        if index is not None:
+                            job['done'].append(index)
+                        self._log(job, f"❌ {message}，放弃发送「{title}」到{notifier or '所有渠道'}")
+                if retry:
+                    delay = min(self.retry_max, self.retry_base * 2 ** (job['attempts'] - 1))
+                    job['due_at'] = time.time() + delay
+                    self._log(job, f"⚠️ {'；'.join(retry)}，{delay:.0f}秒后第{job['attempts']}次重试")
+                else:
+                    del self._jobs[job['id']]
+                    self._loggers.pop(job['id'], None)
+                    if job['kind'] == 'message':
+                        self._channels.pop(job['id'], None)
+                self._persist()
+                self._cond.notify_all()
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        with self._cond:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stopped = False
+            self._worker = threading.Thread(target=self._run, name="push-dispatcher", daemon=True)
+            self._worker.start()
+
+    def pending(self):
+        with self._cond:
+            return len(self._jobs)
+
+    def flush(self, timeout=30):
+        """跳过合并窗口立即发送待发送的任务，并等待其发送完成（重试中的任务也会等待），返回是否已全部发送
+
+        尚未登记渠道的任务（等待账号监控启动）不等待，留在队列中。
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            now = time.time()
+            for job in self._jobs.values():
+                if job['attempts'] == 0:
+                    job['due_at'] = min(job['due_at'], now)
+            self._cond.notify_all()
+            while any(self._resolvable(job) for job in self._jobs.values()):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(timeout=remaining)
+        return True
+
+    def stop(self):
+        """停止后台线程，未完成的任务留在队列文件中，下次启动时继续发送"""
+        with self._cond:
+            self._stopped = True
+            self._persist()
+            self._cond.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+
+
+_default_dispatcher = None
+_default_lock = threading.Lock()
+
+
+def get_default_dispatcher():
+    """进程内共享的通知分发器，监控和守护进程的通知都经过这里"""
+    global _default_dispatcher
+    with _default_lock:
+        if _default_dispatcher is None:
+            _default_dispatcher = PushDispatcher()
+        return _default_dispatcher
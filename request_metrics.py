@@ -0,0 +1,169 @@
+"""
+南开大学 WebVPN 成绩查询工具 - 请求级追踪和延迟直方图
+
+通过 requests 的 response hook 记录每个WebVPN接口的：
+1. 延迟（含响应体下载），按固定桶累计直方图，估算 p50/p90/p99
+2. 传输字节数（优先取 Content-Length，即压缩后的字节数）和状态码分布
+
+每次请求只做几次加法和一次字典查找，可以在生产监控中常开。
+汇总可以通过日志回调输出；report() 的结果由守护进程的 /metrics 接口和基准脚本的 --json 导出。
+"""
+import bisect
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+# 直方图桶上界（毫秒），最后一个桶收集所有更慢的请求
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+# WebVPN把目标主机编码在路径前缀中，这里还原成可读的系统名
+_VPN_HOSTS = {
+    '77726476706e69737468656265737421f9f64cd22931665b7f01c7a99c406d36af': 'iam',
+    '77726476706e69737468656265737421f5f64c95347e6651700388a5d6502720dc08a5': 'eams',
+}
+
+
+def _response_bytes(response):
+    """响应的传输字节数：有 Content-Length 时直接使用（压缩响应为压缩后的大小），否则按解码后的响应体计算"""
+    length = response.headers.get('Content-Length', '')
+    if length.isdigit():
+        return int(length)
+    return len(response.content)
+
+
+def endpoint_name(url):
+    """把请求URL归类为接口名，如 eams/teach/grade/course/person!search.action"""
+    path = urlsplit(url).path
+    parts = path.strip('/').split('/', 2)
+    if len(parts) >= 2 and parts[0] in ('http', 'https'):
+        host = _VPN_HOSTS.get(parts[1], parts[1][:12])
+        rest = parts[2] if len(parts) > 2 else ''
+        if host == 'eams' and rest.startswith('eams'):
+            rest = rest[4:].lstrip('/')
+        return f"{host}/{rest}" if rest else host
+    return path.strip('/') or '/'
+
+
+class EndpointStats:
+    __slots__ = ('count', 'total_ms', 'max_ms', 'bytes', 'statuses', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.bytes = 0
+        self.statuses = Counter()
+        self.buckets = [0] * len(LATENCY_BUCKETS_MS)
+
+    def percentile(self, q):
+        """按桶估算分位数，返回所在桶的上界（毫秒）"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for upper, n in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += n
+            if seen >= target:
+                return self.max_ms if upper == float('inf') else min(upper, self.max_ms)
+        return self.max_ms
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total_ms / self.count, 2) if self.count else None,
+            'p50_ms': self.percentile(0.5),
+            'p90_ms': self.percentile(0.9),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max_ms, 2),
+            'bytes': self.bytes,
+            'statuses': {str(code): n for code, n in sorted(self.statuses.items())},
+            'histogram': {('inf' if upper == float('inf') else str(upper)): n
+                          for upper, n in zip(LATENCY_BUCKETS_MS, self.buckets)},
+        }
+
+
+class RequestMetrics:
+    """进程内的按接口统计，线程安全"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, url, status, elapsed_ms, nbytes):
+        name = f"{method} {endpoint_name(url)}"
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+        with self._lock:
+            stats = self._endpoints.get(name)
+            if stats is None:
+                stats = self._endpoints[name] = EndpointStats()
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.bytes += nbytes
+            stats.statuses[status] += 1
+            stats.buckets[bucket] += 1
+            if elapsed_ms > stats.max_ms:
+                stats.max_ms = elapsed_ms
+
+    def response_hook(self, response, *args, **kwargs):
+        """requests 的 response hook，每个响应（包括重定向的中间响应）调用一次"""
+        started = time.perf_counter()
+        # 延迟包含响应体下载；非流式请求的响应体本来就会在钩子之后读取，这里提前读取不增加开销
+        response.content
+        elapsed_ms = response.elapsed.total_seconds() * 1000 + (time.perf_counter() - started) * 1000
+        self.record(response.request.method, response.url, response.status_code, elapsed_ms,
+                    _response_bytes(response))
+
+    async def httpx_response_hook(self, response):
+        """httpx 的 response 事件钩子（异步引擎）"""
+        started = time.perf_counter()
+        await response.aread()
+        elapsed_ms = response.elapsed.total_seconds() * 1000 + (time.perf_counter() - started) * 1000
+        self.record(response.request.method, str(response.url), response.status_code, elapsed_ms,
+                    _response_bytes(response))
+
+    def instrument(self, session):
+        """给 requests.Session 挂上追踪钩子"""
+        if self.response_hook not in session.hooks['response']:
+            session.hooks['response'].append(self.response_hook)
+        return session
+
+    def report(self):
+        """按总耗时从高到低排列的各接口统计"""
+        with self._lock:
+            items = [(name, stats.to_dict(), stats.total_ms) for name, stats in self._endpoints.items()]
+        items.sort(key=lambda item: item[2], reverse=True)
+        return {
+            'since': self.started_at,
+            'total_requests': sum(data['count'] for _, data, _ in items),
+            'endpoints': {name: data for name, data, _ in items},
+        }
+
+    def summary_lines(self, limit=10):
+        """适合写入日志的汇总行"""
+        report = self.report()
+        if not report['total_requests']:
+            return ["📊 暂无请求统计"]
+        lines = [f"📊 请求统计：共 {report['total_requests']} 次请求"]
+        for name, data in list(report['endpoints'].items())[:limit]:
+            errors = sum(n for code, n in data['statuses'].items() if int(code) >= 400)
+            lines.append(
+                f"   {name}: {data['count']}次 平均{data['avg_ms']:.0f}ms p90≤{data['p90_ms']:.0f}ms "
+                f"最大{data['max_ms']:.0f}ms {data['bytes'] / 1024:.1f}KB"
+                + (f" 错误{errors}次" if errors else "")
+            )
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self.started_at = time.time()
+
+
+_default_metrics = RequestMetrics()
+
+
+def get_default_metrics():
+    """进程内共享的请求统计，默认的 TransportConfig 创建的会话都记录到这里"""
+    return _default_metrics
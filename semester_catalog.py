@@ -0,0 +1,218 @@
+"""
+南开大学 WebVPN 成绩查询工具 - 学期目录缓存
+
+学期列表很少变化，不必每次都访问教务系统（两次请求 + 解析）：
+1. 按账号保存最近一次获取的学期列表（semester_catalog.json），命令行、GUI和监控共用
+2. 未过期时直接返回；过期后先返回旧数据，同时在后台刷新（stale-while-revalidate）
+3. 获取失败时依次使用本账号的旧数据、其他账号最近获取的数据，最后才使用内置的学期列表
+
+教务系统 dataQuery.action 返回的学期日历（JS对象字面量）也在这里解析，见 parse_semester_calendar。
+"""
+import json
+import os
+import re
+import threading
+import time
+
+# 内置的学期列表快照，截至 2025-2026 第1学期，需要随新学期手动补充。
+# 只在本账号和其他账号都从未成功获取过学期列表时使用（见 SemesterCatalog.get）：
+# 只要有任一账号获取过，就使用目录中最近获取的列表，其中包含快照之后的新学期。
+DEFAULT_SEMESTERS = [
+    {'id': '4364', 'display_name': '2025-2026 第1学期', 'school_year': '2025-2026', 'term': '1'},
+    {'id': '4344', 'display_name': '2024-2025 第3学期', 'school_year': '2024-2025', 'term': '3'},
+    {'id': '4324', 'display_name': '2024-2025 第2学期', 'school_year': '2024-2025', 'term': '2'},
+    {'id': '4262', 'display_name': '2024-2025 第1学期', 'school_year': '2024-2025', 'term': '1'},
+    {'id': '4304', 'display_name': '2023-2024 第3学期', 'school_year': '2023-2024', 'term': '3'},
+    {'id': '4284', 'display_name': '2023-2024 第2学期', 'school_year': '2023-2024', 'term': '2'},
+    {'id': '4263', 'display_name': '2023-2024 第1学期', 'school_year': '2023-2024', 'term': '1'},
+]
+
+# 学期日历形如 {yearDom:"...",semesters:{y0:[{id:4204,schoolYear:"2022-2023",name:"1"},...],...},yearIndex:"2",...}
+_SEMESTERS_START = re.compile(r'semesters\s*:\s*\{')
+# 依次匹配：学年键 y0:[ ，学期项 {id:..,schoolYear:"..",name:".."} ，semesters 对象的结尾
+_SEMESTER_TOKEN = re.compile(
+    r'y(?P<year>\d+)\s*:\s*\['
+    r'|\{\s*id\s*:\s*(?P<id>\d+)\s*,\s*schoolYear\s*:\s*"(?P<school_year>[^"]+)"\s*,\s*name\s*:\s*"(?P<name>[^"]+)"\s*\}'
+    r'|(?P<end>\}\s*,\s*yearIndex)'
+)
+
+
+def _semester_sort_key(item):
+    (year, term), _ = item
+    return year, int(term) if term.isdigit() else 0
+
+
+def parse_semester_calendar(text):
+    """把学期日历解析成学期列表（新学期在前），只保留4位数ID的学期
+
+    找不到学期数据时返回None；有学期数据但没有4位数ID的学期时返回空列表，与原实现一致。
+
+    只扫描一遍文本，不再先切出 semesters 对象、再逐个学年切片匹配。
+    """
+    start = _SEMESTERS_START.search(text)
+    if not start:
+        return None
+
+    year = None
+    found = False
+    entries = []
+    for token in _SEMESTER_TOKEN.finditer(text, start.end()):
+        kind = token.lastgroup
+        if kind == 'year':
+            year = int(token.group('year'))
+        elif kind == 'name':
+            if year is None:
+                continue
+            found = True
+            semester_id = token.group('id')
+            if len(semester_id) != 4:
+                continue
+            school_year, term = token.group('school_year', 'name')
+            entries.append(((year, term), {
+                'id': semester_id,
+                'display_name': f"{school_year} 第{term}学期",
+                'school_year': school_year,
+                'term': term,
+            }))
+        else:
+            break
+
+    if not found:
+        return None
+    # 教务系统按时间先后返回，倒序排序对已有序的数据是线性的
+    entries.sort(key=_semester_sort_key, reverse=True)
+    return [semester for _, semester in entries]
+
+
+class SemesterCatalog:
+    """持久化的学期列表缓存，线程安全"""
+
+    DEFAULT_TTL = 24 * 60 * 60  # 秒
+
+    def __init__(self, path="semester_catalog.json", ttl=DEFAULT_TTL):
+        self.path = path  # None 时只保存在内存中
+        self.ttl = ttl
+        self._entries = None  # {学号: {'fetched_at': 时间戳, 'semesters': [...]}}，首次使用时从文件加载
+        self._lock = threading.Lock()
+        self._refreshing = set()  # 正在后台刷新的账号
+
+    def _load(self):
+        """在持有 _lock 时调用"""
+        if self._entries is None:
+            self._entries = {}
+            try:
+                if self.path and os.path.exists(self.path):
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        self._entries = json.load(f)
+            except Exception:
+                pass
+        return self._entries
+
+    def _write(self):
+        if not self.path:
+            return
+        try:
+            # 目录按学号保存，只允许当前用户读写；先写临时文件再替换，避免中断时留下半个文件
+            tmp_path = f"{self.path}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            pass
+
+    def peek(self, username):
+        """返回 (学期列表, 已缓存秒数)，没有缓存时返回 (None, None)"""
+        with self._lock:
+            entry = self._load().get(str(username))
+        if not entry or not entry.get('semesters'):
+            return None, None
+        return [dict(s) for s in entry['semesters']], time.time() - entry.get('fetched_at', 0)
+
+    def latest(self):
+        """任意账号最近一次获取的学期列表"""
+        with self._lock:
+            entries = [e for e in self._load().values() if e.get('semesters')]
+        if not entries:
+            return None
+        newest = max(entries, key=lambda e: e.get('fetched_at', 0))
+        return [dict(s) for s in newest['semesters']]
+
+    def store(self, username, semesters):
+        if not semesters:
+            return
+        with self._lock:
+            self._load()[str(username)] = {'fetched_at': time.time(), 'semesters': [dict(s) for s in semesters]}
+            self._write()
+
+    def invalidate(self, username=None):
+        with self._lock:
+            if username is None:
+                self._load().clear()
+            else:
+                self._load().pop(str(username), None)
+            self._write()
+
+    def get(self, username, fetch, force_refresh=False, revalidate=True, log=None):
+        """获取学期列表
+
+        fetch 是实际访问教务系统的无参函数，失败时返回None。
+        revalidate 为False时缓存过期也不在后台刷新（如尚未登录）。
+        """
+        log = log or (lambda message: None)
+        semesters, age = self.peek(username)
+
+        if semesters and not force_refresh:
+            if age <= self.ttl:
+                log(f"📅 使用缓存的学期列表（{len(semesters)} 个学期）")
+            else:
+                log(f"📅 学期列表缓存已过期（{age / 3600:.0f} 小时前），先使用旧数据")
+                if revalidate:
+                    self._refresh_in_background(username, fetch, log)
+            return semesters
+
+        fetched = fetch()
+        if fetched:
+            self.store(username, fetched)
+            return fetched
+
+        fallback = semesters or self.latest()
+        if fallback:
+            log("⚠️ 获取学期列表失败，使用缓存的学期数据")
+            return fallback
+        log(f"⚠️ 获取学期列表失败，使用内置的学期数据（截至 {DEFAULT_SEMESTERS[0]['display_name']}）")
+        return [dict(s) for s in DEFAULT_SEMESTERS]
+
+    def _refresh_in_background(self, username, fetch, log):
+        username = str(username)
+        with self._lock:
+            if username in self._refreshing:
+                return
+            self._refreshing.add(username)
+
+        def _refresh():
+            try:
+                fetched = fetch()
+                if fetched:
+                    self.store(username, fetched)
+                    log(f"📅 学期列表已在后台刷新（{len(fetched)} 个学期）")
+            except Exception as e:
+                log(f"⚠️ 后台刷新学期列表失败: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(username)
+
+        threading.Thread(target=_refresh, name=f"semester-refresh-{username}", daemon=True).start()
+
+
+_default_catalog = None
+_default_lock = threading.Lock()
+
+
+def get_default_semester_catalog():
+    """进程内共享的学期目录，命令行、GUI和监控都读写这里"""
+    global _default_catalog
+    with _default_lock:
+        if _default_catalog is None:
+            _default_catalog = SemesterCatalog()
+        return _default_catalog
@@ -0,0 +1,65 @@
+"""异步多账号轮询：共用的会话、日志管线"""
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from async_grades import AsyncGradePoller
+from fake_webvpn import FakeWebVPNServer
+from grade_logging import flush_logs
+from push_dispatcher import PushDispatcher
+
+
+@pytest.fixture
+def server():
+    server = FakeWebVPNServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_poller(server, tmp_path):
+    dispatcher = PushDispatcher(queue_file=None)
+
+    def make(usernames, log_callback):
+        poller = AsyncGradePoller(interval=0.001, log_callback=log_callback)
+        for username in usernames:
+            account = poller.add_account(username, server.password)
+            account.base_url = server.base_url
+            account.monitor.dispatcher = dispatcher
+            account.monitor.last_grades_file = str(tmp_path / f"last_grades_{username}.json")
+        return poller
+
+    yield make
+    dispatcher.stop()
+
+
+def test_accounts_share_unused_session(make_poller):
+    poller = make_poller(["a", "b"], None)
+    first, second = poller.accounts.values()
+    assert first.monitor.account_session is second.monitor.account_session
+    assert first.monitor.session_store is second.monitor.session_store
+    asyncio.run(poller.poll_once())
+    assert first.monitor.latest_grades["4324"] and second.monitor.latest_grades["4324"]
+
+
+def test_logs_go_through_account_logger(make_poller):
+    lines = []
+    poller = make_poller(["a"], lines.append)
+
+    async def run_one_round():
+        task = asyncio.create_task(poller.run())
+        while not any("轮检查完成" in line for line in lines):
+            flush_logs()
+            await asyncio.sleep(0.01)
+        poller.stop()
+        await task
+
+    asyncio.run(asyncio.wait_for(run_one_round(), timeout=10))
+    flush_logs()
+    assert any("✅ WebVPN登录成功" in line for line in lines)
+    # 账号上下文在日志记录中，消息本身不带 [学号] 前缀；时间戳只由格式化器添加一次
+    assert not any("[a]" in line for line in lines)
+    summary = next(line for line in lines if "轮检查完成" in line)
+    assert summary.count("[") == 1
@@ -0,0 +1,87 @@
+"""GradeCache：TTL 过期与 LRU 淘汰"""
+import pytest
+
+import grade_cache
+from grade_cache import GradeCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(grade_cache.time, "monotonic", clock)
+    return clock
+
+
+def grades(code):
+    return [{'课程代码': code, '等级': 'A'}]
+
+
+def test_entry_expires_after_ttl(clock):
+    cache = GradeCache(ttl=60)
+    cache.put("u1", "4324", grades("C1"))
+    clock.now += 60
+    assert cache.get("u1", 4324) == grades("C1")
+    clock.now += 1
+    assert cache.get("u1", "4324") is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_touch_extends_ttl(clock):
+    cache = GradeCache(ttl=60)
+    cache.put("u1", "4324", grades("C1"))
+    clock.now += 50
+    cache.touch("u1", "4324")
+    clock.now += 50
+    assert cache.get("u1", "4324") is not None
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = GradeCache(ttl=60, max_entries=2)
+    cache.put("u1", "1", grades("A"))
+    cache.put("u1", "2", grades("B"))
+    cache.get("u1", "1")  # "1" 变为最近使用
+    cache.put("u1", "3", grades("C"))
+    assert cache.get("u1", "2") is None
+    assert cache.get("u1", "1") == grades("A")
+    assert cache.get("u1", "3") == grades("C")
+    assert len(cache) == 2
+
+
+def test_returned_grades_are_copies(clock):
+    cache = GradeCache()
+    source = grades("C1")
+    cache.put("u1", "4324", source)
+    source[0]['等级'] = 'F'
+    cache.get("u1", "4324")[0]['等级'] = 'F'
+    assert cache.get("u1", "4324") == grades("C1")
+
+
+def test_disabled_and_empty_puts_are_ignored(clock):
+    cache = GradeCache(ttl=0)
+    cache.put("u1", "4324", grades("C1"))
+    assert len(cache) == 0
+    cache = GradeCache()
+    cache.put("u1", "4324", [])
+    assert len(cache) == 0
+
+
+def test_invalidate_by_account_and_semester(clock):
+    cache = GradeCache()
+    for user in ("u1", "u2"):
+        for semester in ("4324", "4344"):
+            cache.put(user, semester, grades(semester))
+    cache.invalidate(semester_id=4344)
+    assert len(cache) == 2
+    cache.invalidate("u1")
+    assert cache.get("u2", "4324") is not None and len(cache) == 1
+    cache.invalidate()
+    assert len(cache) == 0
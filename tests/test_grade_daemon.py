@@ -0,0 +1,182 @@
+"""守护进程HTTP接口：鉴权、参数校验、账号管理、立即检查和成绩查询"""
+import json
+import os
+import stat
+import threading
+import time
+
+import pytest
+import requests
+
+from fake_webvpn import FakeWebVPNServer
+from grade_daemon import DaemonHTTPServer, GradeDaemon
+from monitor_scheduler import MonitorScheduler
+from nku_grades import SessionStore
+from push_dispatcher import PushDispatcher
+
+TOKEN = "secret"
+
+
+class ManualScheduler(MonitorScheduler):
+    """首次检查排在一小时后，测试中只通过 /check 触发"""
+
+    def add_job(self, *args, first_delay=None, **kwargs):
+        return super().add_job(*args, first_delay=3600, **kwargs)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def webvpn():
+    server = FakeWebVPNServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_daemon(tmp_path, monkeypatch):
+    # 没有成绩数据库时历史成绩写在当前目录
+    monkeypatch.chdir(tmp_path)
+    created = []
+
+    def make():
+        daemon = GradeDaemon(str(tmp_path / "accounts.json"), scheduler=ManualScheduler(),
+                             session_store=SessionStore(str(tmp_path / "session.json")),
+                             log_callback=lambda message: None, dispatcher=PushDispatcher(queue_file=None))
+        created.append(daemon)
+        return daemon
+
+    yield make
+    for daemon in created:
+        daemon.shutdown()
+        daemon.scheduler.stop()
+
+
+@pytest.fixture
+def api(make_daemon):
+    daemon = make_daemon()
+    server = DaemonHTTPServer(daemon, port=0, api_token=TOKEN)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    session = requests.Session()
+    session.headers["X-API-Token"] = TOKEN
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    def call(method, path, **kwargs):
+        return session.request(method, base + path, timeout=10, **kwargs)
+
+    call.daemon = daemon
+    call.base = base
+    yield call
+    server.shutdown()
+    server.server_close()
+    session.close()
+
+
+def add_account(api, webvpn, username="2312345"):
+    response = api("POST", "/accounts", json={'username': username, 'encrypted_password': webvpn.password,
+                                              'interval': 30})
+    assert response.status_code == 201
+    account = api.daemon.accounts[username]
+    account.monitor.base_url = webvpn.base_url
+    return account
+
+
+def test_token_is_required(api):
+    assert requests.get(f"{api.base}/status", timeout=10).status_code == 401
+    assert requests.get(f"{api.base}/status", headers={"X-API-Token": "wrong"}, timeout=10).status_code == 401
+    assert api("GET", "/status").status_code == 200
+
+
+@pytest.mark.parametrize("body", [
+    b"[1, 2]",
+    b'"text"',
+    b"{not json",
+    json.dumps({'username': "u1"}).encode(),
+    json.dumps({'username': "u1", 'encrypted_password': "x", 'notifiers': [{'type': "nope"}]}).encode(),
+])
+def test_invalid_account_body_is_rejected(api, body):
+    response = api("POST", "/accounts", data=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert "error" in response.json()
+    assert api.daemon.accounts == {}
+
+
+def test_unknown_routes_return_404(api):
+    assert api("GET", "/nothing").status_code == 404
+    assert api("GET", "/accounts").status_code == 404
+    assert api("GET", "/accounts/404404").status_code == 404
+    assert api("POST", "/accounts/404404/check").status_code == 404
+
+
+def test_add_account_is_persisted_privately(api, webvpn, tmp_path):
+    add_account(api, webvpn)
+    status = api("GET", "/status").json()
+    assert [account['username'] for account in status['accounts']] == ["2312345"]
+    assert status['scheduled_jobs'] == 1
+
+    path = tmp_path / "accounts.json"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    config, = json.loads(path.read_text(encoding='utf-8'))
+    assert config['username'] == "2312345"
+    assert config['interval'] == 30
+
+
+def test_check_then_read_grades_and_logs(api, webvpn):
+    account = add_account(api, webvpn)
+    # 检查之前：没有历史记录
+    before = api("GET", "/accounts/2312345/grades").json()
+    assert before['source'] == 'history' and before['count'] == 0
+
+    assert api("POST", "/accounts/2312345/check").status_code == 202
+    wait_for(lambda: account.monitor.last_result is not None and not account.job.running)
+
+    grades = api("GET", "/accounts/2312345/grades").json()
+    assert grades['source'] == 'memory'
+    assert grades['count'] == 8
+    assert grades['stats']['courses'] == 8
+    assert api("GET", "/accounts/2312345").json()['check_count'] == 1
+
+    logs = api("GET", "/accounts/2312345/logs?limit=3").json()['logs']
+    assert len(logs) == 3
+    assert api("GET", "/accounts/2312345/grades?semester=4262").json()['count'] == 0
+
+
+def test_check_while_running_returns_409(api, webvpn):
+    account = add_account(api, webvpn)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_check(semester_id):
+        started.set()
+        release.wait(10)
+        return False
+
+    account.monitor.run_check = slow_check
+    assert api("POST", "/accounts/2312345/check").status_code == 202
+    assert started.wait(10)
+    assert api("POST", "/accounts/2312345/check").status_code == 409
+    release.set()
+
+
+def test_delete_account(api, webvpn, tmp_path):
+    account = add_account(api, webvpn)
+    assert api("DELETE", "/accounts/2312345").json() == {'removed': "2312345"}
+    assert account.job.cancelled
+    assert api("GET", "/accounts/2312345").status_code == 404
+    assert json.loads((tmp_path / "accounts.json").read_text(encoding='utf-8')) == []
+
+
+def test_metrics(api):
+    report = api("GET", "/metrics").json()
+    assert {'since', 'total_requests', 'endpoints'} <= set(report)
+
+
+def test_accounts_are_restored_on_restart(api, webvpn, make_daemon):
+    add_account(api, webvpn)
+    restarted = make_daemon()
+    assert restarted.load_accounts() == 1
+    assert restarted.accounts["2312345"].interval == 30
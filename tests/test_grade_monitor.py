@@ -0,0 +1,142 @@
+"""GradeMonitor：页面摘要跳过解析、摘要失效、重启后的首次检查、自适应轮询间隔"""
+import time
+
+import pytest
+
+from fake_webvpn import load_fixture
+from grade_cache import GradeCache
+from grade_store import SQLiteGradeStore
+from monitor_scheduler import MonitorScheduler
+from nku_grades import GradeMonitor, SessionStore
+from push_dispatcher import PushDispatcher
+
+
+def page(name="grades_letter.html", grid_id="13572391471"):
+    return load_fixture(name).replace("{grid_id}", grid_id)
+
+
+@pytest.fixture
+def make_monitor(tmp_path):
+    dispatcher = PushDispatcher(queue_file=None)
+
+    def make(grade_store=None):
+        monitor = GradeMonitor("u1", "password", None, session_store=SessionStore(str(tmp_path / "session.json")),
+                               grade_store=grade_store, grade_cache=GradeCache(), dispatcher=dispatcher)
+        monitor.last_grades_file = str(tmp_path / "last_grades.json")
+        monitor.log = lambda message, level=None: None
+        return monitor
+
+    yield make
+    dispatcher.stop()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def count_parses(monitor):
+    calls = []
+    parse = monitor.parse_grades
+
+    def counting(html):
+        calls.append(1)
+        return parse(html)
+
+    monitor.parse_grades = counting
+    return calls
+
+
+def test_unchanged_page_skips_parsing(make_monitor):
+    monitor = make_monitor()
+    parses = count_parses(monitor)
+    assert monitor.check_grade_page(page(), "4324") is True
+    # 表格ID等每次请求都会变化的内容不影响摘要
+    assert monitor.check_grade_page(page(grid_id="99999"), "4324") is False
+    assert len(parses) == 1
+
+
+def test_changed_page_is_parsed_again(make_monitor):
+    monitor = make_monitor()
+    parses = count_parses(monitor)
+    monitor.check_grade_page(page(), "4324")
+    changed = page().replace(">A-<", ">B+<", 1)
+    assert monitor.check_grade_page(changed, "4324") is True
+    assert len(parses) == 2
+
+
+def test_missing_history_invalidates_digest(make_monitor, tmp_path):
+    monitor = make_monitor()
+    parses = count_parses(monitor)
+    monitor.check_grade_page(page(), "4324")
+    (tmp_path / "last_grades.json").unlink()
+    monitor.check_grade_page(page(), "4324")
+    assert len(parses) == 2
+    assert (tmp_path / "last_grades.json").exists()
+
+
+def test_digest_is_per_semester(make_monitor):
+    monitor = make_monitor()
+    parses = count_parses(monitor)
+    monitor.check_grade_page(page(), "4324")
+    monitor.check_grade_page(page(), "4344")
+    assert len(parses) == 2
+
+
+@pytest.mark.parametrize("use_store", [False, True])
+def test_restart_with_unchanged_page_restores_results(make_monitor, tmp_path, use_store):
+    store = SQLiteGradeStore(str(tmp_path / "grades.db")) if use_store else None
+    first = make_monitor(store)
+    first.check_grade_page(page(), "4324")
+    expected = first.stats.summary()
+
+    restarted = make_monitor(store)
+    parses = count_parses(restarted)
+    assert restarted.check_grade_page(page(), "4324") is False
+    assert parses == []
+    assert len(restarted.latest_grades["4324"]) == expected['courses']
+    summary = restarted.stats.summary()
+    assert summary['courses'] == expected['courses']
+    assert summary['avg_gpa'] == expected['avg_gpa']
+    if store:
+        store.close()
+
+
+def test_next_interval_backs_off_and_resets_on_changes(make_monitor):
+    monitor = make_monitor()
+    monitor.current_interval = 30
+    # 无变化按 1.5 倍退避到上限
+    assert [monitor.next_interval(False) for _ in range(4)] == [45, 67.5, 101.25, 120]
+    assert monitor.next_interval(False) == 120
+    # 登录失败保持不变，发现变化立即回到下限
+    assert monitor.next_interval(None) == 120
+    assert monitor.next_interval(True) == 5
+    assert monitor.next_interval(None) == 5
+    assert monitor.next_interval(False) == 7.5
+
+
+def test_next_interval_clamps_initial_interval(make_monitor):
+    monitor = make_monitor()
+    monitor.current_interval = 1
+    assert monitor.next_interval(None) == 5
+    monitor.current_interval = 500
+    assert monitor.next_interval(None) == 120
+
+
+def test_adaptive_interval_reschedules_job(make_monitor):
+    monitor = make_monitor()
+    monitor.adaptive = True
+    results = [False, True]
+    monitor.run_check = lambda semester_id: results.pop(0)
+    scheduler = MonitorScheduler(jitter=0)
+    try:
+        job = monitor.schedule(scheduler, "4324", interval=10, first_delay=0)
+        wait_for(lambda: job.run_count == 1 and job.next_run is not None)
+        assert job.interval == 15 * 60
+        job.run_now()
+        wait_for(lambda: job.run_count == 2 and job.next_run is not None)
+        assert job.interval == 5 * 60
+    finally:
+        scheduler.stop()
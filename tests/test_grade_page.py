@@ -0,0 +1,58 @@
+"""成绩页面：已知tagId时跳过预请求，直接获取失败时回退到完整流程"""
+import pytest
+
+from fake_webvpn import FakeWebVPNServer
+from nku_grades import WebVPNGradeChecker
+from semester_catalog import SemesterCatalog
+
+
+@pytest.fixture
+def server():
+    server = FakeWebVPNServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def checker(server):
+    checker = WebVPNGradeChecker("2312345", server.password, semester_catalog=SemesterCatalog(path=None))
+    checker.base_url = server.base_url
+    checker.log = lambda message, level=None: None
+    assert checker.ensure_login()
+    server.request_counts.clear()
+    return checker
+
+
+def test_tag_id_skips_preflight(checker, server):
+    assert checker.grade_tag_id is None
+    first = checker.get_grades("4324")
+    assert first
+    assert checker.grade_tag_id == "semesterBar4452416521Semester"
+    assert server.request_counts["eams/person.action"] == 1
+
+    server.request_counts.clear()
+    assert checker.get_grades("4324") == first
+    # 只请求成绩页面本身
+    assert dict(server.request_counts) == {"eams/person!search.action": 1}
+
+
+def test_direct_fetch_without_table_falls_back_to_preflight(checker, server):
+    checker.get_grades("4324")
+    fetch = checker._fetch_grade_page
+    responses = ["<html><body>会话已切换</body></html>"]
+
+    def first_call_without_table(semester_id):
+        return responses.pop() if responses else fetch(semester_id)
+
+    checker._fetch_grade_page = first_call_without_table
+    server.request_counts.clear()
+    assert checker.get_grades("4324")
+    assert server.request_counts["eams/person.action"] == 1
+    assert server.request_counts["eams/person!search.action"] == 1
+
+
+def test_tag_id_is_shared_with_other_semesters(checker, server):
+    checker.get_grades("4324")
+    server.request_counts.clear()
+    assert checker.get_grades("4262")
+    assert server.request_counts["eams/person.action"] == 0
@@ -0,0 +1,52 @@
+"""fast 与 bs4 两种成绩表格解析后端的结果必须完全一致"""
+import pytest
+
+from fake_webvpn import load_fixture
+from nku_grades import WebVPNGradeChecker
+
+ROW = ('<td>2024-2025 2</td><td>COMP130004</td><td>COMP130004.01</td><td>数据结构</td>'
+       '<td>专业必修课</td><td>4</td><td>A</td><td>4</td>')
+
+MALFORMED = {
+    'script_style': '<tbody id="grid1_data"><tr><td><script>var s=1</script>z<style>.a{}</style></td>'
+                    + ROW[ROW.index('</td>') + 5:] + '</tr></tbody>',
+    'nested_table': '<table><tbody id="grid1_data"><tr><td>2024-2025 2<table><tr><td>注</td></tr></table></td>'
+                    + ROW[ROW.index('</td>') + 5:] + '</tr><tr>' + ROW + '</tr></tbody></table>',
+    'unclosed_td': '<tbody id="grid1_data"><tr><td>2024-2025 2<td>COMP130004<td>COMP130004.01<td>数据结构'
+                   '<td>专业必修课<td>4<td>A<td>4</tr><tr>' + ROW + '</tr></tbody>',
+    'unclosed_tr': '<tbody id="grid1_data"><tr>' + ROW + '<tr>' + ROW + '</tbody>',
+    'stray_end_tags': '<tbody id="grid1_data"></span><tr>' + ROW.replace('</td><td>4</td>', '</td></div><td>4</td>')
+                      + '</tr></br></tbody>',
+    'comments_entities': '<tbody id="grid1_data"><tr><td>2024-2025 <!-- x -->2</td>'
+                         + ROW[ROW.index('</td>') + 5:].replace('数据结构', ' 数据 &amp; 结构 <br> ')
+                         + '</tr></tbody>',
+    'no_grid_tbody': '<table><tbody><tr><td>a</td></tr></tbody><tbody><tr>' + ROW + '</tr><tr>' + ROW
+                     + '</tr></tbody></table>',
+    'self_closing_td': '<tbody id="grid1_data"><tr><td/>' + ROW + '</tr></tbody>',
+}
+
+
+def checker(backend):
+    checker = WebVPNGradeChecker("2312345", "password", grade_parser=backend)
+    checker.log = lambda message, level=None: None
+    return checker
+
+
+@pytest.mark.parametrize("html", list(MALFORMED.values()), ids=list(MALFORMED))
+def test_rows_match_bs4_on_malformed_html(html):
+    fast, bs4 = checker("fast"), checker("bs4")
+    assert fast._extract_rows_fast(html) == bs4._extract_rows_bs4(html)
+    assert fast.parse_grades(html) == bs4.parse_grades(html)
+
+
+@pytest.mark.parametrize("name", ["grades_letter.html", "grades_percent.html", "grades_pass.html"])
+def test_grades_match_bs4_on_fixtures(name):
+    html = load_fixture(name).replace("{grid_id}", "13572391471")
+    grades = checker("fast").parse_grades(html)
+    assert grades
+    assert grades == checker("bs4").parse_grades(html)
+
+
+def test_script_text_is_not_part_of_cell():
+    rows = checker("fast")._extract_rows_fast(MALFORMED['script_style'])
+    assert rows[0][0] == 'z'
@@ -0,0 +1,15 @@
+"""成绩报告渲染：数值字段的格式"""
+from grade_report import render_change_notification, render_change_text
+
+GRADE = {'学年学期': '2024-2025 2', '课程代码': 'C1', '课程序号': 'C1.01', '课程名称': '数据结构',
+         '课程类别': '专业必修课', '学分': 4.0, '成绩类型': '等级制', '等级': 'A', '绩点': 4.0, '绩点文本': '4'}
+# 增量统计反复加减学分后的浮点误差
+SUMMARY = {'courses': 3, 'total_credits': 0.5 + 0.1 + 0.3, 'gpa_credits': 0.9, 'avg_gpa': 3.7}
+
+
+def test_total_credits_is_formatted():
+    text = render_change_text([GRADE], [], "4324", summary=SUMMARY)
+    html = render_change_notification([GRADE], [], "4324", summary=SUMMARY)
+    assert "3 门课程 · 0.9 学分" in text
+    assert "3 门课程 · 0.9 学分" in html
+    assert "0.8999" not in text + html
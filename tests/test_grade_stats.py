@@ -0,0 +1,88 @@
+"""GradeStats：增量 add/remove/sync 的结果与重新全量统计一致"""
+import pytest
+
+from grade_stats import GradeStats, course_key
+
+
+def letter(code, level, gpa, credits=2.0, semester="2024-2025 2"):
+    return {'学年学期': semester, '课程代码': code, '课程序号': f"{code}.01", '课程名称': code,
+            '学分': credits, '成绩类型': '等级制', '等级': level, '绩点': gpa}
+
+
+def percent(code, score, gpa, credits=3.0, semester="2024-2025 2"):
+    return {'学年学期': semester, '课程代码': code, '课程序号': f"{code}.01", '课程名称': code,
+            '学分': credits, '成绩类型': '百分制', '等级': f"{score}分", '分数': score, '绩点': gpa}
+
+
+def passed(code, credits=1.0, semester="2024-2025 2"):
+    return {'学年学期': semester, '课程代码': code, '课程序号': f"{code}.01", '课程名称': code,
+            '学分': credits, '成绩类型': '通过制', '等级': '通过', '绩点': None}
+
+
+def assert_same(stats, grades):
+    expected = GradeStats(grades).summary()
+    actual = stats.summary()
+    for key in ('total_credits', 'gpa_credits', 'avg_gpa', 'avg_score', 'weighted_avg_score'):
+        assert actual[key] == pytest.approx(expected[key]), key
+    for key in ('courses', 'score_courses', 'type_counts', 'distribution'):
+        assert actual[key] == expected[key], key
+
+
+def test_summary_values():
+    stats = GradeStats([letter("C1", "A", 4.0, 2), percent("C2", 90.0, 4.0, 3), percent("C3", 80.0, 3.0, 1),
+                        passed("C4")])
+    summary = stats.summary()
+    assert summary['total_credits'] == 7
+    assert summary['gpa_credits'] == 6
+    assert summary['avg_gpa'] == pytest.approx((8 + 12 + 3) / 6, abs=1e-3)
+    assert summary['avg_score'] == 85.0
+    assert summary['weighted_avg_score'] == pytest.approx((270 + 80) / 4, abs=0.05)
+    assert summary['type_counts'] == {'等级制': 1, '百分制': 2, '通过制': 1}
+    assert list(summary['distribution']) == ['A', '通过', '80.0分', '90.0分']
+
+
+def test_add_existing_course_replaces_it():
+    stats = GradeStats([letter("C1", "B", 3.0)])
+    stats.update(letter("C1", "A", 4.0))
+    assert len(stats) == 1
+    assert_same(stats, [letter("C1", "A", 4.0)])
+
+
+def test_remove_returns_grade_and_clears_empty_counts():
+    grade = letter("C1", "A", 4.0)
+    stats = GradeStats([grade, passed("C2")])
+    assert stats.remove(course_key(grade)) == grade
+    assert stats.remove(grade) is None
+    assert 'A' not in dict(stats.distribution())
+    assert stats.count('等级制') == 0
+    assert_same(stats, [passed("C2")])
+
+
+def test_sync_reports_and_applies_only_changes():
+    stats = GradeStats()
+    first = [letter("C1", "A", 4.0), letter("C2", "B", 3.0), passed("C3")]
+    assert stats.sync(first) == (3, 0, 0)
+    assert stats.sync([dict(g) for g in first]) == (0, 0, 0)
+
+    second = [letter("C1", "A-", 3.7), passed("C3"), percent("C4", 88.0, 3.7)]
+    assert stats.sync(second) == (1, 1, 1)
+    assert_same(stats, second)
+
+
+def test_sync_by_scope_keeps_other_semesters():
+    autumn = [letter("C1", "A", 4.0, semester="2024-2025 1")]
+    spring = [letter("C2", "B", 3.0), passed("C3")]
+    stats = GradeStats()
+    stats.sync(autumn, scope="4262")
+    stats.sync(spring, scope="4324")
+
+    assert stats.sync([letter("C2", "B+", 3.3)], scope="4324") == (0, 1, 1)
+    assert_same(stats, autumn + [letter("C2", "B+", 3.3)])
+    assert stats.sync([], scope="4262") == (0, 0, 1)
+    assert_same(stats, [letter("C2", "B+", 3.3)])
+
+
+def test_empty_stats():
+    summary = GradeStats().summary()
+    assert summary['courses'] == 0
+    assert summary['avg_gpa'] == 0 and summary['avg_score'] == 0
@@ -0,0 +1,88 @@
+"""SQLiteGradeStore：upsert 只写入内容变化的行，close() 关闭所有线程的连接"""
+import sqlite3
+import threading
+
+import pytest
+
+from grade_store import SQLiteGradeStore
+
+
+def grade(code, level="A", gpa=4.0, **extra):
+    return dict({'课程代码': code, '课程名称': f"课程{code}", '等级': level, '学分': 2.0, '绩点': gpa,
+                 '成绩类型': '等级制', '分数': None}, **extra)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteGradeStore(str(tmp_path / "grades.db"))
+    yield store
+    store.close()
+
+
+def test_first_save_inserts_every_row(store):
+    assert store.save_grades("u1", "4324", [grade("C1"), grade("C2")]) == 2
+    assert sorted(g['课程代码'] for g in store.load_grades("u1", "4324")) == ["C1", "C2"]
+
+
+def test_unchanged_rows_are_not_written(store):
+    grades = [grade("C1"), grade("C2", level="通过", gpa=None)]
+    store.save_grades("u1", "4324", grades)
+    before = {row['课程代码']: row['last_changed'] for row in store.grade_history("u1")}
+
+    # NULL 与 NULL 视为相同（IS NOT），不会被当作变化
+    assert store.save_grades("u1", "4324", [dict(g) for g in grades]) == 0
+    assert {row['课程代码']: row['last_changed'] for row in store.grade_history("u1")} == before
+
+
+def test_changed_row_updates_and_keeps_first_seen(store):
+    store.save_grades("u1", "4324", [grade("C1"), grade("C2")])
+    first = {row['课程代码']: row for row in store.grade_history("u1")}
+
+    assert store.save_grades("u1", "4324", [grade("C1", level="A-", gpa=3.7), grade("C2")]) == 1
+    rows = {row['课程代码']: row for row in store.grade_history("u1")}
+    assert rows['C1']['等级'] == "A-"
+    assert rows['C1']['first_seen'] == first['C1']['first_seen']
+    assert rows['C1']['last_changed'] >= first['C1']['last_changed']
+    assert rows['C2']['last_changed'] == first['C2']['last_changed']
+
+
+def test_accounts_and_semesters_are_separate(store):
+    store.save_grades("u1", "4324", [grade("C1")])
+    assert store.save_grades("u2", "4324", [grade("C1")]) == 1
+    assert store.save_grades("u1", 4344, [grade("C1")]) == 1
+    assert len(store.load_grades("u1", 4324)) == 1
+    assert store.load_grades("u3", "4324") == []
+
+
+def test_empty_save_is_a_no_op(store):
+    assert store.save_grades("u1", "4324", []) == 0
+
+
+def test_page_digest_round_trip(store):
+    assert store.get_digest("u1", "4324") is None
+    store.set_digest("u1", "4324", "abc")
+    store.set_digest("u1", 4324, "def")
+    assert store.get_digest("u1", "4324") == "def"
+
+
+def test_close_closes_connections_of_all_threads(tmp_path):
+    store = SQLiteGradeStore(str(tmp_path / "grades.db"))
+    opened = []
+
+    def worker():
+        store.save_grades("u1", "4324", [grade("C1")])
+        opened.append(store._local.conn)
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    store.close()
+    for conn in opened:
+        with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+            conn.execute("SELECT 1")
+    # 关闭后再使用会重新打开连接
+    assert len(store.load_grades("u1", "4324")) == 1
+    store.close()
@@ -0,0 +1,160 @@
+"""MonitorScheduler：周期运行、取消、立即运行以及它们与正在运行的任务之间的竞争"""
+import threading
+import time
+
+import pytest
+
+from monitor_scheduler import MonitorScheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = MonitorScheduler(max_workers=4, jitter=0, retry_delay=0.05)
+    yield scheduler
+    scheduler.stop()
+
+
+def wait_until(predicate, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.005)
+    return predicate()
+
+
+class BlockingTask:
+    """每次运行时阻塞，直到测试放行，并记录同时运行的次数"""
+
+    def __init__(self):
+        self.started = threading.Semaphore(0)
+        self.release = threading.Event()
+        self.runs = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.runs += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        self.started.release()
+        self.release.wait(3)
+        with self._lock:
+            self.active -= 1
+
+
+def test_job_runs_periodically(scheduler):
+    runs = []
+    job = scheduler.add_job(lambda: runs.append(time.monotonic()), 0.02, first_delay=0)
+    assert wait_until(lambda: len(runs) >= 3)
+    job.cancel()
+    assert all(b - a >= 0.015 for a, b in zip(runs, runs[1:]))
+
+
+def test_first_run_is_staggered_by_jitter():
+    scheduler = MonitorScheduler(jitter=0.1)
+    try:
+        jobs = [scheduler.add_job(lambda: None, 100) for _ in range(20)]
+        delays = [job.seconds_until_next() for job in jobs]
+        assert all(0 <= delay <= 10 for delay in delays)
+        assert len({round(delay, 3) for delay in delays}) > 1
+        assert scheduler.add_job(lambda: None, 100, first_delay=0).seconds_until_next() < 1
+    finally:
+        scheduler.stop()
+
+
+def test_cancel_before_first_run(scheduler):
+    runs = []
+    job = scheduler.add_job(lambda: runs.append(1), 10, first_delay=0.05)
+    job.cancel()
+    assert job.wait_cancelled(0)
+    assert job.next_run is None and scheduler.jobs() == []
+    time.sleep(0.1)
+    assert runs == []
+    assert not job.run_now()
+
+
+def test_cancel_while_running_stops_rescheduling(scheduler):
+    task = BlockingTask()
+    job = scheduler.add_job(task, 0.01, first_delay=0)
+    assert task.started.acquire(timeout=3)
+    job.cancel()
+    task.release.set()
+    assert wait_until(lambda: job.run_count == 1)
+    time.sleep(0.05)
+    assert task.runs == 1 and job.next_run is None
+
+
+def test_run_now_while_running_is_rejected(scheduler):
+    task = BlockingTask()
+    job = scheduler.add_job(task, 10, first_delay=0)
+    assert task.started.acquire(timeout=3)
+    assert job.running
+    assert not job.run_now()
+    task.release.set()
+    assert wait_until(lambda: job.next_run is not None)
+    assert task.runs == 1
+    assert job.seconds_until_next() > 5
+
+
+def test_run_now_replaces_pending_deadline(scheduler):
+    runs = []
+    job = scheduler.add_job(lambda: runs.append(1), 10, first_delay=10)
+    assert job.run_now()
+    assert wait_until(lambda: job.run_count == 1 and job.next_run is not None)
+    time.sleep(0.05)
+    assert runs == [1]  # 原来的截止时间条目被丢弃，不会再运行一次
+    assert job.seconds_until_next() > 5
+
+
+def test_concurrent_run_now_never_overlaps(scheduler):
+    task = BlockingTask()
+    task.release.set()
+    job = scheduler.add_job(task, 10, first_delay=10)
+
+    def hammer():
+        for _ in range(200):
+            job.run_now()
+
+    threads = [threading.Thread(target=hammer) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert wait_until(lambda: not job.running)
+    time.sleep(0.05)
+    assert task.max_active == 1
+    assert task.runs >= 1
+
+
+def test_failed_run_retries_after_retry_delay(scheduler):
+    errors = []
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise RuntimeError("boom")
+
+    job = scheduler.add_job(flaky, 10, first_delay=0, on_error=lambda job, e: errors.append(str(e)))
+    assert wait_until(lambda: len(attempts) == 2)
+    assert errors == ["boom"]
+    assert 0.04 <= attempts[1] - attempts[0] < 1
+    assert job.seconds_until_next() > 5
+
+
+def test_interval_func_updates_interval(scheduler):
+    job = scheduler.add_job(lambda: None, 10, first_delay=0, interval_func=lambda: 42)
+    assert wait_until(lambda: job.run_count == 1 and job.next_run is not None)
+    assert job.interval == 42
+    assert 40 < job.seconds_until_next() <= 42
+
+
+def test_stop_cancels_all_jobs():
+    scheduler = MonitorScheduler(jitter=0)
+    jobs = [scheduler.add_job(lambda: None, 10, first_delay=5) for _ in range(3)]
+    scheduler.stop()
+    assert all(job.cancelled and job.wait_cancelled(0) for job in jobs)
+    assert scheduler.jobs() == []
@@ -0,0 +1,183 @@
+"""通知渠道：不传会话也能发送，各渠道的成功/失败与是否重试"""
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from fake_webvpn import FakeWebVPNServer
+from notifiers import (FileNotifier, Notification, Notifier, PushPlusNotifier, SMTPNotifier, WebhookNotifier,
+                       create_notifier)
+
+GRADE = {'学年学期': '2024-2025 2', '课程代码': 'C1', '课程序号': 'C1.01', '课程名称': '数据结构',
+         '课程类别': '专业必修课', '学分': 4.0, '成绩类型': '等级制', '等级': 'A', '绩点': 4.0, '绩点文本': '4'}
+
+
+def notification():
+    return Notification("🎓 新增成绩通知 - 1门课程", account="u1", semesters=["4324"], new_courses=[GRADE],
+                        summary={'courses': 1, 'total_credits': 4.0, 'gpa_credits': 4.0, 'avg_gpa': 4.0})
+
+
+class SMTPSink(socketserver.StreamRequestHandler):
+    """只实现发信需要的最少命令，收到的邮件原文放入 server.messages"""
+
+    def handle(self):
+        def reply(line):
+            self.wfile.write((line + "\r\n").encode())
+
+        reply("220 localhost")
+        lines = None
+        for raw in self.rfile:
+            line = raw.decode().rstrip("\r\n")
+            if lines is not None:
+                if line == ".":
+                    self.server.messages.append("\n".join(lines))
+                    lines = None
+                    reply("250 queued")
+                else:
+                    lines.append(line)
+                continue
+            command = line[:4].upper()
+            if command in ("EHLO", "HELO"):
+                reply("250 localhost")
+            elif command == "DATA":
+                lines = []
+                reply("354 go ahead")
+            elif command == "QUIT":
+                reply("221 bye")
+                return
+            elif command == "RCPT" and "reject" in line:
+                reply("550 no such user")
+            else:
+                reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPSink)
+    server.daemon_threads = True
+    server.messages = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def webhook_server():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append((self.path, dict(self.headers), json.loads(body)))
+            status = 503 if self.path == "/busy" else 404 if self.path == "/missing" else 204
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.received = received
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def pushplus_server():
+    server = FakeWebVPNServer().start()
+    yield server
+    server.stop()
+
+
+def test_pushplus_without_session(pushplus_server):
+    ok, retryable, _ = PushPlusNotifier("tok", url=pushplus_server.push_url).send(notification(), timeout=5)
+    assert (ok, retryable) == (True, False)
+    push = pushplus_server.pushes[0]
+    assert push['token'] == "tok" and push['template'] == "html"
+    assert "数据结构" in push['content']
+
+
+def test_pushplus_server_error_is_retryable(pushplus_server):
+    pushplus_server.push_failures = 1
+    ok, retryable, message = PushPlusNotifier("tok", url=pushplus_server.push_url).send(notification(), timeout=5)
+    assert (ok, retryable) == (False, True)
+    assert "502" in message
+
+
+def test_webhook_without_session(webhook_server):
+    notifier = WebhookNotifier(webhook_server.url + "/hook", headers={"X-Key": "v"})
+    assert notifier.send(notification(), timeout=5)[:2] == (True, False)
+    path, headers, body = webhook_server.received[0]
+    assert path == "/hook" and headers["X-Key"] == "v"
+    assert body['account'] == "u1" and body['new_courses'][0]['课程名称'] == "数据结构"
+
+
+@pytest.mark.parametrize("path, retryable", [("/busy", True), ("/missing", False)])
+def test_webhook_failures(webhook_server, path, retryable):
+    ok, is_retryable, _ = WebhookNotifier(webhook_server.url + path).send(notification(), timeout=5)
+    assert not ok and is_retryable is retryable
+
+
+def test_unreachable_endpoint_is_retryable():
+    ok, retryable, _ = WebhookNotifier("http://127.0.0.1:9/hook").send(notification(), timeout=1)
+    assert (ok, retryable) == (False, True)
+
+
+def test_smtp_sends_text_and_html(smtp_server):
+    notifier = SMTPNotifier("127.0.0.1", "me@example.com", port=smtp_server.server_address[1])
+    assert notifier.send(notification(), timeout=5)[:2] == (True, False)
+    message = smtp_server.messages[0]
+    assert "To: me@example.com" in message
+    assert "text/plain" in message and "text/html" in message
+
+
+def test_smtp_rejected_recipient_is_not_retried(smtp_server):
+    notifier = SMTPNotifier("127.0.0.1", "reject@example.com", port=smtp_server.server_address[1])
+    ok, retryable, _ = notifier.send(notification(), timeout=5)
+    assert (ok, retryable) == (False, False)
+
+
+def test_file_appends_json_lines(tmp_path):
+    path = tmp_path / "notifications.jsonl"
+    notifier = FileNotifier(str(path))
+    for _ in range(2):
+        assert notifier.send(notification())[:2] == (True, False)
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert len(lines) == 2 and lines[0]['title'] == "🎓 新增成绩通知 - 1门课程"
+
+
+def test_notification_renders_each_format_once():
+    item = notification()
+    assert item.render('html') is item.render('html')
+    assert "数据结构" in item.render('text') and "<" not in item.render('text')
+    assert item.render('json')['semesters'] == ["4324"]
+
+
+def test_create_notifier_round_trips_configs(tmp_path):
+    notifiers = [PushPlusNotifier("tok"), WebhookNotifier("http://example.com", {"A": "b"}),
+                 SMTPNotifier("smtp.example.com", ["a@example.com"], ssl=True, username="a@example.com"),
+                 FileNotifier(str(tmp_path / "n.jsonl"))]
+    for notifier in notifiers:
+        config = notifier.to_config()
+        assert create_notifier(config).to_config() == config
+        assert create_notifier(notifier) is notifier
+    with pytest.raises(ValueError):
+        create_notifier({'type': 'carrier-pigeon'})
+
+
+def test_incomplete_backend_fails_on_creation():
+    class Incomplete(Notifier):
+        type = "incomplete"
+
+        def send(self, notification, session=None, timeout=None):
+            return True, False, ""
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,149 @@
+"""PushDispatcher：合并、退避重试、重启后恢复"""
+import json
+
+import pytest
+
+from fake_webvpn import FakeWebVPNServer
+from push_dispatcher import PushDispatcher
+
+
+def grade(code, level="A", gpa=4.0):
+    return {'学年学期': '2024-2025 2', '课程代码': code, '课程序号': f"{code}.01", '课程名称': f"课程{code}",
+            '课程类别': '专业必修课', '学分': 2.0, '成绩类型': '等级制', '等级': level, '绩点': gpa,
+            '绩点文本': str(gpa)}
+
+
+@pytest.fixture
+def server():
+    server = FakeWebVPNServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_dispatcher(server):
+    dispatchers = []
+
+    def make(**options):
+        options.setdefault('queue_file', None)
+        options.setdefault('retry_base', 0.01)
+        dispatcher = PushDispatcher(url=server.push_url, **options)
+        dispatchers.append(dispatcher)
+        return dispatcher
+
+    yield make
+    for dispatcher in dispatchers:
+        dispatcher.stop()
+
+
+CHANNELS = [{'type': 'pushplus', 'token': 'secret-token'}]
+
+
+def test_changes_within_window_are_coalesced(server, make_dispatcher):
+    dispatcher = make_dispatcher(coalesce_window=60)
+    first = dispatcher.submit_changes("u1", CHANNELS, "4324", [grade("C1")], [])
+    second = dispatcher.submit_changes("u1", CHANNELS, "4324", [grade("C2")],
+                                       [{'previous': grade("C3", "B", 3.0), 'current': grade("C3")}])
+    # 新增后又更新的课程仍算新增，显示最新成绩
+    third = dispatcher.submit_changes("u1", CHANNELS, "4324", [],
+                                      [{'previous': grade("C1"), 'current': grade("C1", "A-", 3.7)}])
+    assert first == second == third
+    assert dispatcher.pending() == 1
+    assert not server.pushes  # 仍在合并窗口内
+
+    assert dispatcher.flush(timeout=5)
+    assert len(server.pushes) == 1
+    push = server.pushes[0]
+    assert push['token'] == 'secret-token'
+    assert "新增2门，更新1门" in push['title']
+    assert "A-" in push['content']
+
+
+def test_different_accounts_are_not_coalesced(server, make_dispatcher):
+    dispatcher = make_dispatcher(coalesce_window=60)
+    dispatcher.submit_changes("u1", CHANNELS, "4324", [grade("C1")], [])
+    dispatcher.submit_changes("u2", CHANNELS, "4324", [grade("C1")], [])
+    assert dispatcher.pending() == 2
+    assert dispatcher.flush(timeout=5)
+    assert len(server.pushes) == 2
+
+
+def test_retryable_failures_back_off_then_succeed(server, make_dispatcher):
+    server.push_failures = 2
+    dispatcher = make_dispatcher(coalesce_window=0)
+    dispatcher.submit_changes("u1", CHANNELS, "4324", [grade("C1")], [])
+    assert dispatcher.flush(timeout=5)
+    assert len(server.pushes) == 1
+    assert (dispatcher.sent, dispatcher.failed) == (1, 0)
+
+
+def test_gives_up_after_max_attempts(server, make_dispatcher):
+    server.push_failures = 10
+    dispatcher = make_dispatcher(coalesce_window=0, max_attempts=3)
+    dispatcher.submit_changes("u1", CHANNELS, "4324", [grade("C1")], [])
+    assert dispatcher.flush(timeout=5)
+    assert not server.pushes
+    assert dispatcher.failed == 1 and dispatcher.pending() == 0
+    assert server.push_failures == 7
+
+
+def test_only_failed_channel_is_retried(server, make_dispatcher, tmp_path):
+    path = tmp_path / "notifications.jsonl"
+    server.push_failures = 1
+    dispatcher = make_dispatcher(coalesce_window=0)
+    dispatcher.submit_changes("u1", CHANNELS + [{'type': 'file', 'path': str(path)}], "4324", [grade("C1")], [])
+    assert dispatcher.flush(timeout=5)
+    assert len(server.pushes) == 1
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 1
+
+
+def test_queue_survives_restart_without_credentials(server, make_dispatcher, tmp_path):
+    queue_file = str(tmp_path / "push_queue.json")
+    dispatcher = make_dispatcher(queue_file=queue_file, coalesce_window=60)
+    dispatcher.submit_changes("u1", CHANNELS, "4324", [grade("C1")], [])
+    dispatcher.stop()
+
+    with open(queue_file, encoding="utf-8") as f:
+        saved = f.read()
+    assert "secret-token" not in saved
+    assert json.loads(saved)[0]['channels'] == ['pushplus']
+
+    resumed = make_dispatcher(queue_file=queue_file, coalesce_window=60)
+    assert resumed.pending() == 1
+    # 渠道尚未登记：flush 不等待，任务留在队列中
+    assert resumed.flush(timeout=1)
+    assert resumed.pending() == 1 and not server.pushes
+
+    resumed.register_channels("u1", CHANNELS)
+    assert resumed.flush(timeout=5)
+    assert resumed.pending() == 0
+    assert [push['token'] for push in server.pushes] == ['secret-token']
+
+
+def test_restart_delivers_once_monitor_is_created(server, make_dispatcher, tmp_path):
+    from nku_grades import GradeMonitor, SessionStore
+
+    queue_file = str(tmp_path / "push_queue.json")
+    dispatcher = make_dispatcher(queue_file=queue_file, coalesce_window=60)
+    dispatcher.submit_changes("u1", CHANNELS, "4324", [grade("C1")], [])
+    dispatcher.stop()
+
+    # 新进程：只创建监控（不提交新的变化），恢复的推送即可发送
+    resumed = make_dispatcher(queue_file=queue_file, coalesce_window=60)
+    GradeMonitor("u1", "password", "secret-token", dispatcher=resumed,
+                 session_store=SessionStore(str(tmp_path / "session.json")))
+    assert resumed.flush(timeout=5)
+    assert resumed.pending() == 0
+    assert [push['token'] for push in server.pushes] == ['secret-token']
+
+
+def test_unrestorable_message_jobs_are_dropped(make_dispatcher, tmp_path):
+    queue_file = tmp_path / "push_queue.json"
+    message = {'id': 'm1', 'kind': 'message', 'account': None, 'channels': ['pushplus'], 'done': [],
+               'title': "标题", 'content': "<p>内容</p>", 'created_at': 0, 'due_at': 0, 'attempts': 0,
+               'sending': False}
+    queue_file.write_text(json.dumps([message]), encoding="utf-8")
+
+    resumed = make_dispatcher(queue_file=str(queue_file))
+    assert resumed.pending() == 0
+    assert json.loads(queue_file.read_text(encoding="utf-8")) == []
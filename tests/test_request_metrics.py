@@ -0,0 +1,74 @@
+"""请求追踪：传输字节数按 Content-Length 统计"""
+import asyncio
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from request_metrics import RequestMetrics
+
+BODY = ("成绩" * 2000).encode()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        if self.path == "/gzip":
+            body = gzip.compress(BODY)
+            self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            # 没有 Content-Length 的分块响应
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(f"{len(BODY):x}\r\n".encode() + BODY + b"\r\n0\r\n\r\n")
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def endpoint_bytes(metrics):
+    return {name.split()[1]: data['bytes'] for name, data in metrics.report()['endpoints'].items()}
+
+
+def test_bytes_use_content_length(server):
+    metrics = RequestMetrics()
+    session = metrics.instrument(requests.Session())
+    assert session.get(f"{server}/gzip").content == BODY
+    assert session.get(f"{server}/chunked").content == BODY
+    session.close()
+
+    counted = endpoint_bytes(metrics)
+    assert counted["gzip"] == len(gzip.compress(BODY))
+    assert counted["chunked"] == len(BODY)
+
+
+def test_httpx_hook_uses_content_length(server):
+    httpx = pytest.importorskip("httpx")
+
+    metrics = RequestMetrics()
+
+    async def fetch():
+        async with httpx.AsyncClient(event_hooks={'response': [metrics.httpx_response_hook]}) as client:
+            await client.get(f"{server}/gzip")
+            await client.get(f"{server}/chunked")
+
+    asyncio.run(fetch())
+    counted = endpoint_bytes(metrics)
+    assert counted["gzip"] == len(gzip.compress(BODY))
+    assert counted["chunked"] == len(BODY)
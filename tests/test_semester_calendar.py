@@ -0,0 +1,65 @@
+"""学期日历解析：单次扫描的结果与原实现一致"""
+import random
+
+import pytest
+
+from bench_grades import legacy_parse_semesters
+from fake_webvpn import load_fixture
+from semester_catalog import parse_semester_calendar
+
+
+def calendar(years):
+    """years: [[(id, 学期名), ...], ...]，第 i 项是 y{i} 学年"""
+    parts = []
+    for index, terms in enumerate(years):
+        school_year = f"{2015 + index}-{2016 + index}"
+        items = ",".join(f'{{id:{semester_id},schoolYear:"{school_year}",name:"{name}"}}'
+                         for semester_id, name in terms)
+        parts.append(f"y{index}:[{items}]")
+    return f'{{yearDom:"<tr></tr>",semesters:{{{",".join(parts)}}},yearIndex:"0",termIndex:"0"}}'
+
+
+def test_fixture_matches_legacy_parser():
+    text = load_fixture("semester_calendar.txt")
+    parsed = parse_semester_calendar(text)
+    assert parsed == legacy_parse_semesters(text)
+    assert parsed[0]['id'] == "4364"
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_random_calendars_match_legacy_parser(seed):
+    rng = random.Random(seed)
+    years = []
+    for _ in range(rng.randint(1, 9)):
+        terms = [(rng.choice([rng.randint(1000, 9999), rng.randint(100, 999), rng.randint(10000, 99999)]), name)
+                 for name in rng.sample(["1", "2", "3"], rng.randint(1, 3))]
+        years.append(terms)
+    text = calendar(years)
+    assert parse_semester_calendar(text) == legacy_parse_semesters(text)
+
+
+def test_whitespace_between_tokens():
+    compact = calendar([[(4204, "1"), (4224, "2")]])
+    spaced = compact.replace("semesters:{", "semesters : {\n  ").replace(",name:", ", name: ")
+    assert parse_semester_calendar(spaced) == parse_semester_calendar(compact)
+
+
+def test_years_are_ordered_numerically():
+    # y10 之后的学年按数字排序，排在 y9 之前
+    years = [[(4000 + index, "1")] for index in range(12)]
+    parsed = parse_semester_calendar(calendar(years))
+    assert [semester['id'] for semester in parsed] == [str(4000 + index) for index in reversed(range(12))]
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "{yearDom:\"\"}",
+    calendar([]),
+    calendar([[], []]),
+])
+def test_no_semesters_returns_none(text):
+    assert parse_semester_calendar(text) is None
+
+
+def test_only_non_four_digit_ids_returns_empty_list():
+    assert parse_semester_calendar(calendar([[(123, "1"), (12345, "2")]])) == []
@@ -0,0 +1,94 @@
+"""学期目录：缓存有效期、后台刷新、获取失败时的回退顺序"""
+import json
+import os
+import stat
+import time
+
+from semester_catalog import DEFAULT_SEMESTERS, SemesterCatalog
+
+OLD = [{'id': '4324', 'display_name': '2024-2025 第2学期', 'school_year': '2024-2025', 'term': '2'}]
+NEW = [{'id': '4364', 'display_name': '2025-2026 第1学期', 'school_year': '2025-2026', 'term': '1'}] + OLD
+
+
+class Fetcher:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def age_entry(catalog, username, seconds):
+    with catalog._lock:
+        catalog._load()[username]['fetched_at'] -= seconds
+
+
+def test_catalog_file_is_private(tmp_path):
+    path = tmp_path / "catalog.json"
+    SemesterCatalog(str(path)).store("u1", OLD)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert json.loads(path.read_text(encoding='utf-8'))['u1']['semesters'] == OLD
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_fresh_entry_skips_fetch(tmp_path):
+    path = str(tmp_path / "catalog.json")
+    SemesterCatalog(path).store("u1", OLD)
+    fetch = Fetcher(NEW)
+    # 新实例从文件加载
+    assert SemesterCatalog(path).get("u1", fetch) == OLD
+    assert fetch.calls == 0
+
+
+def test_expired_entry_is_served_then_refreshed(tmp_path):
+    catalog = SemesterCatalog(str(tmp_path / "catalog.json"), ttl=60)
+    catalog.store("u1", OLD)
+    age_entry(catalog, "u1", 120)
+    fetch = Fetcher(NEW)
+
+    assert catalog.get("u1", fetch) == OLD
+    deadline = time.monotonic() + 5
+    while catalog.peek("u1")[0] != NEW and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert catalog.peek("u1")[0] == NEW
+    assert fetch.calls == 1
+    assert catalog.get("u1", fetch) == NEW
+    assert fetch.calls == 1
+
+
+def test_expired_entry_without_revalidate_is_not_refreshed(tmp_path):
+    catalog = SemesterCatalog(None, ttl=60)
+    catalog.store("u1", OLD)
+    age_entry(catalog, "u1", 120)
+    fetch = Fetcher(NEW)
+    assert catalog.get("u1", fetch, revalidate=False) == OLD
+    time.sleep(0.05)
+    assert fetch.calls == 0
+
+
+def test_force_refresh_fetches(tmp_path):
+    catalog = SemesterCatalog(None)
+    catalog.store("u1", OLD)
+    fetch = Fetcher(NEW)
+    assert catalog.get("u1", fetch, force_refresh=True) == NEW
+    assert fetch.calls == 1
+    assert catalog.peek("u1")[0] == NEW
+
+
+def test_fallback_order_when_fetch_fails():
+    catalog = SemesterCatalog(None)
+    failed = Fetcher(None)
+
+    # 1. 本账号的旧数据
+    catalog.store("u1", OLD)
+    catalog.store("u2", NEW)
+    age_entry(catalog, "u1", 10)
+    assert catalog.get("u1", failed, force_refresh=True) == OLD
+    # 2. 其他账号最近获取的数据
+    assert catalog.get("u3", failed) == NEW
+    # 3. 内置的学期列表
+    catalog.invalidate()
+    assert catalog.get("u3", failed) == DEFAULT_SEMESTERS
+    assert failed.calls == 3
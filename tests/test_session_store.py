@@ -0,0 +1,76 @@
+"""会话缓存：文件权限、跨实例复用、过期和失效后重新登录"""
+import json
+import os
+import stat
+
+import pytest
+
+from fake_webvpn import FakeWebVPNServer
+from nku_grades import SessionStore, WebVPNGradeChecker
+from semester_catalog import SemesterCatalog
+
+
+@pytest.fixture
+def server():
+    server = FakeWebVPNServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def make_checker(server, tmp_path):
+    def make(ttl=SessionStore.DEFAULT_TTL):
+        store = SessionStore(str(tmp_path / "session.json"), ttl=ttl)
+        checker = WebVPNGradeChecker("2312345", server.password, session_store=store,
+                                     semester_catalog=SemesterCatalog(path=None))
+        checker.base_url = server.base_url
+        checker.log = lambda message, level=None: None
+        return checker
+
+    return make
+
+
+def test_saved_session_is_private_and_has_no_headers(make_checker, tmp_path):
+    checker = make_checker()
+    assert checker.ensure_login()
+
+    path = tmp_path / "session.json"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    entry = json.loads(path.read_text(encoding='utf-8'))["2312345"]
+    assert set(entry) == {'cookies', 'csrf_token', 'saved_at', 'expires_at'}
+    assert entry['csrf_token'] == checker.csrf_token
+    assert entry['cookies']
+
+
+def test_new_instance_reuses_cached_session(make_checker, server):
+    assert make_checker().ensure_login()
+    assert server.request_counts["iam/login"] == 1
+
+    fresh = make_checker()
+    assert fresh.ensure_login()
+    assert fresh.logged_in
+    # 只探测会话是否有效，不再登录
+    assert server.request_counts["iam/login"] == 1
+    assert fresh.get_grades("4324")
+
+
+def test_expired_entry_is_ignored(make_checker, server, tmp_path):
+    assert make_checker(ttl=-1).ensure_login()
+    assert SessionStore(str(tmp_path / "session.json")).load("2312345") is None
+
+    assert make_checker().ensure_login()
+    assert server.request_counts["iam/login"] == 2
+
+
+def test_server_side_expiry_logs_in_again(make_checker, server):
+    assert make_checker().ensure_login()
+    old = make_checker().session_store.load("2312345")
+    server.expire_sessions()
+
+    fresh = make_checker()
+    assert fresh.ensure_login()
+    assert server.request_counts["iam/login"] == 2
+    # 失效的缓存被新会话替换
+    new = fresh.session_store.load("2312345")
+    assert new['cookies'] != old['cookies']
+    assert fresh.get_grades("4324")
@@ -0,0 +1,103 @@
+"""
+南开大学 WebVPN 成绩查询工具 - HTTP传输层配置
+
+所有WebVPN请求共用的连接设置：
+1. 连接池大小和长连接复用，一轮检查的约10个请求复用同一组连接
+2. 按阶段（登录、教务系统、成绩、探测、推送）分别设置连接/读取超时，读取卡住时不会永久阻塞监控线程
+3. 幂等的GET请求在连接错误或5xx时按指数退避重试，POST不重试
+4. 同步的 requests 不支持HTTP/2；异步引擎在安装了 h2 时启用HTTP/2
+5. 创建的会话默认挂上请求追踪钩子（见 request_metrics）
+"""
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from request_metrics import get_default_metrics
+
+try:
+    import h2  # noqa: F401  httpx 的HTTP/2支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class TransportConfig:
+    """WebVPN请求的连接池、超时和重试设置"""
+
+    # (连接超时, 读取超时)，单位秒
+    DEFAULT_TIMEOUTS = {
+        'login': (5, 15),
+        'eams': (5, 20),
+        'grades': (5, 30),
+        'probe': (3, 8),
+        'push': (5, 10),
+    }
+
+    def __init__(self, pool_connections=4, pool_maxsize=10, keep_alive=True, keepalive_expiry=60,
+                 max_retries=2, backoff_factor=0.5, retry_statuses=(500, 502, 503, 504),
+                 timeouts=None, http2=True, metrics=True):
+        self.pool_connections = pool_connections  # 缓存连接池的主机数
+        self.pool_maxsize = pool_maxsize  # 每个主机保持的连接数，应不小于并发获取学期的线程数
+        self.keep_alive = keep_alive
+        self.keepalive_expiry = keepalive_expiry  # 秒，异步引擎的空闲连接保留时间
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.retry_statuses = tuple(retry_statuses)
+        self.timeouts = dict(self.DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.http2 = http2 and HTTP2_AVAILABLE
+        # 请求统计：True 使用进程内共享的统计，也可以传入 RequestMetrics 实例，None/False 关闭
+        self.metrics = get_default_metrics() if metrics is True else (metrics or None)
+
+    def timeout(self, stage):
+        """返回某个阶段的 (连接超时, 读取超时)"""
+        return self.timeouts.get(stage, self.timeouts['eams'])
+
+    def retry_policy(self):
+        # 只重试GET/HEAD：登录、预请求等POST带有副作用，重复提交可能打乱服务器端状态
+        return Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=self.max_retries,
+            status=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.retry_statuses,
+            allowed_methods=frozenset({'GET', 'HEAD'}),
+            raise_on_status=False,
+            respect_retry_after_header=True,
+        )
+
+    def create_session(self):
+        """创建挂载了连接池和重试策略的 requests.Session"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                              max_retries=self.retry_policy())
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        if self.metrics is not None:
+            self.metrics.instrument(session)
+        return session
+
+    def httpx_options(self):
+        """异步引擎 httpx.AsyncClient 的连接参数"""
+        import httpx
+
+        connect, read = self.timeout('grades')
+        limits = httpx.Limits(
+            max_connections=self.pool_maxsize,
+            max_keepalive_connections=self.pool_maxsize if self.keep_alive else 0,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        # 传入 transport 后客户端自身的 limits/http2 参数不再生效，因此都设置在 transport 上；
+        # httpx 的 retries 只重试建立连接失败
+        options = {
+            'timeout': httpx.Timeout(read, connect=connect),
+            'transport': httpx.AsyncHTTPTransport(retries=self.max_retries, http2=self.http2, limits=limits),
+        }
+        if self.metrics is not None:
+            options['event_hooks'] = {'response': [self.metrics.httpx_response_hook]}
+        return options
+
+
+DEFAULT_TRANSPORT = TransportConfig()